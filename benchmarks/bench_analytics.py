@@ -0,0 +1,146 @@
+"""
+Monitor write latency while analysts read the database.
+
+Fills a scratch database with --history large trades, then records batches of new
+trades through the monitor's own write path for --duration seconds under each load,
+run from a separate process as analysts would:
+
+    none     no readers
+    direct   a plain connection pulling the whole table in one long read, then
+             aggregating, in a loop (a notebook pointed at polymarket_monitor.db)
+    api      clients paging through /trades of the read-only query API
+    export   repeated large_trades exports in chunks (CSV, to need no pyarrow)
+
+Reports write latency per batch and how large the WAL grew: a read that stays open
+keeps the monitor's checkpoints from resetting it.
+
+    python benchmarks/bench_analytics.py --history 300000 --duration 10
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from urllib.request import urlopen
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="polymarket-analytics-")
+os.environ["DATABASE_PATH"] = os.path.join(WORKDIR, "analytics.db")
+sys.path.insert(0, REPO)
+
+from polymarket_monitor.config import Config
+from polymarket_monitor.database import init_database, transaction, insert_large_trades, INSERT_LARGE_TRADE_SQL
+from polymarket_monitor.analytics import ReadPool, start_query_server, export_table
+
+def trade_row(i, rng):
+    return ("0x%064x" % rng.randrange(2000), f"Market {i % 2000}", "BUY", 1000.0, 0.05, rng.uniform(5e4, 5e5),
+            "Yes", "0x%040x" % rng.randrange(50000), "0x%064x" % i, 1700000000 + i)
+
+def fill_history(count):
+    rng = random.Random(5)
+    with transaction() as conn:
+        conn.executemany(INSERT_LARGE_TRADE_SQL, (trade_row(i, rng) for i in range(count)))
+    with transaction() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def direct_reader(path, stop):
+    conn = sqlite3.connect(path)
+    while not stop.is_set():
+        # One long read: the snapshot stays open until the last row is fetched
+        totals = {}
+        for wallet, value in conn.execute("SELECT wallet_address, dollar_value FROM large_trades ORDER BY timestamp"):
+            totals[wallet] = totals.get(wallet, 0) + value
+    conn.close()
+
+def api_reader(path, stop):
+    pool = ReadPool(path, 2, Config.ANALYTICS_QUERY_TIMEOUT_SECONDS)
+    server = start_query_server("127.0.0.1", 0, pool)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/trades?limit=1000"
+    while not stop.is_set():
+        cursor = None
+        while not stop.is_set():
+            with urlopen(base + (f"&cursor={cursor}" if cursor else "")) as response:
+                cursor = json.load(response)["next_cursor"]
+            if cursor is None:
+                break
+    server.shutdown()
+    pool.close()
+
+def export_reader(path, stop):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    output = os.path.join(WORKDIR, "export.csv")
+    while not stop.is_set():
+        export_table(conn, "large_trades", output, "csv", 50000)
+    conn.close()
+
+READERS = {"none": None, "direct": direct_reader, "api": api_reader, "export": export_reader}
+
+def measure(load, duration, batch, next_id):
+    stop = multiprocessing.Event()
+    reader = None
+    if READERS[load] is not None:
+        reader = multiprocessing.Process(target=READERS[load], args=(Config.DATABASE_PATH, stop), daemon=True)
+        reader.start()
+        time.sleep(0.5)
+
+    rng = random.Random(next_id)
+    latencies = []
+    wal_peak = 0
+    wal_path = Config.DATABASE_PATH + "-wal"
+    started = time.monotonic()
+    while time.monotonic() - started < duration:
+        trades = []
+        for i in range(next_id, next_id + batch):
+            row = trade_row(i, rng)
+            trades.append({"condition_id": row[0], "market_title": row[1], "side": row[2], "size": row[3],
+                           "price": row[4], "dollar_value": row[5], "outcome": row[6], "wallet_address": row[7],
+                           "transaction_hash": row[8], "timestamp": row[9]})
+        next_id += batch
+        began = time.perf_counter()
+        insert_large_trades(trades)
+        latencies.append(time.perf_counter() - began)
+        wal_peak = max(wal_peak, os.path.getsize(wal_path) if os.path.exists(wal_path) else 0)
+        time.sleep(0.01)
+
+    stop.set()
+    if reader is not None:
+        reader.join(timeout=60)
+    with transaction() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return (len(latencies), pick(0.5), pick(0.99), latencies[-1] * 1000, wal_peak / 2 ** 20), next_id
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark monitor writes under analytics reads")
+    parser.add_argument("--history", type=int, default=300000, help="Large trades already recorded")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per load")
+    parser.add_argument("--batch", type=int, default=10, help="Trades recorded per write")
+    parser.add_argument("--loads", nargs="*", default=list(READERS), choices=list(READERS))
+    args = parser.parse_args()
+
+    init_database()
+    fill_history(args.history)
+    next_id = args.history
+    results = {}
+    try:
+        for load in args.loads:
+            results[load], next_id = measure(load, args.duration, args.batch, next_id)
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    print(f"{args.history} recorded trades, {args.batch} trades per write, {args.duration:.0f}s per load")
+    print(f"  {'load':<8} {'writes':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'WAL peak MiB':>13}")
+    for load, (writes, p50, p99, worst, wal) in results.items():
+        print(f"  {load:<8} {writes:>7} {p50:>8.2f} {p99:>8.2f} {worst:>8.2f} {wal:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Microbenchmark for utils.classify_market_category.
+
+Compares the previous per-keyword substring scan against the single-pass keyword
+index, cold (empty memo caches), on titles not seen before whose words were (the
+usual refresh), and warm (every market seen on a prior refresh).
+The old fetch_low_probability_markets classified each market three times, so the
+per-refresh line compares three legacy calls against one new call.
+
+    python benchmarks/bench_classifier.py [num_markets]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from polymarket_monitor.utils import (
+    SPORTS_KEYWORDS, POLITICS_KEYWORDS, classify_market_category, _classify_text, _word_keywords
+)
+
+FILLER = [
+    "will", "the", "by", "end", "of", "2025", "above", "below", "reach", "before",
+    "bitcoin", "price", "team", "new", "york", "los", "angeles", "market", "next", "june"
+]
+
+def legacy_classify(market):
+    title = market.get('question', market.get('title', '')).lower()
+    slug = market.get('slug', '').lower()
+    combined = f"{title} {slug}"
+    sports_matches = sum(1 for keyword in SPORTS_KEYWORDS if keyword in combined)
+    politics_matches = sum(1 for keyword in POLITICS_KEYWORDS if keyword in combined)
+    if sports_matches > politics_matches and sports_matches > 0:
+        return 'sports'
+    elif politics_matches > 0:
+        return 'politics'
+    else:
+        return 'other'
+
+def synthetic_markets(count, seed=42):
+    rng = random.Random(seed)
+    keywords = SPORTS_KEYWORDS + POLITICS_KEYWORDS
+    markets = []
+    for i in range(count):
+        words = rng.choices(FILLER, k=rng.randint(6, 14))
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        title = " ".join(words).capitalize() + "?"
+        slug = "-".join(words[:6]) + f"-{i}"
+        markets.append({"question": title, "slug": slug})
+    return markets
+
+def timed(fn, markets, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for market in markets:
+            fn(market)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    markets = synthetic_markets(count)
+
+    legacy = timed(legacy_classify, markets)
+
+    def cold(market):
+        return classify_market_category(market)
+
+    cold_best = float("inf")
+    new_titles_best = float("inf")
+    for _ in range(5):
+        _classify_text.cache_clear()
+        _word_keywords.cache_clear()
+        cold_best = min(cold_best, timed(cold, markets, repeat=1))
+        # Titles not seen before, made of words that were: the usual refresh
+        _classify_text.cache_clear()
+        new_titles_best = min(new_titles_best, timed(cold, markets, repeat=1))
+
+    warm = timed(classify_market_category, markets)
+
+    def legacy_refresh(market):
+        legacy_classify(market)
+        legacy_classify(market)
+        legacy_classify(market)
+
+    legacy_per_refresh = timed(legacy_refresh, markets)
+
+    agree = sum(1 for m in markets if legacy_classify(m) == classify_market_category(m))
+
+    print(f"{count} synthetic markets (best of 5)")
+    print(f"  legacy substring scan: {legacy * 1000:8.2f} ms  ({legacy / count * 1e6:.2f} us/market)")
+    print(f"  keyword index, cold:   {cold_best * 1000:8.2f} ms  ({legacy / cold_best:.1f}x)")
+    print(f"  new titles, known words: {new_titles_best * 1000:6.2f} ms  ({legacy / new_titles_best:.1f}x)")
+    print(f"  keyword index, warm:   {warm * 1000:8.2f} ms  ({legacy / warm:.1f}x)")
+    print(f"  per refresh (3 legacy calls vs 1 cold call): {legacy_per_refresh * 1000:.2f} ms -> "
+          f"{cold_best * 1000:.2f} ms ({legacy_per_refresh / cold_best:.1f}x)")
+    print(f"  agreement with legacy: {agree / count:.1%} (differences are keywords inside words)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+End-to-end benchmarks for the hot paths, run against the local mock API.
+
+    refresh_markets         paged discovery + delta write (steady state, prices churning)
+    check_for_large_trades  one poll: fetch, decode, filter, record, enqueue
+    send_alerts             per-trade Discord posts (legacy path)
+    deliver_alerts          one batched Discord post of up to 10 embeds
+
+Each benchmark reports throughput, p50/p99 latency and the tracemalloc peak of a
+single call, best of --rounds rounds to damp scheduler noise. Fixtures, latencies
+and 429s are seeded and the database starts empty, so runs are comparable; save a
+baseline and compare later runs to it:
+
+    python benchmarks/bench_pipeline.py --save baseline.json
+    python benchmarks/bench_pipeline.py --compare baseline.json --tolerance 0.25
+
+--compare exits with status 1 if any p50 regressed by more than the tolerance, or
+any p99 by more than twice the tolerance (tail latency is inherently noisier).
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_api import add_mock_arguments, build_state, start_mock_server
+from polymarket_monitor.config import Config
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def measure(name, call, iterations, between=None, memory_calls=3):
+    """
+    Time iterations calls of call() (which returns the number of items it handled),
+    after one untimed warm-up, then trace memory over a few extra calls.
+    """
+    if between:
+        between()
+    call()
+
+    latencies = []
+    items = 0
+    for _ in range(iterations):
+        if between:
+            between()
+        started = time.perf_counter()
+        items += call()
+        latencies.append(time.perf_counter() - started)
+
+    peak = 0
+    for _ in range(memory_calls):
+        if between:
+            between()
+        tracemalloc.start()
+        call()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        "name": name,
+        "calls": iterations,
+        "items": items,
+        "items_per_second": items / total if total else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_kib": peak / 1024
+    }
+
+def best_of(rounds):
+    best = dict(rounds[0])
+    for key in ("p50_ms", "p99_ms", "peak_kib"):
+        best[key] = min(r[key] for r in rounds)
+    best["items_per_second"] = max(r["items_per_second"] for r in rounds)
+    best["calls"] = sum(r["calls"] for r in rounds)
+    best["items"] = sum(r["items"] for r in rounds)
+    return best
+
+def sample_alerts(count):
+    return [{
+        "condition_id": f"0x{i:064x}",
+        "market_title": f"Will the benchmark market number {i} resolve yes?",
+        "side": "BUY",
+        "size": 2000000.0,
+        "price": 0.03,
+        "dollar_value": 60000.0,
+        "outcome": "Yes",
+        "wallet_address": f"0x{i:040x}",
+        "transaction_hash": f"0x{i:064x}",
+        "timestamp": 1700000000 + i,
+        "current_probability": 0.03,
+        "slug": f"benchmark-market-{i}",
+        "rules": ["default"]
+    } for i in range(count)]
+
+def run(args):
+    state = build_state(args)
+    server, base_url = start_mock_server(state)
+
+    workdir = tempfile.mkdtemp(prefix="polymarket-bench-")
+    Config.DATABASE_PATH = os.path.join(workdir, "bench.db")
+    Config.GAMMA_API_BASE = base_url
+    Config.DATA_API_BASE = base_url
+    Config.DISCORD_WEBHOOK_URL = f"{base_url}/webhook"
+    Config.EMAIL_ENABLED = False
+    Config.MARKETS_API_LIMIT = args.page_size
+    Config.TRADES_API_LIMIT = args.trades_limit
+
+    # Imported after Config is pointed at the mock so module-level state picks it up
+    from polymarket_monitor.database import init_database, close_database
+    from polymarket_monitor.market_discovery import refresh_markets
+    from polymarket_monitor.trade_monitor import fetch_recent_trades, process_trades
+    from polymarket_monitor.alerting import send_alerts, deliver_alerts, AlertDeliveryError
+    from polymarket_monitor.http_client import close_http_sessions
+
+    init_database()
+    alerts = sample_alerts(10)
+
+    def refresh():
+        return len(refresh_markets())
+
+    def poll():
+        # Rate-limited polls still count towards latency, with no trades handled
+        try:
+            trades = fetch_recent_trades()
+        except requests.RequestException:
+            return 0
+        process_trades(trades)
+        return len(trades)
+
+    def send():
+        send_alerts(alerts)
+        return len(alerts)
+
+    def deliver():
+        try:
+            deliver_alerts("discord", alerts)
+        except AlertDeliveryError:
+            pass
+        return len(alerts)
+
+    benchmarks = [
+        ("refresh_markets", refresh, args.refreshes, state.churn_markets),
+        ("check_for_large_trades", poll, args.polls, None),
+        ("send_alerts", send, args.alert_batches, None),
+        ("deliver_alerts", deliver, args.alert_batches, None),
+    ]
+    results = []
+    try:
+        for name, call, iterations, between in benchmarks:
+            rounds = [measure(name, call, iterations, between) for _ in range(args.rounds)]
+            results.append(best_of(rounds))
+    finally:
+        close_http_sessions()
+        close_database()
+        server.shutdown()
+
+    return {
+        "config": {
+            "markets": len(state.markets), "page_size": args.page_size, "trades_limit": args.trades_limit,
+            "trades_per_poll": args.trades_per_poll, "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+            "rate_429": args.rate_429, "seed": args.seed, "rounds": args.rounds
+        },
+        "requests": dict(state.requests),
+        "results": results
+    }
+
+def report(run_result, baseline=None, tolerance=0.25):
+    config = run_result["config"]
+    print(f"{config['markets']} markets, {config['trades_per_poll']} new trades/poll, "
+          f"latency {config['latency_ms']}+{config['jitter_ms']} ms, 429 rate {config['rate_429']:.0%}")
+    print(f"  {'benchmark':<24} {'calls':>6} {'items/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>9}")
+
+    previous = {r["name"]: r for r in (baseline or {}).get("results", [])}
+    regressions = []
+    for r in run_result["results"]:
+        line = (f"  {r['name']:<24} {r['calls']:>6} {r['items_per_second']:>10,.0f} "
+                f"{r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['peak_kib']:>9.0f}")
+        old = previous.get(r["name"])
+        if old:
+            changes = []
+            for key, allowed in (("p50_ms", tolerance), ("p99_ms", 2 * tolerance)):
+                ratio = r[key] / old[key] if old[key] else 1.0
+                changes.append(f"{key[:3]} {ratio - 1:+.0%}")
+                if ratio > 1 + allowed:
+                    regressions.append(f"{r['name']} {key} {old[key]:.2f} -> {r[key]:.2f} ms")
+            line += "   vs baseline: " + ", ".join(changes)
+        print(line)
+
+    counts = run_result["requests"]
+    print(f"  mock requests: {counts['markets']} markets ({counts['not_modified']} not modified), "
+          f"{counts['trades']} trades, {counts['webhook']} webhook, {counts['rate_limited']} rate limited")
+
+    if baseline and baseline.get("config") != config:
+        print("  note: baseline was recorded with different settings")
+    for regression in regressions:
+        print(f"  REGRESSION: {regression}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the monitor's hot paths against a local mock API")
+    add_mock_arguments(parser)
+    parser.add_argument("--page-size", type=int, default=500, help="MARKETS_API_LIMIT for discovery")
+    parser.add_argument("--trades-limit", type=int, default=1000, help="TRADES_API_LIMIT per poll")
+    parser.add_argument("--refreshes", type=int, default=10)
+    parser.add_argument("--polls", type=int, default=100)
+    parser.add_argument("--alert-batches", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=3, help="Repeat each benchmark and keep the best round")
+    parser.add_argument("--save", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50 slowdown before flagging a regression (p99: twice this)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = report(result, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
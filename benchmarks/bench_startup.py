@@ -0,0 +1,94 @@
+"""
+Startup-to-first-poll benchmark: cold start (blocking discovery) vs warm start.
+
+Runs the real monitor (run_monitor.py) as a subprocess against the local mock API,
+twice per round on the same database: once with WARM_START_ENABLED=false, which
+waits for a full discovery before polling, and once with it enabled, which polls
+from the persisted market set and discovers in the background. The timings are the
+"Startup (...)" lines the monitor logs (also exported as polymarket_startup_seconds).
+
+    python benchmarks/bench_startup.py --markets 20000 --latency-ms 150
+
+Discovery cost grows with --markets and --latency-ms; the warm first poll should not.
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import signal
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_api import add_mock_arguments, build_state, start_mock_server
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_LINE = re.compile(r"Startup \((\w+)\): ([\w ]+) after ([\d.]+)s")
+
+def run_monitor(base_url, workdir, warm, timeout):
+    """
+    Start the monitor, wait for its first poll (and first discovery), then stop it.
+    Returns {stage: seconds}.
+    """
+    env = dict(
+        os.environ,
+        DATABASE_PATH=os.path.join(workdir, "startup.db"),
+        GAMMA_API_BASE=base_url,
+        DATA_API_BASE=base_url,
+        DISCORD_WEBHOOK_URL=f"{base_url}/webhook",
+        EMAIL_ENABLED="false",
+        METRICS_ENABLED="false",
+        TRADE_INGESTION_MODE="poll",
+        WARM_START_ENABLED="true" if warm else "false",
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO, "run_monitor.py")], cwd=workdir, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    stages = {}
+    deadline = time.monotonic() + timeout
+    try:
+        for line in process.stderr:
+            match = STARTUP_LINE.search(line)
+            if match:
+                stages[match.group(2).replace(" ", "_")] = float(match.group(3))
+            if ("first_poll" in stages and "discovery" in stages) or time.monotonic() > deadline:
+                break
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return stages
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold and warm monitor startup against the mock API")
+    add_mock_arguments(parser)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300, help="Give up on a run after this many seconds")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(build_state(args))
+    workdir = tempfile.mkdtemp(prefix="polymarket-startup-")
+    results = {"cold": [], "warm": []}
+    try:
+        # Cold first, so the warm run finds the snapshot the cold one persisted
+        for _ in range(args.rounds):
+            for mode in ("cold", "warm"):
+                results[mode].append(run_monitor(base_url, workdir, mode == "warm", args.timeout))
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.markets} markets, latency {args.latency_ms}+{args.jitter_ms} ms, best of {args.rounds}")
+    print(f"  {'start':<6} {'first poll s':>13} {'discovery s':>12}")
+    for mode, runs in results.items():
+        first_poll = min((r["first_poll"] for r in runs if "first_poll" in r), default=float("nan"))
+        discovery = min((r["discovery"] for r in runs if "discovery" in r), default=float("nan"))
+        print(f"  {mode:<6} {first_poll:>13.2f} {discovery:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark for one poll cycle's decode and filter work on a 1000-trade /trades payload.
+
+Compares the previous path (response.json() with the stdlib decoder, then a
+12-key trade_data dict built per size-matching row) against the fast JSON backend
+and match_large_trades, which rejects rows on market and dollar value before
+building a Trade record. Reports best-of time per cycle and allocations
+(tracemalloc peak and live blocks during one cycle).
+
+    python benchmarks/bench_trade_decode.py [payload.json]
+
+Without an argument a synthetic payload with the fields the API returns is used;
+pass a recorded response body (e.g. saved with curl) to benchmark real data.
+"""
+import os
+import sys
+import json
+import time
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from polymarket_monitor.config import Config
+from polymarket_monitor.json_codec import loads, BACKEND
+from polymarket_monitor.trade_monitor import match_large_trades
+from polymarket_monitor.market_index import MarketIndex
+
+class NoDedup:
+    def is_processed(self, tx_hash):
+        return False
+
+def synthetic_payload(count=1000, markets=400, seed=7):
+    rng = random.Random(seed)
+    condition_ids = ["0x" + "%064x" % rng.getrandbits(256) for _ in range(markets)]
+    trades = []
+    for i in range(count):
+        side = rng.choice(["BUY", "SELL"])
+        price = round(rng.uniform(0.01, 0.99), 3)
+        size = round(rng.uniform(Config.TRADE_SIZE_MIN, Config.TRADE_SIZE_MIN * 4) / (price if side == "BUY" else 1), 2)
+        trades.append({
+            "proxyWallet": "0x" + "%040x" % rng.getrandbits(160),
+            "side": side,
+            "asset": str(rng.getrandbits(250)),
+            "conditionId": rng.choice(condition_ids),
+            "size": size,
+            "price": price,
+            "timestamp": 1760000000 - i,
+            "title": "Will the market resolve to yes before the end of the season?",
+            "slug": f"market-slug-{i % markets}",
+            "icon": "https://polymarket-upload.s3.us-east-2.amazonaws.com/icon.png",
+            "eventSlug": f"event-slug-{i % markets}",
+            "outcome": rng.choice(["Yes", "No"]),
+            "outcomeIndex": rng.randint(0, 1),
+            "name": f"trader{i}",
+            "pseudonym": "Calm-Market",
+            "bio": "",
+            "profileImage": "",
+            "profileImageOptimized": "",
+            "transactionHash": "0x" + "%064x" % rng.getrandbits(256)
+        })
+    return json.dumps(trades).encode("utf-8")
+
+def monitored_for(trades, share=0.05, seed=11):
+    rng = random.Random(seed)
+    ids = sorted({t["conditionId"] for t in trades})
+    chosen = rng.sample(ids, max(1, int(len(ids) * share)))
+    return {cid: {"condition_id": cid, "title": "Monitored market", "outcome": "Yes",
+                  "current_probability": 0.03, "slug": "monitored"} for cid in chosen}
+
+def legacy_cycle(body, monitored_markets, dedup):
+    trades = json.loads(body)
+    candidates = []
+    for trade in trades:
+        size = float(trade.get("size", 0))
+        price = float(trade.get("price", 0))
+        if trade.get("side") == "BUY":
+            dollar_value = size * price
+        else:
+            dollar_value = size
+        if dollar_value < Config.TRADE_SIZE_MIN or dollar_value > Config.TRADE_SIZE_MAX:
+            continue
+        condition_id = trade.get("conditionId", trade.get("market", ""))
+        market_info = monitored_markets.get(condition_id)
+        if not market_info:
+            continue
+        tx_hash = trade.get("transactionHash", trade.get("id", ""))
+        if dedup.is_processed(tx_hash):
+            continue
+        candidates.append({
+            "condition_id": condition_id,
+            "market_title": market_info.get("title", trade.get("title", "Unknown")),
+            "side": trade.get("side", "UNKNOWN"),
+            "size": size,
+            "price": price,
+            "dollar_value": dollar_value,
+            "outcome": trade.get("outcome", market_info.get("outcome", "")),
+            "wallet_address": trade.get("proxyWallet", trade.get("maker", "")),
+            "transaction_hash": tx_hash,
+            "timestamp": trade.get("timestamp", ""),
+            "current_probability": market_info.get("current_probability", 0),
+            "slug": market_info.get("slug", "")
+        })
+    return candidates
+
+def fast_cycle(body, monitored_markets, dedup):
+    return match_large_trades(loads(body), monitored_markets, dedup)
+
+def best_time(fn, args, repeat=50):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def allocations(fn, args):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    result = fn(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, "filename"))
+    del result
+    return peak, blocks
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            body = f.read()
+    else:
+        body = synthetic_payload()
+
+    trades = json.loads(body)
+    monitored = monitored_for(trades)
+    args = (body, monitored, NoDedup())
+    fast_args = (body, MarketIndex.from_rows(monitored.values()), NoDedup())
+
+    assert len(legacy_cycle(*args)) == len(fast_cycle(*fast_args))
+    legacy = best_time(legacy_cycle, args)
+    fast = best_time(fast_cycle, fast_args)
+    legacy_peak, legacy_blocks = allocations(legacy_cycle, args)
+    fast_peak, fast_blocks = allocations(fast_cycle, fast_args)
+
+    print(f"{len(trades)} trades, {len(body) / 1024:.0f} KiB, {len(monitored)} monitored markets, "
+          f"{len(fast_cycle(*fast_args))} matches (best of 50)")
+    fast_label = f"fast ({BACKEND} + Trade)"
+    print(f"  {'legacy (json + dict)':<24} {legacy * 1000:7.2f} ms/cycle  peak {legacy_peak / 1024:6.0f} KiB  "
+          f"{legacy_blocks} blocks retained")
+    print(f"  {fast_label:<24} {fast * 1000:7.2f} ms/cycle  peak {fast_peak / 1024:6.0f} KiB  "
+          f"{fast_blocks} blocks retained  ({legacy / fast:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Cost of attaching wallet profiles to one poll cycle's alerts.
+
+Fills a scratch database with --history large trades spread over --wallets wallets,
+then times enrichment of --alerts alerts (wallets drawn from the same pool) three
+ways: one large_trades query per alert (no cache, no batching), the profiler with a
+cold cache (one grouped query for all misses) and with a warm cache. With
+--api-latency-ms the data API lookups run against the local mock; they happen in
+the background, so the extra line shows how long until their profiles are cached.
+
+    python benchmarks/bench_wallet_profiles.py --history 200000 --wallets 20000 --alerts 50
+    python benchmarks/bench_wallet_profiles.py --api-latency-ms 150
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="polymarket-wallets-")
+os.environ["DATABASE_PATH"] = os.path.join(WORKDIR, "wallets.db")
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_api import MockState, synthetic_markets, start_mock_server
+from polymarket_monitor.config import Config
+from polymarket_monitor.database import init_database, get_connection, transaction, INSERT_LARGE_TRADE_SQL
+from polymarket_monitor.wallet_profiles import WalletProfiler
+
+def fill_history(count, wallets, rng):
+    rows = (
+        ("0x%064x" % rng.randrange(500), "Market", "BUY", 1000.0, 0.5, rng.uniform(1e4, 1e5), "Yes",
+         wallets[rng.randrange(len(wallets))], "0x%064x" % i, 1700000000 + i)
+        for i in range(count)
+    )
+    with transaction() as conn:
+        conn.executemany(INSERT_LARGE_TRADE_SQL, rows)
+
+def per_alert_queries(alerts):
+    conn = get_connection()
+    for trade_data in alerts:
+        trade_data["wallet_profile"] = conn.execute('''
+            SELECT MIN(timestamp), COUNT(*), SUM(dollar_value) FROM large_trades
+            WHERE wallet_address = ? AND transaction_hash NOT LIKE 'agg:%'
+        ''', (trade_data["wallet_address"],)).fetchone()
+
+def best_of(rounds, setup, run):
+    best = float("inf")
+    for _ in range(rounds):
+        state = setup()
+        started = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark wallet profile enrichment of alerts")
+    parser.add_argument("--history", type=int, default=200000, help="Large trades already recorded")
+    parser.add_argument("--wallets", type=int, default=20000)
+    parser.add_argument("--alerts", type=int, default=50, help="Alerts per poll cycle")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--api-latency-ms", type=float, default=None, help="Include data API lookups, served by the mock with this latency")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    wallets = ["0x%040x" % rng.getrandbits(160) for _ in range(args.wallets)]
+    init_database()
+    fill_history(args.history, wallets, rng)
+
+    server = None
+    api_enabled = args.api_latency_ms is not None
+    if api_enabled:
+        server, Config.DATA_API_BASE = start_mock_server(MockState(synthetic_markets(200), latency_ms=args.api_latency_ms))
+
+    def alerts():
+        return [{"wallet_address": rng.choice(wallets)} for _ in range(args.alerts)]
+
+    def cold():
+        return WalletProfiler(Config.WALLET_PROFILE_CACHE_SIZE, 900, api_enabled, Config.WALLET_PROFILE_API_WORKERS), alerts()
+
+    warm_profiler = WalletProfiler(Config.WALLET_PROFILE_CACHE_SIZE, 900, api_enabled, Config.WALLET_PROFILE_API_WORKERS)
+    warm_alerts = alerts()
+    warm_profiler.enrich(warm_alerts)
+
+    try:
+        results = [("profiler, cold cache", best_of(args.rounds, cold, lambda s: s[0].enrich(s[1]))),
+                   ("profiler, warm cache", best_of(args.rounds, lambda: (warm_profiler, [dict(a) for a in warm_alerts]),
+                                                    lambda s: s[0].enrich(s[1])))]
+        if api_enabled:
+            def refreshed(state):
+                state[0].enrich(state[1])
+                state[0].close(wait=True)
+            results.append(("API profiles cached", best_of(args.rounds, cold, refreshed)))
+        else:
+            results.insert(0, ("one query per alert", best_of(args.rounds, alerts, per_alert_queries)))
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    source = f"local + data API at {args.api_latency_ms:.0f} ms" if api_enabled else "local"
+    print(f"{args.alerts} alerts, {args.history} recorded trades over {args.wallets} wallets ({source}), best of {args.rounds}")
+    for name, ms in results:
+        print(f"  {name:<22} {ms:>9.2f} ms per cycle")
+
+if __name__ == "__main__":
+    main()
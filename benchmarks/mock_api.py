@@ -0,0 +1,441 @@
+"""
+Local stand-in for the Gamma /markets, data-api /trades and Discord webhook endpoints.
+
+Responses come from fixtures: either JSON files recorded from the real APIs or
+deterministic synthetic data (seeded, so every run serves identical payloads).
+Latency, 429 rate and payload sizes are configurable, which makes it usable both
+from the benchmarks and as a target for a real monitor run:
+
+    python benchmarks/mock_api.py --port 8099 --latency-ms 40 --rate-429 0.02
+    GAMMA_API_BASE=http://127.0.0.1:8099 DATA_API_BASE=http://127.0.0.1:8099 \\
+        DISCORD_WEBHOOK_URL=http://127.0.0.1:8099/webhook python run_monitor.py
+
+/markets pages by limit/offset and honours If-None-Match, or looks markets up by
+repeated condition_ids parameters. /trades behaves like a live feed: each request
+reveals --trades-per-poll new trades on top of the previous ones, so a poller always
+finds fresh data, and applies filterAmount like the API. Recorded /trades fixtures
+are served in the same sliding fashion, oldest first. With --wallet-pool, synthetic
+trades come from that many recurring wallets instead of a fresh one each.
+
+/trades?user= and /closed-positions?user= answer wallet history lookups with a
+deterministic history per wallet, without advancing the feed.
+
+start_mock_stream (--stream-port) serves the same feed over WebSocket, the way
+TradeStream consumes it: after a subscribe message it pushes --stream-trades-per-message
+new trades every --stream-interval-ms, keeping those in the subscribed markets. With
+--stream-drop-every it aborts each connection after that many messages and lets
+--stream-gap-trades more trades happen before the client is back, which only a REST
+backfill can find:
+
+    python benchmarks/mock_api.py --stream-port 8100 --stream-drop-every 50 --stream-gap-trades 20
+    STREAM_WS_URL=ws://127.0.0.1:8100 TRADE_INGESTION_MODE=stream ...
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SPORTS_WORDS = ["nba", "nfl", "premier league", "champions league", "super bowl", "world cup", "lakers", "celtics"]
+POLITICS_WORDS = ["election", "senate", "president", "governor", "congress", "parliament", "prime minister"]
+OTHER_WORDS = ["bitcoin", "ethereum", "gdp", "inflation", "box office", "temperature"]
+TX_LINK = re.compile(r"polygonscan\.com/tx/(0x[0-9a-fA-F]+)")
+
+def synthetic_markets(count, low_probability_share=0.2, seed=1):
+    rng = random.Random(seed)
+    markets = []
+    for i in range(count):
+        topic = rng.choice([SPORTS_WORDS, POLITICS_WORDS, OTHER_WORDS])
+        word = rng.choice(topic)
+        yes = rng.uniform(0.005, 0.049) if rng.random() < low_probability_share else rng.uniform(0.05, 0.95)
+        markets.append({
+            "conditionId": "0x%064x" % rng.getrandbits(256),
+            "question": f"Will the {word} outcome number {i} happen by the end of the year?",
+            "slug": f"{word.replace(' ', '-')}-outcome-{i}",
+            "outcomes": ["Yes", "No"],
+            "outcomePrices": [f"{yes:.4f}", f"{1 - yes:.4f}"],
+            "active": True,
+            "closed": False,
+            "volume": f"{rng.uniform(1e3, 5e6):.2f}",
+            "description": "Synthetic market used by the benchmark harness. " * rng.randint(1, 6)
+        })
+    return markets
+
+def synthetic_trade(index, markets, rng, wallet_pool=0):
+    market = markets[rng.randrange(len(markets))]
+    outcome = rng.randrange(2)
+    price = float(market["outcomePrices"][outcome])
+    side = "BUY" if rng.random() < 0.7 else "SELL"
+    dollars = rng.choice([rng.uniform(1e3, 2e4), rng.uniform(2e4, 8e4), rng.uniform(5e4, 5e5)])
+    wallet = "0x%040x" % (rng.randrange(wallet_pool) if wallet_pool else rng.getrandbits(160))
+    return {
+        "proxyWallet": wallet,
+        "side": side,
+        "asset": str(rng.getrandbits(250)),
+        "conditionId": market["conditionId"],
+        "size": round(dollars / price if side == "BUY" else dollars, 2),
+        "price": price,
+        "timestamp": 1700000000 + index,
+        "title": market["question"],
+        "slug": market["slug"],
+        "eventSlug": market["slug"],
+        "outcome": market["outcomes"][outcome],
+        "outcomeIndex": outcome,
+        "name": f"trader{index}",
+        "pseudonym": "",
+        "transactionHash": "0x" + hashlib.sha256(f"trade-{index}".encode()).hexdigest()
+    }
+
+class MockState:
+    def __init__(self, markets, trades=None, trades_per_poll=100, latency_ms=0, jitter_ms=0,
+                 rate_429=0.0, price_churn=0.0, wallet_pool=0, seed=1, stream_interval_ms=50,
+                 stream_trades_per_message=5, stream_drop_every=0, stream_gap_trades=0):
+        self.markets = markets
+        self.recorded_trades = trades
+        self.trades_per_poll = trades_per_poll
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.price_churn = price_churn
+        self.wallet_pool = wallet_pool
+        self.stream_interval_ms = stream_interval_ms
+        self.stream_trades_per_message = stream_trades_per_message
+        self.stream_drop_every = stream_drop_every
+        self.stream_gap_trades = stream_gap_trades
+        self.rng = random.Random(seed)
+        self.trade_rng = random.Random(seed + 1)
+        self.lock = threading.Lock()
+        self.trade_count = 0
+        self.generated = []
+        # Synthetic trades dropped from the front of generated, which is capped
+        self.generated_offset = 0
+        self.requests = {"markets": 0, "trades": 0, "wallet_history": 0, "webhook": 0, "rate_limited": 0, "not_modified": 0,
+                         "stream_connections": 0, "stream_drops": 0}
+        self.streamed_trades = 0
+        self.webhook_embeds = 0
+        # Transaction hash -> times it was delivered, to spot duplicate alerts
+        self.webhook_transactions = Counter()
+
+    def delay(self):
+        with self.lock:
+            extra = self.rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0
+            limited = self.rate_429 and self.rng.random() < self.rate_429
+        if self.latency_ms or extra:
+            time.sleep((self.latency_ms + extra) / 1000)
+        return limited
+
+    def churn_markets(self):
+        """
+        Move a share of prices, as between two real refreshes.
+        """
+        with self.lock:
+            for market in self.markets:
+                if self.rng.random() < self.price_churn:
+                    yes = min(0.99, max(0.001, float(market["outcomePrices"][0]) + self.rng.uniform(-0.01, 0.01)))
+                    market["outcomePrices"] = [f"{yes:.4f}", f"{1 - yes:.4f}"]
+
+    def markets_page(self, offset, limit):
+        with self.lock:
+            return self.markets[offset:offset + limit]
+
+    def markets_by_id(self, condition_ids, limit):
+        wanted = set(condition_ids)
+        with self.lock:
+            return [m for m in self.markets if m["conditionId"] in wanted][:limit]
+
+    def _visible_trades(self):
+        if self.recorded_trades is not None:
+            return self.recorded_trades[:self.trade_count]
+        while self.generated_offset + len(self.generated) < self.trade_count:
+            index = self.generated_offset + len(self.generated)
+            self.generated.append(synthetic_trade(index, self.markets, self.trade_rng, self.wallet_pool))
+        return self.generated
+
+    def reveal_trades(self, count):
+        """
+        Advance the feed by count trades and return those that appeared, oldest first
+        (fewer once a recorded fixture runs out).
+        """
+        with self.lock:
+            start = self.trade_count
+            self.trade_count += count
+            visible = self._visible_trades()
+            if self.recorded_trades is not None:
+                return visible[start:]
+            return visible[start - self.generated_offset:]
+
+    def trades_page(self, limit, min_value=0.0):
+        with self.lock:
+            self.trade_count += self.trades_per_poll
+            visible = self._visible_trades()
+            # Older trades can never be served again once `limit` newer ones pass the filter
+            if self.recorded_trades is None and len(self.generated) > 10 * limit:
+                self.generated_offset += len(self.generated) - 10 * limit
+                del self.generated[:-10 * limit]
+                visible = self.generated
+
+            page = []
+            for trade in reversed(visible):
+                value = trade["size"] * trade["price"] if trade["side"] == "BUY" else trade["size"]
+                if value >= min_value:
+                    page.append(trade)
+                    if len(page) >= limit:
+                        break
+            return page
+
+    def wallet_history(self, wallet, limit):
+        """
+        (trades, closed positions) for a wallet, the same on every request.
+        """
+        rng = random.Random(wallet)
+        trades = [synthetic_trade(rng.randrange(10 ** 6), self.markets, rng) for _ in range(min(limit, rng.randrange(60)))]
+        for trade in trades:
+            trade["proxyWallet"] = wallet
+        positions = [
+            {"proxyWallet": wallet, "conditionId": trade["conditionId"], "realizedPnl": round(rng.uniform(-2e3, 3e3), 2)}
+            for trade in trades[:rng.randrange(len(trades) + 1)]
+        ]
+        return trades, positions
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _send_json(self, payload, headers=None):
+        self._send(200, json.dumps(payload).encode("utf-8"), dict(headers or {}, **{"Content-Type": "application/json"}))
+
+    def _rate_limited(self):
+        self.state.requests["rate_limited"] += 1
+        body = json.dumps({"message": "You are being rate limited.", "retry_after": 0.05}).encode("utf-8")
+        self._send(429, body, {"Content-Type": "application/json", "Retry-After": "1"})
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query)
+        query = {k: v[0] for k, v in params.items()}
+        limited = self.state.delay()
+
+        if parts.path == "/markets":
+            self.state.requests["markets"] += 1
+            if limited:
+                return self._rate_limited()
+            offset, limit = int(query.get("offset", 0)), int(query.get("limit", 100))
+            if "condition_ids" in params:
+                return self._send_json(self.state.markets_by_id(params["condition_ids"], limit))
+            page = self.state.markets_page(offset, limit)
+            etag = '"' + hashlib.md5(json.dumps(page, sort_keys=True).encode()).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.state.requests["not_modified"] += 1
+                return self._send(304, headers={"ETag": etag})
+            return self._send_json(page, {"ETag": etag})
+
+        if parts.path in ("/trades", "/closed-positions") and "user" in query:
+            self.state.requests["wallet_history"] += 1
+            if limited:
+                return self._rate_limited()
+            trades, positions = self.state.wallet_history(query["user"], int(query.get("limit", 100)))
+            return self._send_json(trades if parts.path == "/trades" else positions)
+
+        if parts.path == "/trades":
+            self.state.requests["trades"] += 1
+            if limited:
+                return self._rate_limited()
+            limit, min_value = int(query.get("limit", 100)), float(query.get("filterAmount", 0))
+            return self._send_json(self.state.trades_page(limit, min_value))
+
+        self._send(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        limited = self.state.delay()
+        if urlsplit(self.path).path != "/webhook":
+            return self._send(404)
+        self.state.requests["webhook"] += 1
+        if limited:
+            return self._rate_limited()
+        try:
+            embeds = json.loads(body).get("embeds", [])
+        except ValueError:
+            return self._send(400)
+        with self.state.lock:
+            self.state.webhook_embeds += len(embeds)
+            self.state.webhook_transactions.update(
+                match.group(1) for match in TX_LINK.finditer(json.dumps(embeds))
+            )
+        self._send(204)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_mock_server(state, host="127.0.0.1", port=0):
+    """
+    Serve state from a daemon thread. Returns (server, base_url).
+    """
+    handler = type("BoundMockHandler", (MockHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-api", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+def subscribed_condition_ids(raw):
+    """
+    The condition IDs of a TradeStream subscribe message, or None if it is not one.
+    """
+    try:
+        message = json.loads(raw)
+        return {cid for sub in message["subscriptions"] for cid in json.loads(sub["filters"])["condition_ids"]}
+    except (ValueError, KeyError, TypeError):
+        return None
+
+async def stream_trades(state, ws):
+    from websockets.exceptions import ConnectionClosed
+
+    try:
+        await _stream_trades(state, ws)
+    except ConnectionClosed:
+        pass
+
+async def _stream_trades(state, ws):
+    condition_ids = subscribed_condition_ids(await ws.recv())
+    if condition_ids is None:
+        return await ws.close(1008, "expected a subscribe message")
+    with state.lock:
+        state.requests["stream_connections"] += 1
+
+    interval = state.stream_interval_ms / 1000
+    messages = 0
+    while True:
+        try:
+            # A re-subscribe replaces the markets; otherwise it is time for the next push
+            latest = subscribed_condition_ids(await asyncio.wait_for(ws.recv(), timeout=interval))
+            if latest is not None:
+                condition_ids = latest
+            continue
+        except asyncio.TimeoutError:
+            pass
+
+        if state.stream_drop_every and messages >= state.stream_drop_every:
+            # Trades keep happening while the client reconnects; it never sees these pushed
+            state.reveal_trades(state.stream_gap_trades)
+            with state.lock:
+                state.requests["stream_drops"] += 1
+            ws.transport.abort()
+            return
+
+        trades = [t for t in state.reveal_trades(state.stream_trades_per_message) if t["conditionId"] in condition_ids]
+        messages += 1
+        if trades:
+            await ws.send(json.dumps([{"topic": "activity", "type": "trades", "payload": t} for t in trades]))
+            with state.lock:
+                state.streamed_trades += len(trades)
+
+class MockStream:
+    """
+    The WebSocket feed running on its own event loop in a daemon thread.
+    """
+
+    def __init__(self, state, host, port):
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._serve(state, host, port),),
+                                        name="mock-stream", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        self.url = f"ws://{host}:{self.port}"
+
+    async def _serve(self, state, host, port):
+        # Only needed for the stream, so benchmarks without it run without websockets
+        from websockets.asyncio.server import serve
+
+        async with serve(lambda ws: stream_trades(state, ws), host, port) as server:
+            self._loop = asyncio.get_running_loop()
+            self._server = server
+            self.port = next(iter(server.sockets)).getsockname()[1]
+            self._ready.set()
+            await server.wait_closed()
+
+    def shutdown(self):
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._thread.join(timeout=5)
+
+def start_mock_stream(state, host="127.0.0.1", port=0):
+    """
+    Serve state's trade feed over WebSocket. Returns (stream, ws_url).
+    """
+    stream = MockStream(state, host, port)
+    return stream, stream.url
+
+def load_fixture(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def build_state(args):
+    markets = load_fixture(args.markets_fixture) if args.markets_fixture else synthetic_markets(args.markets, seed=args.seed)
+    trades = None
+    if args.trades_fixture:
+        # Recorded /trades responses are newest first; serve them oldest first
+        trades = sorted(load_fixture(args.trades_fixture), key=lambda t: float(t.get("timestamp", 0)))
+    return MockState(
+        markets, trades, trades_per_poll=args.trades_per_poll, latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms, rate_429=args.rate_429, price_churn=args.price_churn,
+        wallet_pool=args.wallet_pool, seed=args.seed, stream_interval_ms=args.stream_interval_ms,
+        stream_trades_per_message=args.stream_trades_per_message, stream_drop_every=args.stream_drop_every,
+        stream_gap_trades=args.stream_gap_trades
+    )
+
+def add_mock_arguments(parser):
+    parser.add_argument("--markets", type=int, default=5000, help="Synthetic market count")
+    parser.add_argument("--markets-fixture", help="Recorded /markets JSON (a list of markets)")
+    parser.add_argument("--trades-fixture", help="Recorded /trades JSON (a list of trades)")
+    parser.add_argument("--trades-per-poll", type=int, default=100, help="New trades revealed per /trades request")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Fixed latency added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency, 0..jitter")
+    parser.add_argument("--rate-429", type=float, default=0, help="Share of requests answered with 429")
+    parser.add_argument("--price-churn", type=float, default=0.05, help="Share of market prices moved per refresh")
+    parser.add_argument("--wallet-pool", type=int, default=0, help="Recurring wallets behind synthetic trades (0: a new one per trade)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for fixtures, latency and 429s")
+    parser.add_argument("--stream-interval-ms", type=float, default=50, help="Time between stream pushes")
+    parser.add_argument("--stream-trades-per-message", type=int, default=5, help="New trades revealed per stream push")
+    parser.add_argument("--stream-drop-every", type=int, default=0, help="Abort stream connections after this many pushes (0: never)")
+    parser.add_argument("--stream-gap-trades", type=int, default=0, help="Trades revealed, never pushed, while a dropped client is away")
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Polymarket and Discord APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--stream-port", type=int, help="Also serve the trade feed over WebSocket on this port")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    state = build_state(args)
+    server, base_url = start_mock_server(state, args.host, args.port)
+    print(f"Mock API at {base_url} (/markets, /trades, POST /webhook). Ctrl+C to stop.")
+    stream = None
+    if args.stream_port is not None:
+        stream, stream_url = start_mock_stream(state, args.host, args.stream_port)
+        print(f"Mock trade stream at {stream_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        if stream is not None:
+            stream.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Run several sharded monitor instances against the local mock API and check that
+every large trade is alerted exactly once while members join and die.
+
+    python benchmarks/run_shards.py --instances 3 --duration 40 --kill-after 15
+
+All instances share one database (and so the SQLite lease store). Partway through,
+one instance is killed with SIGKILL so its lease has to expire before the others
+take over its markets and adopt its queued alerts. At the end the script compares
+what was recorded in large_trades with what reached the mock Discord webhook, and
+exits with status 1 if any transaction was delivered twice or not at all.
+"""
+import os
+import sys
+import time
+import signal
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_api import add_mock_arguments, build_state, start_mock_server
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def start_instance(index, base_url, workdir, args):
+    env = dict(
+        os.environ,
+        DATABASE_PATH=os.path.join(workdir, "shared.db"),
+        GAMMA_API_BASE=base_url,
+        DATA_API_BASE=base_url,
+        DISCORD_WEBHOOK_URL=f"{base_url}/webhook",
+        EMAIL_ENABLED="false",
+        METRICS_ENABLED="false",
+        TRADE_INGESTION_MODE="poll",
+        POLL_INTERVAL_MIN_SECONDS="1",
+        POLL_INTERVAL_MAX_SECONDS="2",
+        ALERT_BATCH_WINDOW_SECONDS="0.2",
+        SHARDING_ENABLED="true",
+        SHARD_MEMBER_ID=f"shard-{index}",
+        SHARD_LEASE_TTL_SECONDS=str(args.lease_ttl),
+        SHARD_HEARTBEAT_SECONDS=str(args.lease_ttl / 4),
+        SHARD_INDEX_RELOAD_SECONDS="5",
+    )
+    instance_dir = os.path.join(workdir, f"shard-{index}")
+    os.makedirs(instance_dir, exist_ok=True)
+    log = open(os.path.join(instance_dir, "stderr.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO, "run_monitor.py")], cwd=instance_dir, env=env,
+        stdout=subprocess.DEVNULL, stderr=log
+    )
+    return process, log, instance_dir
+
+def detections(instance_dir):
+    with open(os.path.join(instance_dir, "polymarket_monitor.log"), encoding="utf-8") as f:
+        return sum("New large trade detected" in line for line in f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check exactly-once alerting across sharded monitor instances")
+    add_mock_arguments(parser)
+    parser.add_argument("--instances", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=40, help="Seconds to run in total")
+    parser.add_argument("--kill-after", type=float, default=15, help="SIGKILL the last instance after this many seconds (0: never)")
+    parser.add_argument("--lease-ttl", type=float, default=4)
+    args = parser.parse_args()
+
+    state = build_state(args)
+    server, base_url = start_mock_server(state)
+    workdir = tempfile.mkdtemp(prefix="polymarket-shards-")
+    instances = [start_instance(i, base_url, workdir, args) for i in range(args.instances)]
+    print(f"Started {args.instances} instances in {workdir}")
+
+    started = time.monotonic()
+    killed = None
+    try:
+        while time.monotonic() - started < args.duration:
+            if args.kill_after and killed is None and time.monotonic() - started >= args.kill_after:
+                killed = len(instances) - 1
+                instances[killed][0].kill()
+                print(f"Killed shard-{killed} after {args.kill_after:.0f}s")
+            time.sleep(0.5)
+    finally:
+        for process, _, _ in instances:
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+        for process, log, _ in instances:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+        server.shutdown()
+
+    conn = sqlite3.connect(os.path.join(workdir, "shared.db"))
+    recorded = {row[0] for row in conn.execute("SELECT transaction_hash FROM large_trades")}
+    pending = {row[0] for row in conn.execute("SELECT transaction_hash FROM alert_outbox WHERE status = 'pending'")}
+    conn.close()
+
+    delivered = state.webhook_transactions
+    duplicates = sorted(tx for tx, count in delivered.items() if count > 1)
+    missing = sorted(recorded - set(delivered) - pending)
+
+    for i, (_, _, instance_dir) in enumerate(instances):
+        note = " (killed)" if i == killed else ""
+        print(f"  shard-{i}: {detections(instance_dir)} detections{note}")
+    print(f"  {len(recorded)} large trades recorded, {len(delivered)} delivered, {len(pending)} still queued")
+    print(f"  {len(duplicates)} delivered more than once, {len(missing)} recorded but never delivered or queued")
+    for tx in duplicates[:10]:
+        print(f"  DUPLICATE: {tx} x{delivered[tx]}")
+    for tx in missing[:10]:
+        print(f"  MISSING: {tx}")
+    return 1 if duplicates or missing else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
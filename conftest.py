@@ -0,0 +1,17 @@
+import pytest
+from polymarket_monitor.config import Config
+from polymarket_monitor import database
+
+# test_discord.py posts to the configured webhook when run; it is not a unit test
+collect_ignore = ["test_discord.py"]
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    A fresh, migrated database in tmp_path, used through the module's shared connection.
+    """
+    monkeypatch.setattr(Config, "DATABASE_PATH", str(tmp_path / "test.db"))
+    database.close_database()
+    database.init_database()
+    yield database
+    database.close_database()
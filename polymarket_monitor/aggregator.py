@@ -0,0 +1,193 @@
+﻿import logging
+from collections import deque, OrderedDict
+from .config import Config
+from .records import parse_large_trade
+from .utils import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+class _KeyState:
+    """
+    Rolling buy-in totals for one (wallet, condition_id, outcome).
+
+    Fills are summed into fixed-width time buckets kept in one deque that covers the
+    longest window. Each window keeps a running total and the sequence number of its
+    oldest bucket, so adding a fill and expiring old buckets are O(1) amortized.
+    """
+
+    __slots__ = ("buckets", "base", "starts", "totals", "fills", "last_ts")
+
+    def __init__(self, window_count):
+        self.buckets = deque()          # [bucket_start, dollar_value, fills, last_tx_hash]
+        self.base = 0                   # sequence number of buckets[0]
+        self.starts = [0] * window_count
+        self.totals = [0.0] * window_count
+        self.fills = [0] * window_count
+        self.last_ts = 0.0
+
+    def consume(self):
+        """
+        Forget the fills counted so far in every window, once they have been alerted on.
+        """
+        self.base += len(self.buckets)
+        self.buckets.clear()
+        for i in range(len(self.starts)):
+            self.starts[i] = self.base
+            self.totals[i] = 0.0
+            self.fills[i] = 0
+
+class BuyInAggregator:
+    """
+    Detects buy-ins split into many smaller fills.
+
+    Every BUY on a monitored market is added to per-(wallet, condition_id, outcome)
+    rolling sums over each window in windows (seconds). When a sum of at least two
+    fills reaches threshold an aggregate alert is emitted and those fills are consumed
+    in every window, so one accumulation alerts once; the key alerts again only when
+    fills after the alert reach threshold on their own. Fills that alerted as large
+    trades by themselves are left out (see add_trades).
+
+    Memory is bounded: keys are kept in least-recently-updated order, idle keys are
+    dropped once their newest bucket has left the longest window, and at most
+    max_keys are tracked. Fills arriving out of order (streaming) are counted in the
+    newest bucket, so expiry is accurate to one bucket width.
+    """
+
+    def __init__(self, windows, threshold, bucket_seconds=60, max_keys=100000):
+        self.windows = sorted(windows)
+        self.longest = self.windows[-1]
+        self.threshold = threshold
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.max_keys = max_keys
+        self._keys = OrderedDict()
+        self._seen = OrderedDict()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _is_repeat(self, tx_hash):
+        # Streaming and the safety poll can deliver the same fill twice
+        if not tx_hash:
+            return False
+        if tx_hash in self._seen:
+            return True
+        self._seen[tx_hash] = None
+        if len(self._seen) > self.max_keys:
+            self._seen.popitem(last=False)
+        return False
+
+    def _expire(self, state, now):
+        for i, window in enumerate(self.windows):
+            cutoff = now - window
+            while state.starts[i] < state.base + len(state.buckets):
+                bucket = state.buckets[state.starts[i] - state.base]
+                if bucket[0] + self.bucket_seconds > cutoff:
+                    break
+                state.totals[i] -= bucket[1]
+                state.fills[i] -= bucket[2]
+                state.starts[i] += 1
+
+        # Buckets no window covers any more (the longest window is last)
+        while state.buckets and state.base < state.starts[-1]:
+            state.buckets.popleft()
+            state.base += 1
+
+    def _sweep(self, now):
+        cutoff = now - self.longest
+        while self._keys:
+            key, state = next(iter(self._keys.items()))
+            if state.last_ts > cutoff and len(self._keys) <= self.max_keys:
+                break
+            del self._keys[key]
+
+    def add(self, trade, ts):
+        """
+        Add one BUY fill. Returns (window, total, fills) for the shortest window whose
+        sum crossed the threshold, otherwise None.
+        """
+        key = (trade.wallet_address.lower(), trade.condition_id, trade.outcome)
+        state = self._keys.get(key)
+        if state is None:
+            state = self._keys[key] = _KeyState(len(self.windows))
+        else:
+            self._keys.move_to_end(key)
+
+        now = max(ts, state.last_ts)
+        bucket_start = now - now % self.bucket_seconds
+        if state.buckets and state.buckets[-1][0] >= bucket_start:
+            bucket = state.buckets[-1]
+            bucket[1] += trade.dollar_value
+            bucket[2] += 1
+            bucket[3] = trade.transaction_hash
+        else:
+            state.buckets.append([bucket_start, trade.dollar_value, 1, trade.transaction_hash])
+        for i in range(len(self.windows)):
+            state.totals[i] += trade.dollar_value
+            state.fills[i] += 1
+        state.last_ts = now
+
+        self._expire(state, now)
+        self._sweep(now)
+
+        for i, window in enumerate(self.windows):
+            if state.fills[i] >= 2 and state.totals[i] >= self.threshold:
+                crossed = window, state.totals[i], state.fills[i]
+                state.consume()
+                return crossed
+        return None
+
+    def add_trades(self, trades, monitored_markets, alerted=()):
+        """
+        Feed raw API trades and return trade_data dicts for the aggregates that
+        crossed the threshold. alerted holds the transaction hashes already matched
+        as single large trades in this batch; they are not counted again.
+        """
+        alerts = []
+        for raw in trades:
+            if raw.get("side") != "BUY":
+                continue
+            tx_hash = raw.get("transactionHash") or raw.get("id", "")
+            if tx_hash in alerted:
+                # Remember it so a later redelivery is not counted either
+                self._is_repeat(tx_hash)
+                continue
+            market_info = monitored_markets.get(raw.get("conditionId") or raw.get("market", ""))
+            if not market_info:
+                continue
+            trade = parse_large_trade(raw, 0, float("inf"))
+            if trade is None or not trade.wallet_address or self._is_repeat(trade.transaction_hash):
+                continue
+
+            crossed = self.add(trade, parse_timestamp(trade.timestamp))
+            if crossed is None:
+                continue
+            window, total, fills = crossed
+            trade_data = trade.to_alert(market_info, ["aggregate"])
+            trade_data.update({
+                "kind": "aggregate",
+                "transaction_hash": f"agg:{window}:{trade.transaction_hash}",
+                "last_transaction_hash": trade.transaction_hash,
+                "dollar_value": total,
+                "fills": fills,
+                "window_seconds": window
+            })
+            alerts.append(trade_data)
+        return alerts
+
+_aggregator = None
+
+def get_aggregator():
+    """
+    The process-wide aggregator, or None when AGGREGATION_ENABLED is off.
+    """
+    global _aggregator
+    if _aggregator is None and Config.AGGREGATION_ENABLED:
+        _aggregator = BuyInAggregator(
+            Config.AGGREGATE_WINDOWS_SECONDS,
+            Config.AGGREGATE_THRESHOLD,
+            bucket_seconds=Config.AGGREGATE_BUCKET_SECONDS,
+            max_keys=Config.AGGREGATE_MAX_KEYS
+        )
+        logger.info(f"Aggregating buy-ins over {Config.AGGREGATE_WINDOWS_SECONDS}s windows, "
+                    f"threshold ${Config.AGGREGATE_THRESHOLD:,.0f}")
+    return _aggregator
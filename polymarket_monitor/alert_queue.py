@@ -0,0 +1,205 @@
+﻿import time
+import random
+import asyncio
+import logging
+from .config import Config
+from .database import (
+    get_due_alerts, claim_due_alerts, release_alert_claims, get_next_alert_time,
+    mark_alerts_delivered, reschedule_alerts, mark_alerts_failed
+)
+from .metrics import ALERT_SEND_SECONDS, ALERTS_SENT, ALERT_FAILURES, DETECTION_LAG_SECONDS
+from .utils import parse_timestamp
+from .alerting import (
+    AlertDeliveryError, deliver_alerts, alert_batches, enabled_alert_channels, close_alert_sessions
+)
+
+logger = logging.getLogger(__name__)
+
+def retry_delay(attempts, retry_after=None):
+    """
+    Exponential backoff with jitter, or the server-requested delay when one was given.
+    """
+    if retry_after:
+        return retry_after
+    delay = min(Config.ALERT_RETRY_MAX_SECONDS, Config.ALERT_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+class AlertDispatcher:
+    """
+    Delivers alerts from the alert_outbox table with one worker task per channel.
+
+    Detection only has to write to the outbox; workers pick rows up as they become due,
+    so a slow or failing channel never blocks polling or the other channels. Rows are
+    deleted once delivered and survive restarts until then.
+
+    When woken by new alerts a worker waits ALERT_BATCH_WINDOW_SECONDS before reading the
+    outbox, so a burst of trades goes out as one Discord message (up to 10 embeds) and
+    one digest email instead of a call per trade.
+
+    Workers claim the rows they fetch (status 'sending') in the same statement, so the
+    shard leader cannot adopt rows that are mid-delivery, and fetch nothing while the
+    shard lease has lapsed: by then the other members may be adopting our alerts.
+    """
+
+    def __init__(self, channels=None, owner=None, shard=None):
+        self.channels = enabled_alert_channels() if channels is None else channels
+        # In sharded mode each instance only delivers the alerts it queued or adopted
+        self.owner = owner
+        self.shard = shard
+        self._wakeups = {channel: asyncio.Event() for channel in self.channels}
+        self._tasks = []
+
+    def notify(self):
+        for event in self._wakeups.values():
+            event.set()
+
+    def start(self):
+        if not self.channels:
+            logger.info("No alert channels configured - alerts will only be logged")
+        # Claims left by a previous run of this instance that stopped mid-send
+        released = release_alert_claims(self.owner)
+        if released:
+            logger.info(f"Released {released} alert(s) claimed by a previous run")
+        self._tasks = [asyncio.create_task(self._run_channel(channel)) for channel in self.channels]
+
+    async def stop(self, drain_timeout=10):
+        """
+        Give due alerts up to drain_timeout seconds to go out, then cancel the workers.
+        Anything left stays in the outbox for the next run.
+        """
+        deadline = time.monotonic() + drain_timeout
+        while time.monotonic() < deadline:
+            due = await asyncio.gather(*(
+                asyncio.to_thread(get_due_alerts, channel, time.time(), 1, self.owner) for channel in self.channels
+            ))
+            if not any(due):
+                break
+            await asyncio.sleep(0.2)
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.to_thread(release_alert_claims, self.owner)
+        await asyncio.to_thread(close_alert_sessions)
+
+    async def _wait_for_work(self, channel):
+        next_time = await asyncio.to_thread(get_next_alert_time, channel, self.owner)
+        timeout = Config.ALERT_IDLE_POLL_SECONDS
+        if next_time is not None:
+            timeout = min(timeout, max(0, next_time - time.time()))
+
+        wakeup = self._wakeups[channel]
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return
+        wakeup.clear()
+
+        # Let the rest of a burst land in the outbox so it is sent together
+        if Config.ALERT_BATCH_WINDOW_SECONDS > 0:
+            await asyncio.sleep(Config.ALERT_BATCH_WINDOW_SECONDS)
+
+    async def _run_channel(self, channel):
+        while True:
+            try:
+                if self.shard is not None and not self.shard.has_lease:
+                    await asyncio.sleep(Config.SHARD_HEARTBEAT_SECONDS)
+                    continue
+
+                alerts = await asyncio.to_thread(
+                    claim_due_alerts, channel, time.time(), Config.ALERT_BATCH_MAX_ALERTS, self.owner
+                )
+                if not alerts:
+                    await self._wait_for_work(channel)
+                    continue
+
+                backoff = None
+                try:
+                    for start, end in alert_batches(channel, [alert["trade"] for alert in alerts]):
+                        backoff = await self._deliver(channel, alerts[start:end])
+                        if backoff:
+                            # Failures are usually channel-wide (rate limit, SMTP down), so pause
+                            # the whole channel rather than hammering it with the rest of the batch
+                            break
+                finally:
+                    # Rows not attempted are handed back before the pause, not held through it
+                    await asyncio.to_thread(release_alert_claims, self.owner, [a["id"] for a in alerts])
+                if backoff:
+                    await asyncio.sleep(backoff)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in {channel} alert worker: {e}")
+                await asyncio.sleep(Config.ALERT_RETRY_BASE_SECONDS)
+
+    async def _deliver(self, channel, batch):
+        """
+        Try one batch as a single message. Returns the backoff delay if it was rescheduled,
+        otherwise None.
+        """
+        ids = [alert["id"] for alert in batch]
+        trades = [alert["trade"] for alert in batch]
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(deliver_alerts, channel, trades)
+        except AlertDeliveryError as e:
+            if e.retryable:
+                return await self._record_failure(channel, batch, e, e.retry_after)
+            error = e
+        except Exception as e:
+            error = e
+        else:
+            error = None
+
+        if error is not None:
+            if len(batch) > 1:
+                # Most likely one payload the formatter or the channel cannot handle; send the
+                # rows one by one so only that row fails and the rest still go out
+                logger.warning(f"{channel} batch of {len(batch)} failed ({error!r}), retrying one by one")
+                for alert in batch:
+                    delay = await self._deliver(channel, [alert])
+                    if delay:
+                        return delay
+                return None
+            if isinstance(error, AlertDeliveryError):
+                # Rejected as is, so another attempt would be rejected too
+                logger.error(f"Giving up on {channel} alert {batch[0]['id']}: {error}")
+                ALERT_FAILURES.inc(channel=channel)
+                await asyncio.to_thread(mark_alerts_failed, [batch[0]["id"]], str(error))
+                return None
+            logger.error(f"Unexpected error delivering {channel} alert {batch[0]['id']}: {error!r}")
+            # The row waits out its own backoff; the channel itself is fine
+            await self._record_failure(channel, batch, error)
+            return None
+
+        ALERT_SEND_SECONDS.observe(time.perf_counter() - started, channel=channel)
+        ALERTS_SENT.inc(len(trades), channel=channel)
+        now = time.time()
+        for trade in trades:
+            traded_at = parse_timestamp(trade.get("timestamp", 0))
+            if traded_at:
+                DETECTION_LAG_SECONDS.observe(max(0.0, now - traded_at), channel=channel)
+
+        await asyncio.to_thread(mark_alerts_delivered, ids)
+        return None
+
+    async def _record_failure(self, channel, batch, error, retry_after=None):
+        """
+        Count a failed attempt for every row of batch: rows out of attempts are marked
+        failed, the others rescheduled. Returns the backoff delay, or None.
+        """
+        ALERT_FAILURES.inc(channel=channel)
+        attempts = [(alert["id"], alert["attempts"] + 1) for alert in batch]
+        exhausted = [i for i, n in attempts if n >= Config.ALERT_MAX_ATTEMPTS]
+        retry = [(i, n) for i, n in attempts if n < Config.ALERT_MAX_ATTEMPTS]
+
+        if exhausted:
+            logger.error(f"Giving up on {len(exhausted)} {channel} alert(s) after {Config.ALERT_MAX_ATTEMPTS} attempts: {error}")
+            await asyncio.to_thread(mark_alerts_failed, exhausted, str(error))
+        if not retry:
+            return None
+
+        delay = retry_delay(max(n for _, n in retry), retry_after)
+        logger.warning(f"{channel} alert batch of {len(retry)} failed ({error}), retrying in {delay:.1f}s")
+        await asyncio.to_thread(reschedule_alerts, retry, time.time() + delay, str(error))
+        return delay
@@ -1,70 +1,181 @@
 ﻿import requests
 import logging
 import smtplib
-import urllib3
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from .config import Config
+from .http_client import http_post
+from .metrics import track_request
 from .utils import truncate_address, format_currency, format_percentage, format_timestamp
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
 logger = logging.getLogger(__name__)
 
-def send_email_alert(trade_data):
-    if not Config.EMAIL_ENABLED or not Config.SMTP_PASSWORD:
-        return False
+# Discord rejects webhook messages with more than 10 embeds, or whose embeds
+# together have more than 6000 characters of text
+DISCORD_MAX_EMBEDS = 10
+DISCORD_MAX_EMBED_CHARS = 6000
+
+# Statuses meaning Discord refused the message itself; sending it again cannot help
+DISCORD_PAYLOAD_ERRORS = (400, 413, 422)
+
+class AlertDeliveryError(Exception):
+    """
+    Raised when a channel fails to deliver an alert. retry_after carries the delay the
+    remote side asked for (Discord 429), if any. retryable is False when the message
+    itself was rejected, as opposed to the channel being unavailable.
+    """
+
+    def __init__(self, message, retry_after=None, retryable=True):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+class EmailSender:
+    """
+    Keeps one authenticated SMTP session open across alerts and reconnects when it drops.
+    """
+
+    def __init__(self):
+        self._server = None
+
+    def _connect(self):
+        server = smtplib.SMTP(Config.SMTP_HOST, Config.SMTP_PORT, timeout=Config.SMTP_TIMEOUT_SECONDS)
+        server.starttls()
+        server.login(Config.SMTP_USER, Config.SMTP_PASSWORD)
+        self._server = server
+
+    def send(self, msg):
+        for attempt in range(2):
+            if self._server is None:
+                self._connect()
+            try:
+                self._server.sendmail(Config.SMTP_USER, Config.ALERT_EMAIL, msg.as_string())
+                return
+            except smtplib.SMTPServerDisconnected:
+                # Session timed out on the server side; reconnect once
+                self._server = None
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except smtplib.SMTPException:
+                pass
+            self._server = None
+
+_email_sender = EmailSender()
+
+def close_alert_sessions():
+    _email_sender.close()
+
+def enabled_alert_channels():
+    channels = []
+    if Config.DISCORD_WEBHOOK_URL:
+        channels.append("discord")
+    if Config.EMAIL_ENABLED and Config.SMTP_PASSWORD:
+        channels.append("email")
+    return channels
+
+def format_aggregate_line(trade_data):
+    if trade_data.get("kind") != "aggregate":
+        return ""
+    return f"\nAggregated: {trade_data.get('fills', 0)} buys within {trade_data.get('window_seconds', 0) // 60} min"
+
+def format_wallet_profile(profile):
+    """
+    One line on the trader's history before this trade, from the "wallet_profile" the
+    monitor attached (local profiles only know the wallet's earlier large trades).
+    """
+    if not profile.get("trade_count"):
+        return "New wallet (no earlier trades seen)"
     
+    count = profile["trade_count"]
+    kind = "trade" if profile.get("source") == "api" else "large trade"
+    text = f"{count} {kind}{'' if count == 1 else 's'}"
+    if profile.get("first_seen"):
+        text += f" since {format_timestamp(profile['first_seen'])[:10]}"
+    text += f", {format_currency(profile.get('total_volume') or 0)} volume"
+    if profile.get("win_rate") is not None:
+        text += f", {format_percentage(profile['win_rate'])} won of {profile.get('resolved', 0)} resolved"
+    return text
+
+def format_wallet_line(trade_data):
+    if not trade_data.get("wallet_profile"):
+        return ""
+    return f"\nWallet: {format_wallet_profile(trade_data['wallet_profile'])}"
+
+def format_email_body(trade_data):
     market_url = f"https://polymarket.com/event/{trade_data.get('slug', '')}"
-    tx_hash = trade_data.get('transaction_hash', '')
+    # Aggregates link the fill that crossed the threshold
+    tx_hash = trade_data.get('last_transaction_hash') or trade_data.get('transaction_hash', '')
     polygonscan_url = f"https://polygonscan.com/tx/{tx_hash}" if tx_hash else ""
     
-    subject = f"Polymarket Alert: {format_currency(trade_data.get('dollar_value', 0))} trade detected"
-    
-    body = f"""
-Large Buy-In Detected on Polymarket
-
+    return f"""
 Market: {trade_data.get('market_title', 'Unknown')}
 Current Probability: {format_percentage(trade_data.get('current_probability', 0))}
 Trade Side: {trade_data.get('side', 'UNKNOWN')}
 Outcome: {trade_data.get('outcome', 'Unknown')}
 Trade Size: {format_currency(trade_data.get('dollar_value', 0))}
 Price: 
-Trader: {truncate_address(trade_data.get('wallet_address', ''))}
+Trader: {truncate_address(trade_data.get('wallet_address', ''))}{format_wallet_line(trade_data)}
 Time: {format_timestamp(trade_data.get('timestamp', ''))}
+Rules: {', '.join(trade_data.get('rules', [])) or 'default'}{format_aggregate_line(trade_data)}
 
 View Market: {market_url}
 View Transaction: {polygonscan_url}
 """
+
+def build_email_message(trades):
+    """
+    Build one email for a burst of trades; a single trade keeps the original subject line.
+    """
+    if len(trades) == 1:
+        subject = f"Polymarket Alert: {format_currency(trades[0].get('dollar_value', 0))} trade detected"
+        body = "\nLarge Buy-In Detected on Polymarket\n" + format_email_body(trades[0])
+    else:
+        total = sum(t.get('dollar_value', 0) for t in trades)
+        subject = f"Polymarket Alert: {len(trades)} trades detected ({format_currency(total)} total)"
+        body = f"\n{len(trades)} Large Buy-Ins Detected on Polymarket\n" + "\n----------------------------------------\n".join(
+            format_email_body(t) for t in trades
+        )
     
     msg = MIMEMultipart()
     msg['From'] = Config.SMTP_USER
     msg['To'] = Config.ALERT_EMAIL
     msg['Subject'] = subject
     msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+def deliver_email_alerts(trades):
+    try:
+        _email_sender.send(build_email_message(trades))
+    except (smtplib.SMTPException, OSError) as e:
+        _email_sender.close()
+        raise AlertDeliveryError(f"Failed to send email alert: {e}")
+    logger.info(f"Email alert for {len(trades)} trade(s) sent to {Config.ALERT_EMAIL}")
+
+def send_email_alert(trade_data):
+    if not Config.EMAIL_ENABLED or not Config.SMTP_PASSWORD:
+        return False
     
     try:
-        server = smtplib.SMTP(Config.SMTP_HOST, Config.SMTP_PORT)
-        server.starttls()
-        server.login(Config.SMTP_USER, Config.SMTP_PASSWORD)
-        server.sendmail(Config.SMTP_USER, Config.ALERT_EMAIL, msg.as_string())
-        server.quit()
-        logger.info(f"Email alert sent to {Config.ALERT_EMAIL}")
+        deliver_email_alerts([trade_data])
         return True
-    except Exception as e:
-        logger.error(f"Failed to send email alert: {e}")
+    except AlertDeliveryError as e:
+        logger.error(str(e))
         return False
 
-def send_discord_alert(trade_data):
-    if not Config.DISCORD_WEBHOOK_URL:
-        return False
-    
+def build_discord_embed(trade_data):
     market_url = f"https://polymarket.com/event/{trade_data.get('slug', '')}"
-    tx_hash = trade_data.get('transaction_hash', '')
+    # Aggregates link the fill that crossed the threshold
+    tx_hash = trade_data.get('last_transaction_hash') or trade_data.get('transaction_hash', '')
     polygonscan_url = f"https://polygonscan.com/tx/{tx_hash}" if tx_hash else None
     
+    aggregate = trade_data.get("kind") == "aggregate"
     embed = {
-        "title": "Large Buy-In Detected",
+        "title": "Aggregated Buy-In Detected" if aggregate else "Large Buy-In Detected",
         "color": 15158332,
         "fields": [
             {"name": "Market", "value": trade_data.get("market_title", "Unknown")[:256], "inline": False},
@@ -81,6 +192,20 @@ def send_discord_alert(trade_data):
     if trade_data.get("slug"):
         embed["url"] = market_url
     
+    if aggregate:
+        embed["fields"].append({
+            "name": "Fills",
+            "value": f"{trade_data.get('fills', 0)} buys within {trade_data.get('window_seconds', 0) // 60} min",
+            "inline": True
+        })
+    
+    if trade_data.get("wallet_profile"):
+        embed["fields"].append({"name": "Wallet", "value": format_wallet_profile(trade_data["wallet_profile"]), "inline": False})
+    
+    rules = [r for r in trade_data.get("rules", []) if r not in ("default", "aggregate")]
+    if rules:
+        embed["fields"].append({"name": "Matched Rules", "value": ", ".join(rules)[:1024], "inline": False})
+    
     links = []
     if trade_data.get("slug"):
         links.append(f"[View Market]({market_url})")
@@ -89,14 +214,101 @@ def send_discord_alert(trade_data):
     if links:
         embed["fields"].append({"name": "Links", "value": " | ".join(links), "inline": False})
     
+    return embed
+
+def discord_embed_length(embed):
+    """
+    The characters Discord counts against DISCORD_MAX_EMBED_CHARS for one embed.
+    """
+    fields = embed.get("fields", [])
+    return (len(embed.get("title", "")) + len(embed.get("description", ""))
+            + len(embed.get("footer", {}).get("text", "")) + len(embed.get("author", {}).get("name", ""))
+            + sum(len(field["name"]) + len(field["value"]) for field in fields))
+
+def post_discord_embeds(embeds):
+    try:
+        with track_request("discord_webhook"):
+            response = http_post(
+                Config.DISCORD_WEBHOOK_URL, json={"embeds": embeds},
+                timeout=(Config.HTTP_CONNECT_TIMEOUT_SECONDS, 10)
+            )
+    except requests.RequestException as e:
+        raise AlertDeliveryError(f"Failed to send Discord alert: {e}")
+    
+    if response.status_code == 429:
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        # Discord sends a JSON object; anything else (or a bad value) falls back to the header
+        retry_after = body.get("retry_after") if isinstance(body, dict) else None
+        try:
+            retry_after = float(retry_after if retry_after is not None else response.headers.get("Retry-After") or 0)
+        except (TypeError, ValueError):
+            retry_after = 0.0
+        raise AlertDeliveryError("Discord rate limit hit", retry_after=retry_after)
+    
+    if response.status_code in DISCORD_PAYLOAD_ERRORS:
+        raise AlertDeliveryError(
+            f"Discord rejected the alert ({response.status_code}): {response.text[:200]}", retryable=False
+        )
+    
     try:
-        response = requests.post(Config.DISCORD_WEBHOOK_URL, json={"embeds": [embed]}, timeout=10, verify=False)
         response.raise_for_status()
-        logger.info(f"Discord alert sent for trade: {tx_hash[:16]}...")
-        return True
     except requests.RequestException as e:
-        logger.error(f"Failed to send Discord alert: {e}")
+        raise AlertDeliveryError(f"Failed to send Discord alert: {e}")
+
+def deliver_discord_alerts(trades):
+    """
+    Post up to DISCORD_MAX_EMBEDS trades as embeds of a single webhook message.
+    """
+    post_discord_embeds([build_discord_embed(t) for t in trades[:DISCORD_MAX_EMBEDS]])
+    logger.info(f"Discord alert sent for {len(trades)} trade(s): {trades[0].get('transaction_hash', '')[:16]}...")
+
+def send_discord_alert(trade_data):
+    if not Config.DISCORD_WEBHOOK_URL:
         return False
+    
+    try:
+        deliver_discord_alerts([trade_data])
+        return True
+    except AlertDeliveryError as e:
+        logger.error(str(e))
+        return False
+
+ALERT_CHANNELS = {
+    "discord": deliver_discord_alerts,
+    "email": deliver_email_alerts,
+}
+
+def alert_batch_size(channel):
+    return DISCORD_MAX_EMBEDS if channel == "discord" else Config.ALERT_EMAIL_MAX_TRADES
+
+def alert_batches(channel, trades):
+    """
+    Split trades into (start, end) ranges that each fit in one message: at most
+    alert_batch_size(channel) trades, and for Discord at most DISCORD_MAX_EMBED_CHARS
+    of embed text.
+    """
+    size = alert_batch_size(channel)
+    if channel != "discord":
+        return [(i, min(i + size, len(trades))) for i in range(0, len(trades), size)]
+
+    batches = []
+    start = 0
+    chars = 0
+    for i, trade in enumerate(trades):
+        length = discord_embed_length(build_discord_embed(trade))
+        if i > start and (i - start >= size or chars + length > DISCORD_MAX_EMBED_CHARS):
+            batches.append((start, i))
+            start, chars = i, 0
+        chars += length
+    if start < len(trades):
+        batches.append((start, len(trades)))
+    return batches
+
+def deliver_alerts(channel, trades):
+    ALERT_CHANNELS[channel](trades)
 
 def send_alerts(trades):
     success_count = 0
@@ -0,0 +1,379 @@
+﻿"""
+Read-only analytics over the monitor's database, meant to run while it is writing.
+
+    serve   local HTTP query API over large_trades and markets, keyset-paginated
+    export  stream large_trades or markets to a Parquet (needs pyarrow) or CSV file
+
+Both run in their own process on read-only connections, never through the monitor's
+shared connection and lock. Every page or export chunk is one short SELECT walking
+an index from the previous key, so no read holds a snapshot open for long and a
+single query is cut off after ANALYTICS_QUERY_TIMEOUT_SECONDS.
+
+    GET /trades?market=&wallet=&category=&since=&until=&min_value=&limit=&cursor=
+    GET /markets?category=&active=&limit=&cursor=
+
+Responses are {"items": [...], "next_cursor": ...}; pass next_cursor back as cursor
+to get the next page, until it is null. Trades are newest first.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import queue
+import sqlite3
+import logging
+import argparse
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .config import Config
+from .database import open_read_connection
+from .utils import parse_timestamp
+
+# Optional: Parquet export; CSV is always available
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# (column, type) in output order; timestamps are normalized to epoch seconds
+TRADE_COLUMNS = [
+    ("id", "int"), ("condition_id", "str"), ("market_title", "str"), ("category", "str"),
+    ("side", "str"), ("size", "float"), ("price", "float"), ("dollar_value", "float"),
+    ("outcome", "str"), ("wallet_address", "str"), ("transaction_hash", "str"),
+    ("timestamp", "float"), ("detected_at", "str")
+]
+
+MARKET_COLUMNS = [
+    ("condition_id", "str"), ("title", "str"), ("slug", "str"), ("category", "str"),
+    ("current_probability", "float"), ("outcome", "str"), ("active", "bool"), ("last_updated", "str")
+]
+
+SELECT_TRADES_SQL = '''
+    SELECT t.id, t.condition_id, t.market_title, m.category, t.side, t.size, t.price, t.dollar_value,
+           t.outcome, t.wallet_address, t.transaction_hash, t.timestamp, t.detected_at
+    FROM large_trades t LEFT JOIN markets m ON m.condition_id = t.condition_id
+'''
+
+SELECT_MARKETS_SQL = '''
+    SELECT condition_id, title, slug, category, current_probability, outcome, active, last_updated
+    FROM markets
+'''
+
+class QueryError(ValueError):
+    """
+    Raised for a request parameter that cannot be used; answered with 400.
+    """
+
+def _trade_row(row):
+    row = list(row)
+    row[11] = parse_timestamp(row[11]) or None
+    return row
+
+def _market_row(row):
+    row = list(row)
+    row[6] = bool(row[6])
+    return row
+
+def _time_param(params, name):
+    value = params[name]
+    timestamp = parse_timestamp(value)
+    if not timestamp and value.strip() != "0":
+        raise QueryError(f"{name} must be epoch seconds or ISO 8601, got '{value}'")
+    return timestamp
+
+def _number_param(params, name, cast=float):
+    try:
+        return cast(params[name])
+    except ValueError:
+        raise QueryError(f"{name} must be a number, got '{params[name]}'")
+
+def trade_filters(params):
+    """
+    Return (WHERE clauses, arguments) for the trade filters present in params.
+    """
+    clauses = []
+    args = []
+    for name, clause in (("market", "t.condition_id = ?"), ("wallet", "t.wallet_address = ?"),
+                         ("category", "m.category = ?")):
+        if params.get(name):
+            clauses.append(clause)
+            args.append(params[name])
+    if params.get("since"):
+        clauses.append("t.timestamp >= ?")
+        args.append(_time_param(params, "since"))
+    if params.get("until"):
+        clauses.append("t.timestamp < ?")
+        args.append(_time_param(params, "until"))
+    if params.get("min_value"):
+        clauses.append("t.dollar_value >= ?")
+        args.append(_number_param(params, "min_value"))
+    return clauses, args
+
+def page_limit(params):
+    if not params.get("limit"):
+        return Config.ANALYTICS_PAGE_SIZE
+    limit = _number_param(params, "limit", int)
+    if not 1 <= limit <= Config.ANALYTICS_MAX_PAGE_SIZE:
+        raise QueryError(f"limit must be between 1 and {Config.ANALYTICS_MAX_PAGE_SIZE}")
+    return limit
+
+def _page(rows, limit, key):
+    # One row past the limit tells whether another page exists
+    items = rows[:limit]
+    next_cursor = key(items[-1]) if len(rows) > limit else None
+    return items, next_cursor
+
+def query_trades(conn, params):
+    """
+    One page of large trades, newest first, keyed on id.
+    """
+    clauses, args = trade_filters(params)
+    if params.get("cursor"):
+        clauses.append("t.id < ?")
+        args.append(_number_param(params, "cursor", int))
+    limit = page_limit(params)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(f"{SELECT_TRADES_SQL} {where} ORDER BY t.id DESC LIMIT ?", args + [limit + 1]).fetchall()
+
+    items, next_cursor = _page(rows, limit, lambda row: row[0])
+    names = [name for name, _ in TRADE_COLUMNS]
+    return {"items": [dict(zip(names, _trade_row(row))) for row in items], "next_cursor": next_cursor}
+
+def query_markets(conn, params):
+    """
+    One page of markets in condition_id order.
+    """
+    clauses = []
+    args = []
+    if params.get("category"):
+        clauses.append("category = ?")
+        args.append(params["category"])
+    if params.get("active"):
+        clauses.append("active = ?")
+        args.append(1 if params["active"].lower() in ("1", "true") else 0)
+    if params.get("cursor"):
+        clauses.append("condition_id > ?")
+        args.append(params["cursor"])
+    limit = page_limit(params)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(f"{SELECT_MARKETS_SQL} {where} ORDER BY condition_id LIMIT ?", args + [limit + 1]).fetchall()
+
+    items, next_cursor = _page(rows, limit, lambda row: row[0])
+    names = [name for name, _ in MARKET_COLUMNS]
+    return {"items": [dict(zip(names, _market_row(row))) for row in items], "next_cursor": next_cursor}
+
+ROUTES = {"/trades": query_trades, "/markets": query_markets}
+
+class ReadPool:
+    """
+    A fixed set of read-only connections shared by the request threads.
+    """
+
+    def __init__(self, path, size, timeout):
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        for _ in range(max(1, size)):
+            self._idle.put(open_read_connection(path, Config.ANALYTICS_CACHE_SIZE_KB))
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        deadline = time.monotonic() + self.timeout
+        # A true return value interrupts the running statement
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+        try:
+            yield conn
+        finally:
+            conn.set_progress_handler(None, 0)
+            self._idle.put(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    pool = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        route = ROUTES.get(parts.path)
+        if route is None:
+            return self._send_json(404, {"error": f"unknown path {parts.path}; use {', '.join(ROUTES)}"})
+
+        params = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+        try:
+            with self.pool.connection() as conn:
+                payload = route(conn, params)
+        except QueryError as e:
+            return self._send_json(400, {"error": str(e)})
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Query {self.path} failed: {e}")
+            error = "query timed out" if "interrupted" in str(e) else str(e)
+            return self._send_json(503, {"error": error})
+        self._send_json(200, payload)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+def start_query_server(host, port, pool):
+    server = ThreadingHTTPServer((host, port), type("QueryHandler", (_QueryHandler,), {"pool": pool}))
+    server.daemon_threads = True
+    return server
+
+def run_serve(args):
+    pool = ReadPool(args.database, Config.ANALYTICS_READ_CONNECTIONS, Config.ANALYTICS_QUERY_TIMEOUT_SECONDS)
+    server = start_query_server(args.host, args.port, pool)
+    logger.info(f"Query API at http://{args.host}:{server.server_address[1]} ({', '.join(ROUTES)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+    return 0
+
+def _iter_market_chunks(conn, chunk_size):
+    last = ""
+    while True:
+        rows = conn.execute(f"{SELECT_MARKETS_SQL} WHERE condition_id > ? ORDER BY condition_id LIMIT ?",
+                            (last, chunk_size)).fetchall()
+        if not rows:
+            return
+        yield [_market_row(row) for row in rows]
+        last = rows[-1][0]
+
+def iter_export_chunks(conn, table, chunk_size, params=None):
+    """
+    Yield lists of normalized rows, chunk_size at a time, each chunk read by its own
+    keyset query. large_trades stops at the newest id present when the export began.
+    """
+    if table == "markets":
+        yield from _iter_market_chunks(conn, chunk_size)
+        return
+
+    clauses, args = trade_filters(params or {})
+    where = "".join(f" AND {clause}" for clause in clauses)
+    last, newest = 0, conn.execute("SELECT COALESCE(MAX(id), 0) FROM large_trades").fetchone()[0]
+    while True:
+        rows = conn.execute(f"{SELECT_TRADES_SQL} WHERE t.id > ? AND t.id <= ?{where} ORDER BY t.id LIMIT ?",
+                            [last, newest] + args + [chunk_size]).fetchall()
+        if not rows:
+            return
+        yield [_trade_row(row) for row in rows]
+        last = rows[-1][0]
+
+class CsvWriter:
+    def __init__(self, path, columns):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+class ParquetWriter:
+    """
+    Writes each chunk as its own row group, so memory stays at one chunk.
+    """
+
+    def __init__(self, path, columns):
+        if pyarrow is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow); use --format csv without it")
+        types = {"int": pyarrow.int64(), "float": pyarrow.float64(), "str": pyarrow.string(), "bool": pyarrow.bool_()}
+        self._schema = pyarrow.schema([(name, types[kind]) for name, kind in columns])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, rows):
+        arrays = [pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), self._schema)]
+        self._writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter}
+
+def export_table(conn, table, path, fmt, chunk_size, params=None):
+    """
+    Stream table into path and return the number of rows written. The file is
+    written under a temporary name and only moved into place once complete.
+    """
+    columns = MARKET_COLUMNS if table == "markets" else TRADE_COLUMNS
+    partial = f"{path}.partial"
+    writer = WRITERS[fmt](partial, columns)
+    count = 0
+    try:
+        for rows in iter_export_chunks(conn, table, chunk_size, params):
+            writer.write(rows)
+            count += len(rows)
+    except BaseException:
+        writer.close()
+        os.remove(partial)
+        raise
+    writer.close()
+    os.replace(partial, path)
+    return count
+
+def run_export(args):
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "parquet")
+    params = {"since": args.since, "until": args.until, "category": args.category, "min_value": args.min_value}
+    conn = open_read_connection(args.database, Config.ANALYTICS_CACHE_SIZE_KB)
+    started = time.monotonic()
+    try:
+        count = export_table(conn, args.table, args.output, fmt, args.chunk_size, params)
+    except (RuntimeError, QueryError) as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        conn.close()
+    logger.info(f"Exported {count} {args.table} rows to {args.output} ({fmt}) in {time.monotonic() - started:.1f}s")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Read-only queries and exports over the monitor database")
+    parser.add_argument("--database", default=Config.DATABASE_PATH, help="SQLite file (default: DATABASE_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Serve the read-only query API")
+    serve.add_argument("--host", default=Config.ANALYTICS_HOST)
+    serve.add_argument("--port", type=int, default=Config.ANALYTICS_PORT)
+    serve.set_defaults(func=run_serve)
+
+    export = commands.add_parser("export", help="Stream a table to a columnar file")
+    export.add_argument("table", choices=["large_trades", "markets"])
+    export.add_argument("--output", required=True, help="File to write (.parquet or .csv)")
+    export.add_argument("--format", choices=sorted(WRITERS), help="Default: from the file extension, else parquet")
+    export.add_argument("--chunk-size", type=int, default=50000, help="Rows read and written per chunk")
+    export.add_argument("--since", help="large_trades only: trades at or after (ISO 8601 or epoch seconds)")
+    export.add_argument("--until", help="large_trades only: trades before")
+    export.add_argument("--category", help="large_trades only: markets of this category")
+    export.add_argument("--min-value", help="large_trades only: smallest dollar value")
+    export.set_defaults(func=run_export)
+    return parser
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = build_parser().parse_args(argv)
+    if not os.path.exists(args.database):
+        logger.error(f"Database {args.database} does not exist")
+        return 1
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
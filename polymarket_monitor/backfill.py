@@ -0,0 +1,261 @@
+﻿"""
+Offline tools for the large_trades pipeline.
+
+    backfill  fetch historical trades for a time range into recorded_trades
+    replay    run recorded trades through the detection rules, optionally paced
+    vacuum    rewrite the database file to reclaim free pages (monitor stopped)
+
+Backfill pages /trades per market concurrently and records its progress in
+monitor_state, so an interrupted run picks up where it stopped. Replay never
+touches large_trades or the alert outbox; matches are summarized and can be
+written to a JSON lines file for threshold tuning.
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+import requests
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .config import Config
+from .database import (
+    init_database, close_database, vacuum_database, transaction, get_state, set_state,
+    get_active_markets, get_monitored_markets,
+    insert_recorded_trades, count_recorded_trades, iter_recorded_trades
+)
+from .http_client import http_get, response_json, close_http_sessions
+from .metrics import track_request
+from .rules import RuleEngine, get_rule_engine
+from .aggregator import BuyInAggregator
+from .records import Market
+from .trade_monitor import match_large_trades
+from .utils import parse_timestamp, classify_market_category
+
+logger = logging.getLogger(__name__)
+
+def recorded_row(trade):
+    return (
+        trade.get("transactionHash") or trade.get("id", ""),
+        trade.get("conditionId") or trade.get("market", ""),
+        trade.get("proxyWallet") or trade.get("maker", ""),
+        trade.get("side"),
+        float(trade.get("size") or 0),
+        float(trade.get("price") or 0),
+        trade.get("outcome") or "",
+        parse_timestamp(trade.get("timestamp", 0)),
+        trade.get("title"),
+        trade.get("slug")
+    )
+
+def backfill_market(condition_id, start, end, min_value, page_size):
+    """
+    Page through one market's trades (newest first) until the range start, storing
+    the ones inside [start, end). Returns the number of new rows.
+    """
+    key = f"backfill:{condition_id}:{int(start)}:{int(end)}:{int(min_value)}"
+    progress = get_state(key)
+    if progress == "done":
+        return 0
+
+    # New trades only push older ones to higher offsets, so resuming at the saved
+    # offset can re-read a few rows (ignored as duplicates) but never skips any
+    offset = int(progress or 0)
+    inserted = 0
+    while True:
+        params = {
+            "market": condition_id,
+            "limit": page_size,
+            "offset": offset,
+            "filterType": "CASH",
+            "filterAmount": min_value
+        }
+        with track_request("data_trades_backfill"):
+            response = http_get(f"{Config.DATA_API_BASE}/trades", params=params)
+            response.raise_for_status()
+        page = response_json(response)
+
+        timestamps = [parse_timestamp(t.get("timestamp", 0)) for t in page]
+        rows = [recorded_row(t) for t, ts in zip(page, timestamps) if start <= ts < end]
+        offset += len(page)
+        done = len(page) < page_size or min(timestamps) < start
+
+        with transaction():
+            inserted += insert_recorded_trades(rows)
+            set_state(key, "done" if done else str(offset))
+        if done:
+            return inserted
+
+def run_backfill(args):
+    start, end = parse_timestamp(args.start), parse_timestamp(args.end)
+    condition_ids = args.markets or sorted({m["condition_id"] for m in get_active_markets()})
+    if not condition_ids:
+        logger.error("No markets to backfill: pass --markets or run market discovery first")
+        return 1
+
+    logger.info(f"Backfilling {len(condition_ids)} markets from {args.start} to {args.end} "
+                f"(trades >= ${args.min_value:,.0f}, {args.workers} workers)")
+    started = time.perf_counter()
+    total = 0
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(backfill_market, cid, start, end, args.min_value, args.page_size): cid
+            for cid in condition_ids
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            condition_id = futures[future]
+            try:
+                total += future.result()
+            except requests.RequestException as e:
+                failed.append(condition_id)
+                logger.warning(f"Backfill of {condition_id} stopped, rerun to resume: {e}")
+            if done % 50 == 0:
+                logger.info(f"{done}/{len(condition_ids)} markets, {total} new trades")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Backfill finished in {elapsed:.1f}s: {total} new trades, "
+                f"{count_recorded_trades(start, end)} recorded in range, {len(failed)} markets incomplete")
+    return 1 if failed else 0
+
+class _ReplayDedup:
+    def __init__(self):
+        self.seen = set()
+
+    def is_processed(self, tx_hash):
+        return tx_hash in self.seen
+
+    def add(self, tx_hash):
+        self.seen.add(tx_hash)
+
+def _market_from_trade(trade):
+    title = trade.get("title") or "Unknown"
+    slug = trade.get("slug") or ""
+    return Market(
+        trade["conditionId"], title, slug,
+        classify_market_category({"question": title, "slug": slug}),
+        {trade.get("outcome") or "": float(trade.get("price") or 0)}
+    )
+
+def _batches(trades, size):
+    batch = []
+    for trade in trades:
+        batch.append(trade)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def run_replay(args):
+    start, end = parse_timestamp(args.start), parse_timestamp(args.end)
+    rule_index = RuleEngine(args.rules).current() if args.rules else get_rule_engine().current()
+    markets = Market.from_rows(get_monitored_markets())
+    aggregator = None
+    if Config.AGGREGATION_ENABLED:
+        aggregator = BuyInAggregator(
+            Config.AGGREGATE_WINDOWS_SECONDS, Config.AGGREGATE_THRESHOLD,
+            bucket_seconds=Config.AGGREGATE_BUCKET_SECONDS, max_keys=Config.AGGREGATE_MAX_KEYS
+        )
+
+    total = count_recorded_trades(start, end)
+    logger.info(f"Replaying {total} recorded trades against {len(rule_index)} rule(s), "
+                f"{'all markets' if args.all_markets else f'{len(markets)} monitored markets'}"
+                f"{f' at {args.speed}x' if args.speed else ''}")
+
+    dedup = _ReplayDedup()
+    per_rule = Counter()
+    replayed = 0
+    matches = []
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    wall_start = time.perf_counter()
+    first_ts = None
+
+    try:
+        for batch in _batches(iter_recorded_trades(start, end), args.batch_size):
+            if first_ts is None:
+                first_ts = batch[0]["timestamp"]
+            if args.speed:
+                # Hold each batch until its trades are due at the requested speed
+                due = (batch[-1]["timestamp"] - first_ts) / args.speed
+                ahead = due - (time.perf_counter() - wall_start)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+            if args.all_markets:
+                for trade in batch:
+                    if trade["conditionId"] not in markets:
+                        markets[trade["conditionId"]] = _market_from_trade(trade)
+
+            found = match_large_trades(batch, markets, dedup, rule_index)
+            if aggregator is not None:
+                found.extend(aggregator.add_trades(batch, markets, {t["transaction_hash"] for t in found}))
+            for trade_data in found:
+                dedup.add(trade_data["transaction_hash"])
+                per_rule.update(trade_data.get("rules", []))
+                if output:
+                    output.write(json.dumps(trade_data) + "\n")
+            matches.extend(found)
+            replayed += len(batch)
+    finally:
+        if output:
+            output.close()
+
+    elapsed = time.perf_counter() - wall_start
+    span = (batch[-1]["timestamp"] - first_ts) if replayed else 0
+    logger.info(f"Replayed {replayed} trades in {elapsed:.2f}s ({replayed / max(elapsed, 1e-9):,.0f} trades/s, "
+                f"{span / max(elapsed, 1e-9):,.0f}x real time)")
+    logger.info(f"{len(matches)} alert(s): " + (", ".join(f"{r}={n}" for r, n in per_rule.most_common()) or "none"))
+    for trade_data in sorted(matches, key=lambda t: t["dollar_value"], reverse=True)[:args.top]:
+        logger.info(f"  ${trade_data['dollar_value']:>14,.2f}  {trade_data['side']:<4} {trade_data['market_title'][:70]}")
+    return 0
+
+def run_vacuum(args):
+    started = time.perf_counter()
+    before, after = vacuum_database()
+    logger.info(f"Vacuumed {Config.DATABASE_PATH} in {time.perf_counter() - started:.1f}s: "
+                f"{before} -> {after} pages")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Backfill and replay Polymarket trades offline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser("backfill", help="Fetch historical trades into recorded_trades")
+    backfill.add_argument("--start", required=True, help="Range start (ISO 8601 or epoch seconds)")
+    backfill.add_argument("--end", default=str(time.time()), help="Range end, exclusive (default: now)")
+    backfill.add_argument("--markets", nargs="*", help="Condition IDs (default: all active markets in the database)")
+    backfill.add_argument("--min-value", type=float, default=1000, help="Smallest trade to fetch in dollars")
+    backfill.add_argument("--workers", type=int, default=4, help="Markets fetched concurrently")
+    backfill.add_argument("--page-size", type=int, default=500, help="Trades per request")
+    backfill.set_defaults(func=run_backfill)
+
+    replay = commands.add_parser("replay", help="Run recorded trades through the detection rules")
+    replay.add_argument("--start", default="0", help="Range start (ISO 8601 or epoch seconds)")
+    replay.add_argument("--end", default=str(time.time()), help="Range end, exclusive (default: now)")
+    replay.add_argument("--speed", type=float, default=0, help="Replay at this multiple of real time (default: as fast as possible)")
+    replay.add_argument("--rules", help="Rules file to evaluate instead of ALERT_RULES_PATH")
+    replay.add_argument("--all-markets", action="store_true",
+                        help="Treat every recorded market as monitored (title, category and price taken from its trades)")
+    replay.add_argument("--output", help="Write matched alerts to this JSON lines file")
+    replay.add_argument("--batch-size", type=int, default=1000, help="Trades per detection batch")
+    replay.add_argument("--top", type=int, default=10, help="Largest matches to list")
+    replay.set_defaults(func=run_replay)
+
+    vacuum = commands.add_parser("vacuum", help="Rewrite the database to reclaim free pages; stop the monitor first")
+    vacuum.set_defaults(func=run_vacuum)
+    return parser
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = build_parser().parse_args(argv)
+    init_database()
+    try:
+        return args.func(args)
+    finally:
+        close_http_sessions()
+        close_database()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,17 @@ class Config:
     SMTP_USER = os.getenv("SMTP_USER", "")
     SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
     ALERT_EMAIL = os.getenv("ALERT_EMAIL", "")
+    SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+
+    # Alert outbox delivery
+    ALERT_MAX_ATTEMPTS = int(os.getenv("ALERT_MAX_ATTEMPTS", "8"))
+    ALERT_RETRY_BASE_SECONDS = float(os.getenv("ALERT_RETRY_BASE_SECONDS", "2"))
+    ALERT_RETRY_MAX_SECONDS = float(os.getenv("ALERT_RETRY_MAX_SECONDS", "300"))
+    ALERT_IDLE_POLL_SECONDS = float(os.getenv("ALERT_IDLE_POLL_SECONDS", "5"))
+    ALERT_BATCH_WINDOW_SECONDS = float(os.getenv("ALERT_BATCH_WINDOW_SECONDS", "2"))
+    ALERT_BATCH_MAX_ALERTS = int(os.getenv("ALERT_BATCH_MAX_ALERTS", "100"))
+    ALERT_EMAIL_MAX_TRADES = int(os.getenv("ALERT_EMAIL_MAX_TRADES", "50"))
+    ALERT_CLAIM_TIMEOUT_SECONDS = float(os.getenv("ALERT_CLAIM_TIMEOUT_SECONDS", "120"))
     
     PROBABILITY_THRESHOLD = float(os.getenv("PROBABILITY_THRESHOLD", "0.05"))
     TRADE_SIZE_MIN = float(os.getenv("TRADE_SIZE_MIN", "50000"))
@@ -21,13 +32,114 @@ class Config:
     POLL_INTERVAL_SECONDS = int(os.getenv("POLL_INTERVAL_SECONDS", "4"))
     MARKET_REFRESH_SECONDS = int(os.getenv("MARKET_REFRESH_SECONDS", "360"))
 
+    # Re-price only the monitored and near-threshold markets between full discoveries
+    PRICE_TRACKER_ENABLED = os.getenv("PRICE_TRACKER_ENABLED", "true").lower() == "true"
+    PRICE_TRACKER_INTERVAL_SECONDS = float(os.getenv("PRICE_TRACKER_INTERVAL_SECONDS", "30"))
+    PRICE_TRACKER_BATCH_SIZE = int(os.getenv("PRICE_TRACKER_BATCH_SIZE", "50"))
+    PRICE_TRACKER_NEAR_BAND = float(os.getenv("PRICE_TRACKER_NEAR_BAND", "0.02"))
+
+    # Sharded mode: instances sharing DATABASE_PATH split the monitored markets by lease
+    SHARDING_ENABLED = os.getenv("SHARDING_ENABLED", "false").lower() == "true"
+    SHARD_MEMBER_ID = os.getenv("SHARD_MEMBER_ID", "")
+    SHARD_LEASE_STORE = os.getenv("SHARD_LEASE_STORE", "sqlite")
+    SHARD_LEASE_TTL_SECONDS = float(os.getenv("SHARD_LEASE_TTL_SECONDS", "15"))
+    SHARD_HEARTBEAT_SECONDS = float(os.getenv("SHARD_HEARTBEAT_SECONDS", "5"))
+    SHARD_VIRTUAL_NODES = int(os.getenv("SHARD_VIRTUAL_NODES", "64"))
+    SHARD_INDEX_RELOAD_SECONDS = float(os.getenv("SHARD_INDEX_RELOAD_SECONDS", "30"))
+
+    # Start polling from the persisted market set if its last complete discovery is recent enough
+    WARM_START_ENABLED = os.getenv("WARM_START_ENABLED", "true").lower() == "true"
+    WARM_START_MAX_AGE_SECONDS = float(os.getenv("WARM_START_MAX_AGE_SECONDS", "3600"))
+
+    # Adaptive trade polling (poll ingestion mode)
+    POLL_INTERVAL_MIN_SECONDS = float(os.getenv("POLL_INTERVAL_MIN_SECONDS", "2"))
+    POLL_INTERVAL_MAX_SECONDS = float(os.getenv("POLL_INTERVAL_MAX_SECONDS", "12"))
+    POLL_QUIET_BACKOFF_FACTOR = float(os.getenv("POLL_QUIET_BACKOFF_FACTOR", "1.25"))
+    POLL_ACTIVITY_HOLD_SECONDS = float(os.getenv("POLL_ACTIVITY_HOLD_SECONDS", "120"))
+    POLL_BUDGET_PER_HOUR = float(os.getenv("POLL_BUDGET_PER_HOUR", "900"))
+    POLL_BUDGET_BURST = float(os.getenv("POLL_BUDGET_BURST", "30"))
+    POLL_BACKOFF_MAX_SECONDS = float(os.getenv("POLL_BACKOFF_MAX_SECONDS", "300"))
+    PRICE_MOVE_THRESHOLD = float(os.getenv("PRICE_MOVE_THRESHOLD", "0.01"))
+
     DATABASE_PATH = os.getenv("DATABASE_PATH", "polymarket_monitor.db")
+    DATABASE_CACHE_SIZE_KB = int(os.getenv("DATABASE_CACHE_SIZE_KB", "16384"))
+
+    # Retention horizons in days (0 keeps rows forever), applied every RETENTION_INTERVAL_SECONDS
+    LARGE_TRADES_RETENTION_DAYS = float(os.getenv("LARGE_TRADES_RETENTION_DAYS", "180"))
+    INACTIVE_MARKET_RETENTION_DAYS = float(os.getenv("INACTIVE_MARKET_RETENTION_DAYS", "30"))
+    FAILED_ALERT_RETENTION_DAYS = float(os.getenv("FAILED_ALERT_RETENTION_DAYS", "14"))
+    RECORDED_TRADES_RETENTION_DAYS = float(os.getenv("RECORDED_TRADES_RETENTION_DAYS", "0"))
+    RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+    DATABASE_VACUUM_FREE_RATIO = float(os.getenv("DATABASE_VACUUM_FREE_RATIO", "0.25"))
+
+    # Wallet history attached to alerts, cached per wallet
+    WALLET_PROFILES_ENABLED = os.getenv("WALLET_PROFILES_ENABLED", "true").lower() == "true"
+    WALLET_PROFILE_CACHE_SIZE = int(os.getenv("WALLET_PROFILE_CACHE_SIZE", "20000"))
+    WALLET_PROFILE_TTL_SECONDS = float(os.getenv("WALLET_PROFILE_TTL_SECONDS", "900"))
+    WALLET_PROFILE_API_ENABLED = os.getenv("WALLET_PROFILE_API_ENABLED", "false").lower() == "true"
+    WALLET_PROFILE_API_LIMIT = int(os.getenv("WALLET_PROFILE_API_LIMIT", "500"))
+    WALLET_PROFILE_API_TIMEOUT_SECONDS = float(os.getenv("WALLET_PROFILE_API_TIMEOUT_SECONDS", "3"))
+    WALLET_PROFILE_API_WORKERS = int(os.getenv("WALLET_PROFILE_API_WORKERS", "4"))
+
+    # In-memory dedup index for processed transaction hashes
+    DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "50000"))
+    DEDUP_BLOOM_ENABLED = os.getenv("DEDUP_BLOOM_ENABLED", "true").lower() == "true"
+    DEDUP_BLOOM_CAPACITY = int(os.getenv("DEDUP_BLOOM_CAPACITY", "1000000"))
+    DEDUP_BLOOM_ERROR_RATE = float(os.getenv("DEDUP_BLOOM_ERROR_RATE", "0.001"))
+
+    # Optional JSON file of alert rules (see alert_rules.example.json), checked for
+    # changes every ALERT_RULES_RELOAD_SECONDS
+    ALERT_RULES_PATH = os.getenv("ALERT_RULES_PATH", "")
+    ALERT_RULES_RELOAD_SECONDS = float(os.getenv("ALERT_RULES_RELOAD_SECONDS", "10"))
+
+    # Aggregated buy-ins: sums of smaller BUY fills per wallet, market and outcome
+    AGGREGATION_ENABLED = os.getenv("AGGREGATION_ENABLED", "false").lower() == "true"
+    AGGREGATE_WINDOWS_SECONDS = [int(w) for w in os.getenv("AGGREGATE_WINDOWS_SECONDS", "900,3600").split(",") if w.strip()]
+    AGGREGATE_THRESHOLD = float(os.getenv("AGGREGATE_THRESHOLD", "50000"))
+    AGGREGATE_MIN_TRADE_VALUE = float(os.getenv("AGGREGATE_MIN_TRADE_VALUE", "1000"))
+    AGGREGATE_BUCKET_SECONDS = int(os.getenv("AGGREGATE_BUCKET_SECONDS", "60"))
+    AGGREGATE_MAX_KEYS = int(os.getenv("AGGREGATE_MAX_KEYS", "100000"))
+
     MARKET_CATEGORIES = os.getenv("MARKET_CATEGORIES", "sports,politics").split(",")
     TRADES_API_LIMIT = int(os.getenv("TRADES_API_LIMIT", "1000"))
+
+    # Trade ingestion: "poll" the /trades endpoint or "stream" from a WebSocket feed
+    TRADE_INGESTION_MODE = os.getenv("TRADE_INGESTION_MODE", "poll").lower()
+    STREAM_WS_URL = os.getenv("STREAM_WS_URL", "wss://ws-live-data.polymarket.com")
+    STREAM_TOPIC = os.getenv("STREAM_TOPIC", "activity")
+    STREAM_PING_SECONDS = float(os.getenv("STREAM_PING_SECONDS", "10"))
+    STREAM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("STREAM_CONNECT_TIMEOUT_SECONDS", "10"))
+    STREAM_RECONNECT_BASE_SECONDS = float(os.getenv("STREAM_RECONNECT_BASE_SECONDS", "1"))
+    STREAM_RECONNECT_MAX_SECONDS = float(os.getenv("STREAM_RECONNECT_MAX_SECONDS", "60"))
+    STREAM_RESUBSCRIBE_SECONDS = float(os.getenv("STREAM_RESUBSCRIBE_SECONDS", "30"))
+    STREAM_SAFETY_POLL_SECONDS = int(os.getenv("STREAM_SAFETY_POLL_SECONDS", "60"))
     MARKETS_API_LIMIT = int(os.getenv("MARKETS_API_LIMIT", "2000"))
+    MARKETS_MAX_PAGES = int(os.getenv("MARKETS_MAX_PAGES", "100"))
+    MARKET_DISCOVERY_WORKERS = int(os.getenv("MARKET_DISCOVERY_WORKERS", "4"))
+    
+    # Shared HTTP client: pooled keep-alive sessions per API host
+    HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "3.05"))
+    HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "20"))
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+    HTTP_RETRY_BACKOFF_SECONDS = float(os.getenv("HTTP_RETRY_BACKOFF_SECONDS", "0.5"))
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "4"))
+    
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+    
+    # Read-only query API and exporter (run_analytics.py), on their own connections
+    ANALYTICS_HOST = os.getenv("ANALYTICS_HOST", "127.0.0.1")
+    ANALYTICS_PORT = int(os.getenv("ANALYTICS_PORT", "9109"))
+    ANALYTICS_PAGE_SIZE = int(os.getenv("ANALYTICS_PAGE_SIZE", "100"))
+    ANALYTICS_MAX_PAGE_SIZE = int(os.getenv("ANALYTICS_MAX_PAGE_SIZE", "1000"))
+    ANALYTICS_READ_CONNECTIONS = int(os.getenv("ANALYTICS_READ_CONNECTIONS", "4"))
+    ANALYTICS_QUERY_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_QUERY_TIMEOUT_SECONDS", "10"))
+    ANALYTICS_CACHE_SIZE_KB = int(os.getenv("ANALYTICS_CACHE_SIZE_KB", "8192"))
     
-    GAMMA_API_BASE = "https://gamma-api.polymarket.com"
-    DATA_API_BASE = "https://data-api.polymarket.com"
+    # Overridable so benchmarks can point the monitor at a local mock API
+    GAMMA_API_BASE = os.getenv("GAMMA_API_BASE", "https://gamma-api.polymarket.com")
+    DATA_API_BASE = os.getenv("DATA_API_BASE", "https://data-api.polymarket.com")
     
     @classmethod
     def validate(cls):
@@ -37,4 +149,10 @@ class Config:
             print("WARNING: EMAIL_ENABLED but SMTP_PASSWORD not set")
         if cls.TRADE_SIZE_MIN > cls.TRADE_SIZE_MAX:
             print("WARNING: TRADE_SIZE_MIN is greater than TRADE_SIZE_MAX")
+        if cls.TRADE_INGESTION_MODE not in ("poll", "stream"):
+            raise ValueError(f"TRADE_INGESTION_MODE must be 'poll' or 'stream', got '{cls.TRADE_INGESTION_MODE}'")
+        if cls.AGGREGATION_ENABLED and not cls.AGGREGATE_WINDOWS_SECONDS:
+            raise ValueError("AGGREGATION_ENABLED requires at least one AGGREGATE_WINDOWS_SECONDS value")
+        if cls.SHARDING_ENABLED and cls.SHARD_HEARTBEAT_SECONDS >= cls.SHARD_LEASE_TTL_SECONDS:
+            raise ValueError("SHARD_HEARTBEAT_SECONDS must be shorter than SHARD_LEASE_TTL_SECONDS")
         return True
@@ -1,14 +1,105 @@
-﻿import sqlite3
+﻿import json
+import time
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from .config import Config
+from .metrics import timed, DB_OPERATION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+UPSERT_MARKET_SQL = '''
+    INSERT OR REPLACE INTO markets
+    (condition_id, title, slug, current_probability, outcome, last_updated, active, category)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_LARGE_TRADE_SQL = '''
+    INSERT OR IGNORE INTO large_trades
+    (condition_id, market_title, side, size, price, dollar_value,
+     outcome, wallet_address, transaction_hash, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_RECORDED_TRADE_SQL = '''
+    INSERT OR IGNORE INTO recorded_trades
+    (transaction_hash, condition_id, wallet_address, side, size, price,
+     outcome, timestamp, title, slug)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_connection = None
+_lock = threading.RLock()
+_transaction_depth = 0
 
 def get_connection():
-    return sqlite3.connect(Config.DATABASE_PATH)
+    """
+    Return the process-wide SQLite connection, opening it on first use.
+    All access goes through _lock, so the connection is shared across threads.
+    """
+    global _connection
+    with _lock:
+        if _connection is None:
+            conn = sqlite3.connect(Config.DATABASE_PATH, check_same_thread=False, cached_statements=256)
+            # Must come before anything writes the header, so it only takes effect on
+            # new databases (or after a VACUUM); lets retention hand freed pages back
+            # to the filesystem without a full VACUUM
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{Config.DATABASE_CACHE_SIZE_KB}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA busy_timeout=5000")
+            _connection = conn
+        return _connection
 
-def init_database():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+def open_read_connection(path=None, cache_size_kb=None):
+    """
+    Open a separate read-only connection for analytics, outside _lock. Under WAL its
+    reads never block the monitor's writes; each SELECT runs in its own implicit
+    transaction, so short statements do not hold back checkpoints either.
+    """
+    path = path or Config.DATABASE_PATH
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only=1")
+    conn.execute(f"PRAGMA cache_size=-{cache_size_kb or Config.DATABASE_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+def close_database():
+    global _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+
+@contextmanager
+def transaction():
+    """
+    Group writes into a single commit. Nested blocks join the outermost transaction.
+    """
+    global _transaction_depth
+    with _lock:
+        conn = get_connection()
+        _transaction_depth += 1
+        try:
+            yield conn
+        except Exception:
+            _transaction_depth -= 1
+            if _transaction_depth == 0:
+                conn.rollback()
+            raise
+        _transaction_depth -= 1
+        if _transaction_depth == 0:
+            conn.commit()
+
+def _migrate_baseline(cursor):
+    """
+    The schema as it was before versioning; every statement is a no-op on databases
+    that already have it.
+    """
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS markets (
             condition_id TEXT PRIMARY KEY,
@@ -22,14 +113,11 @@ def init_database():
         )
     ''')
 
-    # Migration: Add category column if it doesn't exist
-    try:
+    # Databases created before categories existed lack the column
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(markets)")}
+    if "category" not in columns:
         cursor.execute("ALTER TABLE markets ADD COLUMN category TEXT DEFAULT 'other'")
-        conn.commit()
-    except sqlite3.OperationalError:
-        # Column already exists
-        pass
-    
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS large_trades (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -47,92 +135,590 @@ def init_database():
             FOREIGN KEY (condition_id) REFERENCES markets(condition_id)
         )
     ''')
-    
-    conn.commit()
-    conn.close()
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS monitor_state (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alert_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            transaction_hash TEXT,
+            payload TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (channel, transaction_hash)
+        )
+    ''')
+
+    # Raw trades fetched by the backfill tool, replayed offline through detection
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recorded_trades (
+            transaction_hash TEXT NOT NULL,
+            condition_id TEXT NOT NULL,
+            wallet_address TEXT NOT NULL DEFAULT '',
+            side TEXT,
+            size REAL,
+            price REAL,
+            outcome TEXT NOT NULL DEFAULT '',
+            timestamp REAL NOT NULL,
+            title TEXT,
+            slug TEXT,
+            UNIQUE (transaction_hash, wallet_address, outcome)
+        )
+    ''')
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recorded_trades_timestamp ON recorded_trades (timestamp)"
+    )
+
+def _migrate_indexes(cursor):
+    # Partial index: get_monitored_markets only ever reads active markets
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_markets_active_probability
+        ON markets (current_probability) WHERE active = 1
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_markets_inactive_updated ON markets (last_updated) WHERE active = 0")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_large_trades_condition_id ON large_trades (condition_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_large_trades_timestamp ON large_trades (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_large_trades_wallet ON large_trades (wallet_address)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_large_trades_detected_at ON large_trades (detected_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alert_outbox_due ON alert_outbox (channel, status, next_attempt_at)")
+
+def _migrate_sharding(cursor):
+    # Leases of the monitor instances sharing this database in sharded mode
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shard_members (
+            member_id TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL,
+            started_at REAL NOT NULL
+        )
+    ''')
+
+    # The instance that delivers each queued alert; NULL when not sharded
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(alert_outbox)")}
+    if "owner" not in columns:
+        cursor.execute("ALTER TABLE alert_outbox ADD COLUMN owner TEXT")
+
+def _migrate_alert_claims(cursor):
+    # When a worker marked the row 'sending'; lets stale claims of dead instances expire
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(alert_outbox)")}
+    if "claimed_at" not in columns:
+        cursor.execute("ALTER TABLE alert_outbox ADD COLUMN claimed_at REAL")
+
+# (version, description, function); append new migrations, never edit applied ones.
+# Instances sharing a database may migrate concurrently, so each must be idempotent.
+MIGRATIONS = [
+    (1, "baseline schema", _migrate_baseline),
+    (2, "secondary indexes", _migrate_indexes),
+    (3, "shard leases and alert owners", _migrate_sharding),
+    (4, "alert delivery claims", _migrate_alert_claims),
+]
+
+def get_schema_version():
+    with _lock:
+        return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+def init_database():
+    """
+    Apply pending migrations in order. The schema version lives in PRAGMA
+    user_version and is bumped in the same transaction as each migration.
+    """
+    version = get_schema_version()
+    for target, description, migrate in MIGRATIONS:
+        if target <= version:
+            continue
+        logger.info(f"Migrating database to version {target}: {description}")
+        with transaction() as conn:
+            # sqlite3 only opens transactions implicitly for DML; DDL needs an explicit BEGIN
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            cursor = conn.cursor()
+            migrate(cursor)
+            cursor.execute(f"PRAGMA user_version = {target}")
+
     print("Database initialized successfully")
 
+def get_state(key, default=None):
+    with _lock:
+        row = get_connection().execute(
+            "SELECT value FROM monitor_state WHERE key = ?", (key,)
+        ).fetchone()
+    return row[0] if row else default
+
+def set_state(key, value):
+    with transaction() as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO monitor_state (key, value, updated_at)
+            VALUES (?, ?, ?)
+        ''', (key, value, datetime.utcnow().isoformat()))
+
+def get_trade_cursor(key="trade_cursor"):
+    """
+    Return the trade high-water mark as (timestamp, set of tx hashes at that timestamp),
+    or None if no trades have been seen yet.
+    """
+    value = get_state(key)
+    if not value:
+        return None
+    timestamp, _, hashes = value.partition("|")
+    return float(timestamp), set(h for h in hashes.split(",") if h)
+
+def set_trade_cursor(timestamp, tx_hashes, key="trade_cursor"):
+    set_state(key, f"{timestamp}|{','.join(sorted(tx_hashes))}")
+
+def get_markets_refreshed_at():
+    """
+    Unix time of the last complete market discovery, or None if none was recorded.
+    """
+    value = get_state("markets_refreshed_at")
+    return float(value) if value else None
+
+def set_markets_refreshed_at(timestamp):
+    set_state("markets_refreshed_at", str(timestamp))
+
+@timed(DB_OPERATION_SECONDS, operation="upsert_markets")
+def upsert_markets(markets):
+    now = datetime.utcnow().isoformat()
+    rows = [
+        (
+            market_data["condition_id"],
+            market_data["title"],
+            market_data.get("slug", ""),
+            market_data["current_probability"],
+            market_data.get("outcome", ""),
+            now,
+            True,
+            market_data.get("category", "other")
+        )
+        for market_data in markets
+    ]
+
+    with transaction() as conn:
+        conn.executemany(UPSERT_MARKET_SQL, rows)
+
 def upsert_market(market_data):
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT OR REPLACE INTO markets
-        (condition_id, title, slug, current_probability, outcome, last_updated, active, category)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        market_data["condition_id"],
-        market_data["title"],
-        market_data.get("slug", ""),
-        market_data["current_probability"],
-        market_data.get("outcome", ""),
-        datetime.utcnow().isoformat(),
-        True,
-        market_data.get("category", "other")
-    ))
-    
-    conn.commit()
-    conn.close()
+    upsert_markets([market_data])
 
+@timed(DB_OPERATION_SECONDS, operation="get_monitored_markets")
 def get_monitored_markets():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT condition_id, title, current_probability, slug, category
-        FROM markets
-        WHERE active = 1 AND current_probability < ?
-    ''', (Config.PROBABILITY_THRESHOLD,))
+    with _lock:
+        rows = get_connection().execute('''
+            SELECT condition_id, title, current_probability, slug, category, outcome
+            FROM markets
+            WHERE active = 1 AND current_probability < ?
+        ''', (Config.PROBABILITY_THRESHOLD,)).fetchall()
 
-    rows = cursor.fetchall()
-    conn.close()
+    return [
+        {"condition_id": r[0], "title": r[1], "current_probability": r[2], "slug": r[3], "category": r[4], "outcome": r[5]}
+        for r in rows
+    ]
+
+def get_active_markets():
+    with _lock:
+        rows = get_connection().execute('''
+            SELECT condition_id, title, current_probability, slug, category, outcome
+            FROM markets
+            WHERE active = 1
+        ''').fetchall()
 
     return [
-        {"condition_id": r[0], "title": r[1], "current_probability": r[2], "slug": r[3], "category": r[4]}
+        {"condition_id": r[0], "title": r[1], "current_probability": r[2], "slug": r[3], "category": r[4], "outcome": r[5]}
         for r in rows
     ]
 
+@timed(DB_OPERATION_SECONDS, operation="deactivate_markets")
+def deactivate_markets(condition_ids):
+    with transaction() as conn:
+        conn.executemany(
+            "UPDATE markets SET active = 0, last_updated = ? WHERE condition_id = ?",
+            [(datetime.utcnow().isoformat(), cid) for cid in condition_ids]
+        )
+
+@timed(DB_OPERATION_SECONDS, operation="is_trade_processed")
 def is_trade_processed(transaction_hash):
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        "SELECT 1 FROM large_trades WHERE transaction_hash = ?",
-        (transaction_hash,)
-    )
-    
-    exists = cursor.fetchone() is not None
-    conn.close()
-    return exists
+    with _lock:
+        row = get_connection().execute(
+            "SELECT 1 FROM large_trades WHERE transaction_hash = ?",
+            (transaction_hash,)
+        ).fetchone()
+    return row is not None
+
+def count_large_trades():
+    with _lock:
+        return get_connection().execute("SELECT COUNT(*) FROM large_trades").fetchone()[0]
+
+def get_recent_trade_hashes(limit):
+    """
+    Return the transaction hashes of the most recent large trades, oldest first.
+    """
+    with _lock:
+        rows = get_connection().execute('''
+            SELECT transaction_hash FROM large_trades
+            WHERE transaction_hash IS NOT NULL
+            ORDER BY id DESC LIMIT ?
+        ''', (limit,)).fetchall()
+    return [r[0] for r in reversed(rows)]
+
+@timed(DB_OPERATION_SECONDS, operation="get_wallet_stats")
+def get_wallet_stats(wallets, chunk_size=500):
+    """
+    Return {wallet: (earliest trade timestamp, large trade count, total dollar value)}
+    for the wallets with recorded large trades. Aggregate alerts are not trades of
+    their own and are left out.
+    """
+    wallets = list(wallets)
+    stats = {}
+    with _lock:
+        conn = get_connection()
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(wallets), chunk_size):
+            chunk = wallets[i:i + chunk_size]
+            rows = conn.execute(f'''
+                SELECT wallet_address, MIN(timestamp), COUNT(*), SUM(dollar_value)
+                FROM large_trades
+                WHERE wallet_address IN ({",".join("?" * len(chunk))}) AND transaction_hash NOT LIKE 'agg:%'
+                GROUP BY wallet_address
+            ''', chunk).fetchall()
+            for wallet, first_seen, count, volume in rows:
+                stats[wallet] = (first_seen, count, volume or 0.0)
+    return stats
+
+def iter_trade_hashes(batch_size=10000):
+    last_id = 0
+    while True:
+        with _lock:
+            rows = get_connection().execute('''
+                SELECT id, transaction_hash FROM large_trades
+                WHERE id > ? AND transaction_hash IS NOT NULL
+                ORDER BY id LIMIT ?
+            ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            return
+        for _, tx_hash in rows:
+            yield tx_hash
+        last_id = rows[-1][0]
+
+@timed(DB_OPERATION_SECONDS, operation="insert_large_trades")
+def insert_large_trades(trades):
+    """
+    Insert trades in one transaction and return the ones that were new.
+    Duplicates are rejected by the UNIQUE constraint on transaction_hash.
+    """
+    inserted = []
+
+    with transaction() as conn:
+        cursor = conn.cursor()
+        for trade_data in trades:
+            cursor.execute(INSERT_LARGE_TRADE_SQL, (
+                trade_data["condition_id"],
+                trade_data.get("market_title", ""),
+                trade_data["side"],
+                trade_data["size"],
+                trade_data["price"],
+                trade_data["dollar_value"],
+                trade_data.get("outcome", ""),
+                trade_data.get("wallet_address", ""),
+                trade_data["transaction_hash"],
+                trade_data.get("timestamp", datetime.utcnow().isoformat())
+            ))
+            if cursor.rowcount == 1:
+                inserted.append(trade_data)
+
+    return inserted
 
 def insert_large_trade(trade_data):
-    if is_trade_processed(trade_data.get("transaction_hash", "")):
-        return False
-    
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            INSERT INTO large_trades 
-            (condition_id, market_title, side, size, price, dollar_value, 
-             outcome, wallet_address, transaction_hash, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            trade_data["condition_id"],
-            trade_data.get("market_title", ""),
-            trade_data["side"],
-            trade_data["size"],
-            trade_data["price"],
-            trade_data["dollar_value"],
-            trade_data.get("outcome", ""),
-            trade_data.get("wallet_address", ""),
-            trade_data["transaction_hash"],
-            trade_data.get("timestamp", datetime.utcnow().isoformat())
-        ))
-        conn.commit()
-        conn.close()
-        return True
-    except sqlite3.IntegrityError:
-        conn.close()
-        return False
+    return bool(insert_large_trades([trade_data]))
+
+@timed(DB_OPERATION_SECONDS, operation="enqueue_alerts")
+def enqueue_alerts(trades, channels, owner=None):
+    rows = [
+        (channel, trade_data.get("transaction_hash", ""), json.dumps(trade_data), time.time(), owner)
+        for trade_data in trades
+        for channel in channels
+    ]
+
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT OR IGNORE INTO alert_outbox (channel, transaction_hash, payload, next_attempt_at, owner)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+
+@timed(DB_OPERATION_SECONDS, operation="get_due_alerts")
+def get_due_alerts(channel, now, limit=50, owner=None):
+    with _lock:
+        rows = get_connection().execute('''
+            SELECT id, payload, attempts FROM alert_outbox
+            WHERE channel = ? AND status = 'pending' AND next_attempt_at <= ? AND owner IS ?
+            ORDER BY id LIMIT ?
+        ''', (channel, now, owner, limit)).fetchall()
+    return _decode_alerts(channel, rows)
+
+@timed(DB_OPERATION_SECONDS, operation="claim_due_alerts")
+def claim_due_alerts(channel, now, limit=50, owner=None):
+    """
+    Mark up to limit due alerts of owner as 'sending' and return them. One statement
+    does both, so rows another instance adopted a moment earlier are not claimed, and
+    claimed rows cannot be adopted while they are being delivered.
+    """
+    with transaction() as conn:
+        rows = conn.execute('''
+            UPDATE alert_outbox SET status = 'sending', claimed_at = ?
+            WHERE id IN (
+                SELECT id FROM alert_outbox
+                WHERE channel = ? AND status = 'pending' AND next_attempt_at <= ? AND owner IS ?
+                ORDER BY id LIMIT ?
+            )
+            RETURNING id, payload, attempts
+        ''', (time.time(), channel, now, owner, limit)).fetchall()
+    return _decode_alerts(channel, sorted(rows))
+
+def release_alert_claims(owner=None, ids=None):
+    """
+    Return owner's claimed rows (only those in ids, if given) to 'pending', e.g. the
+    rest of a batch after a backoff, or everything after a restart. Returns how many
+    were released.
+    """
+    sql = "UPDATE alert_outbox SET status = 'pending', claimed_at = NULL WHERE status = 'sending' AND owner IS ?"
+    params = [owner]
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return 0
+        sql += f" AND id IN ({','.join('?' * len(ids))})"
+        params += ids
+    with transaction() as conn:
+        return conn.execute(sql, params).rowcount
+
+def _decode_alerts(channel, rows):
+    alerts = []
+    undecodable = []
+    for alert_id, payload, attempts in rows:
+        try:
+            alerts.append({"id": alert_id, "trade": json.loads(payload), "attempts": attempts})
+        except ValueError:
+            undecodable.append(alert_id)
+    if undecodable:
+        # Would otherwise be fetched again on every pass and never delivered
+        logger.error(f"Marking {len(undecodable)} {channel} alert(s) with an undecodable payload as failed")
+        mark_alerts_failed(undecodable, "undecodable payload")
+    return alerts
+
+def get_next_alert_time(channel, owner=None):
+    with _lock:
+        row = get_connection().execute('''
+            SELECT MIN(next_attempt_at) FROM alert_outbox
+            WHERE channel = ? AND status = 'pending' AND owner IS ?
+        ''', (channel, owner)).fetchone()
+    return row[0]
+
+def adopt_orphaned_alerts(live_members, owner):
+    """
+    Hand pending alerts queued by instances that are no longer live (or before
+    sharding was enabled) to owner. Returns how many were adopted.
+
+    Rows such an instance claimed for delivery are left alone until the claim is
+    ALERT_CLAIM_TIMEOUT_SECONDS old: an instance whose lease merely lapsed may still
+    be sending them.
+    """
+    live = list(live_members)
+    placeholders = ",".join("?" * len(live)) or "NULL"
+    stale = time.time() - Config.ALERT_CLAIM_TIMEOUT_SECONDS
+    with transaction() as conn:
+        cursor = conn.execute(f'''
+            UPDATE alert_outbox SET owner = ?, status = 'pending', claimed_at = NULL
+            WHERE (owner IS NULL OR owner NOT IN ({placeholders}))
+              AND (status = 'pending' OR (status = 'sending' AND claimed_at < ?))
+        ''', [owner] + live + [stale])
+        return cursor.rowcount
+
+def renew_shard_lease(member_id, expires_at):
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO shard_members (member_id, expires_at, started_at) VALUES (?, ?, ?)
+            ON CONFLICT (member_id) DO UPDATE SET expires_at = excluded.expires_at
+        ''', (member_id, expires_at, time.time()))
+
+def get_live_shard_members(now):
+    with _lock:
+        rows = get_connection().execute(
+            "SELECT member_id FROM shard_members WHERE expires_at > ? ORDER BY member_id", (now,)
+        ).fetchall()
+    return [r[0] for r in rows]
+
+def release_shard_lease(member_id):
+    with transaction() as conn:
+        conn.execute("DELETE FROM shard_members WHERE member_id = ?", (member_id,))
+
+def mark_alerts_delivered(alert_ids):
+    with transaction() as conn:
+        conn.executemany("DELETE FROM alert_outbox WHERE id = ?", [(i,) for i in alert_ids])
+
+def reschedule_alerts(alert_attempts, next_attempt_at, error):
+    """
+    alert_attempts is a list of (alert id, attempts so far).
+    """
+    with transaction() as conn:
+        conn.executemany('''
+            UPDATE alert_outbox SET status = 'pending', claimed_at = NULL,
+                attempts = ?, next_attempt_at = ?, last_error = ?
+            WHERE id = ?
+        ''', [(attempts, next_attempt_at, error, i) for i, attempts in alert_attempts])
+
+def mark_alerts_failed(alert_ids, error):
+    with transaction() as conn:
+        conn.executemany('''
+            UPDATE alert_outbox SET status = 'failed', last_error = ?
+            WHERE id = ?
+        ''', [(error, i) for i in alert_ids])
+
+def insert_recorded_trades(rows):
+    """
+    Bulk insert backfilled trades (tuples in INSERT_RECORDED_TRADE_SQL column order).
+    Returns how many were new.
+    """
+    with transaction() as conn:
+        before = conn.total_changes
+        conn.executemany(INSERT_RECORDED_TRADE_SQL, rows)
+        return conn.total_changes - before
+
+def count_recorded_trades(start, end):
+    with _lock:
+        return get_connection().execute(
+            "SELECT COUNT(*) FROM recorded_trades WHERE timestamp >= ? AND timestamp < ?", (start, end)
+        ).fetchone()[0]
+
+def iter_recorded_trades(start, end, batch_size=5000):
+    """
+    Yield recorded trades in timestamp order as API-shaped dicts, paging by
+    (timestamp, rowid) so memory stays flat however long the range is.
+    """
+    last = (start, 0)
+    while True:
+        with _lock:
+            rows = get_connection().execute('''
+                SELECT rowid, transaction_hash, condition_id, wallet_address, side, size,
+                       price, outcome, timestamp, title, slug
+                FROM recorded_trades
+                WHERE timestamp < ? AND (timestamp > ? OR (timestamp = ? AND rowid > ?))
+                ORDER BY timestamp, rowid LIMIT ?
+            ''', (end, last[0], last[0], last[1], batch_size)).fetchall()
+        if not rows:
+            return
+        for r in rows:
+            yield {
+                "transactionHash": r[1], "conditionId": r[2], "proxyWallet": r[3], "side": r[4],
+                "size": r[5], "price": r[6], "outcome": r[7], "timestamp": r[8],
+                "title": r[9], "slug": r[10]
+            }
+        last = (rows[-1][8], rows[-1][0])
+
+def _delete_in_batches(sql, params, batch_size):
+    """
+    Run a "DELETE ... WHERE rowid IN (SELECT ... LIMIT ?)" statement until it stops
+    deleting, one short transaction per batch so polling is never blocked for long.
+    """
+    deleted = 0
+    while True:
+        with transaction() as conn:
+            count = conn.execute(sql, (*params, batch_size)).rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+def _cutoff(days, iso=False):
+    moment = datetime.utcfromtimestamp(time.time() - days * 86400)
+    return moment.isoformat() if iso else moment.strftime("%Y-%m-%d %H:%M:%S")
+
+@timed(DB_OPERATION_SECONDS, operation="prune_database")
+def prune_database(batch_size=5000):
+    """
+    Delete rows older than the configured retention horizons (0 keeps them forever).
+    Returns {table: rows deleted}.
+    """
+    deleted = {}
+
+    if Config.LARGE_TRADES_RETENTION_DAYS > 0:
+        deleted["large_trades"] = _delete_in_batches('''
+            DELETE FROM large_trades WHERE id IN (
+                SELECT id FROM large_trades WHERE detected_at < ? LIMIT ?
+            )
+        ''', (_cutoff(Config.LARGE_TRADES_RETENTION_DAYS),), batch_size)
+
+    if Config.INACTIVE_MARKET_RETENTION_DAYS > 0:
+        # Markets still referenced by a kept trade stay
+        deleted["markets"] = _delete_in_batches('''
+            DELETE FROM markets WHERE rowid IN (
+                SELECT m.rowid FROM markets m
+                WHERE m.active = 0 AND m.last_updated < ?
+                  AND NOT EXISTS (SELECT 1 FROM large_trades t WHERE t.condition_id = m.condition_id)
+                LIMIT ?
+            )
+        ''', (_cutoff(Config.INACTIVE_MARKET_RETENTION_DAYS, iso=True),), batch_size)
+
+    if Config.FAILED_ALERT_RETENTION_DAYS > 0:
+        deleted["alert_outbox"] = _delete_in_batches('''
+            DELETE FROM alert_outbox WHERE id IN (
+                SELECT id FROM alert_outbox WHERE status = 'failed' AND created_at < ? LIMIT ?
+            )
+        ''', (_cutoff(Config.FAILED_ALERT_RETENTION_DAYS),), batch_size)
+
+    if Config.RECORDED_TRADES_RETENTION_DAYS > 0:
+        deleted["recorded_trades"] = _delete_in_batches('''
+            DELETE FROM recorded_trades WHERE rowid IN (
+                SELECT rowid FROM recorded_trades WHERE timestamp < ? LIMIT ?
+            )
+        ''', (time.time() - Config.RECORDED_TRADES_RETENTION_DAYS * 86400,), batch_size)
+
+    return deleted
+
+@timed(DB_OPERATION_SECONDS, operation="compact_database")
+def compact_database():
+    """
+    Return free pages to the filesystem and refresh planner statistics.
+
+    Only incremental: a full VACUUM rewrites the whole file while holding _lock, so
+    databases created before auto_vacuum=INCREMENTAL are left to vacuum_database()
+    and a warning once their free pages are worth it. Returns the number of pages freed.
+    """
+    with _lock:
+        conn = get_connection()
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+        if free_pages and incremental:
+            # Frees one page per step and yields no rows, so execute() would stop after
+            # the first page; executescript() steps it to completion
+            conn.executescript("PRAGMA incremental_vacuum;")
+        else:
+            if page_count and free_pages / page_count >= Config.DATABASE_VACUUM_FREE_RATIO:
+                logger.warning(f"{free_pages}/{page_count} database pages are free but this database predates "
+                               f"incremental vacuum; stop the monitor and run 'run_backfill.py vacuum'")
+            free_pages = 0
+
+        conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return free_pages
+
+def vacuum_database():
+    """
+    Rewrite the whole database with a full VACUUM, switching databases created before
+    auto_vacuum=INCREMENTAL over. Writers wait for the whole rewrite, so this is an
+    offline operation (run_backfill.py vacuum). Returns (pages before, pages after).
+    """
+    with _lock:
+        conn = get_connection()
+        before = conn.execute("PRAGMA page_count").fetchone()[0]
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        after = conn.execute("PRAGMA page_count").fetchone()[0]
+    return before, after
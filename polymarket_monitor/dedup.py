@@ -0,0 +1,98 @@
+﻿import math
+import hashlib
+import threading
+from collections import OrderedDict
+from .metrics import DEDUP_LOOKUPS
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. Answers "definitely not added" or "maybe added".
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(1, capacity)
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+class TransactionDedup:
+    """
+    In-memory index of processed transaction hashes.
+
+    Recent hashes live in a bounded LRU. While nothing has been evicted the LRU holds every
+    known hash and a miss is authoritative; after that, misses go to the Bloom filter (if
+    enabled) and only "maybe" answers fall through to the fallback lookup in SQLite.
+    """
+
+    def __init__(self, max_size, fallback, bloom_capacity=0, bloom_error_rate=0.001):
+        self.max_size = max(1, max_size)
+        self.fallback = fallback
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity else None
+        self._recent = OrderedDict()
+        self._complete = True
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallback_lookups = 0
+
+    def warm(self, recent_hashes, all_hashes=(), total_count=0):
+        """
+        Load hashes persisted by earlier runs. recent_hashes are ordered oldest to newest;
+        all_hashes feeds the Bloom filter for the long tail.
+        """
+        with self._lock:
+            for tx_hash in recent_hashes:
+                self._remember(tx_hash)
+            if self.bloom is not None:
+                for tx_hash in all_hashes:
+                    self.bloom.add(tx_hash)
+            if total_count > len(self._recent):
+                self._complete = False
+
+    def _remember(self, tx_hash):
+        self._recent[tx_hash] = None
+        self._recent.move_to_end(tx_hash)
+        if self.bloom is not None:
+            self.bloom.add(tx_hash)
+        if len(self._recent) > self.max_size:
+            self._recent.popitem(last=False)
+            self._complete = False
+
+    def add(self, tx_hash):
+        with self._lock:
+            self._remember(tx_hash)
+
+    def is_processed(self, tx_hash):
+        with self._lock:
+            if tx_hash in self._recent:
+                self._recent.move_to_end(tx_hash)
+                self.hits += 1
+                DEDUP_LOOKUPS.inc(result="hit")
+                return True
+            if self._complete or (self.bloom is not None and tx_hash not in self.bloom):
+                self.misses += 1
+                DEDUP_LOOKUPS.inc(result="miss")
+                return False
+
+        self.fallback_lookups += 1
+        DEDUP_LOOKUPS.inc(result="fallback")
+        processed = self.fallback(tx_hash)
+        if processed:
+            self.add(tx_hash)
+        return processed
+
+    def __len__(self):
+        return len(self._recent)
@@ -0,0 +1,90 @@
+﻿import logging
+import threading
+import urllib3
+import requests
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .config import Config
+from .json_codec import loads, DECODE_ERRORS
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+logger = logging.getLogger(__name__)
+
+# gzip/deflate always; br when a brotli package is installed (urllib3 decodes it)
+ACCEPT_ENCODING = urllib3.util.request.ACCEPT_ENCODING
+
+# One keep-alive session per scheme://host, so each API keeps its own connection pool
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def build_retry():
+    """
+    Retry connection failures and transient gateway errors with exponential backoff.
+    429s are not retried here: callers see them and back off on their own schedule
+    (adaptive poll scheduler, alert outbox). Non-idempotent requests (Discord POSTs)
+    are only retried when the connection failed before the request was sent.
+    """
+    return Retry(
+        total=Config.HTTP_MAX_RETRIES,
+        connect=Config.HTTP_MAX_RETRIES,
+        read=Config.HTTP_MAX_RETRIES,
+        status=Config.HTTP_MAX_RETRIES,
+        backoff_factor=Config.HTTP_RETRY_BACKOFF_SECONDS,
+        status_forcelist=(502, 503, 504),
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def get_session(url):
+    """
+    Return the pooled session for url's host, creating it on first use.
+    """
+    key = _host_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            session.verify = False
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=max(Config.HTTP_POOL_SIZE, Config.MARKET_DISCOVERY_WORKERS),
+                max_retries=build_retry()
+            )
+            session.mount(key, adapter)
+            _sessions[key] = session
+    return session
+
+def default_timeout():
+    return (Config.HTTP_CONNECT_TIMEOUT_SECONDS, Config.HTTP_READ_TIMEOUT_SECONDS)
+
+def http_get(url, **kwargs):
+    kwargs.setdefault("timeout", default_timeout())
+    return get_session(url).get(url, **kwargs)
+
+def http_post(url, **kwargs):
+    kwargs.setdefault("timeout", default_timeout())
+    return get_session(url).post(url, **kwargs)
+
+def response_json(response):
+    """
+    Decode a response body with the fastest available JSON backend. Malformed bodies
+    raise a RequestException, like response.json() does.
+    """
+    try:
+        return loads(response.content)
+    except DECODE_ERRORS as e:
+        raise requests.exceptions.InvalidJSONError(f"Invalid JSON from {response.url}: {e}", response=response)
+
+def close_http_sessions():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
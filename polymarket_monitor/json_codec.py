@@ -0,0 +1,25 @@
+﻿import json
+
+# Optional faster decoders; the stdlib is always available as a fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = "orjson"
+    loads = orjson.loads
+    DECODE_ERRORS = (ValueError, TypeError)
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    loads = msgspec.json.decode
+    DECODE_ERRORS = (msgspec.DecodeError, ValueError, TypeError)
+else:
+    BACKEND = "json"
+    loads = json.loads
+    DECODE_ERRORS = (ValueError, TypeError)
@@ -1,12 +1,27 @@
 ﻿import time
 import signal
+import asyncio
 import logging
-import schedule
+import requests
 from .config import Config
-from .database import init_database
-from .market_discovery import refresh_markets
-from .trade_monitor import check_for_large_trades
-from .alerting import send_alerts
+from .database import (
+    init_database, close_database, prune_database, compact_database, get_markets_refreshed_at,
+    adopt_orphaned_alerts
+)
+from .http_client import close_http_sessions
+from . import market_discovery
+from .market_discovery import refresh_markets, reload_markets
+from .price_tracker import refresh_prices
+from .market_index import get_market_index
+from .trade_monitor import (
+    fetch_recent_trades, process_trades, load_trade_cursor, get_dedup_index, rewind_trade_cursor
+)
+from .sharding import get_shard
+from .poll_scheduler import TokenBucket, AdaptivePollScheduler
+from .alert_queue import AlertDispatcher
+from .wallet_profiles import get_wallet_profiler
+from .trade_stream import TradeStream
+from .metrics import start_metrics_server, CYCLE_SECONDS, MONITORED_MARKETS, STARTUP_SECONDS
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,36 +33,282 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-running = True
+# Set by main(); "warm" or "cold" once run_monitor has decided how to start
+_started_at = time.monotonic()
+_start_mode = "cold"
+_startup_marks = set()
+
+def mark_startup(stage):
+    """
+    Record how long after startup stage (first_poll, first_detection, discovery) was
+    first reached. Later calls for the same stage are ignored.
+    """
+    if stage in _startup_marks:
+        return
+    _startup_marks.add(stage)
+    elapsed = time.monotonic() - _started_at
+    STARTUP_SECONDS.set(elapsed, stage=stage, start=_start_mode)
+    logger.info(f"Startup ({_start_mode}): {stage.replace('_', ' ')} after {elapsed:.2f}s")
+
+def snapshot_age():
+    """
+    Seconds since the last complete market discovery, or None if none was recorded.
+    """
+    refreshed_at = get_markets_refreshed_at()
+    return None if refreshed_at is None else max(0.0, time.time() - refreshed_at)
+
+def load_persisted_state():
+    """
+    Load the monitored markets, trade cursor and dedup index left by the previous run,
+    so the first poll does not have to.
+    """
+    index = get_market_index()
+    load_trade_cursor()
+    get_dedup_index()
+    return index
+
+def install_signal_handlers(loop, stop_event):
+    def handle_signal():
+        logger.info("Shutdown signal received, stopping...")
+        stop_event.set()
 
-def signal_handler(signum, frame):
-    global running
-    logger.info("Shutdown signal received, stopping...")
-    running = False
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, handle_signal)
+        except NotImplementedError:
+            # Windows event loops do not support add_signal_handler
+            signal.signal(signum, lambda s, f: loop.call_soon_threadsafe(handle_signal))
 
-def monitor_cycle():
+async def run_periodic(name, interval, job, stop_event):
+    """
+    Run job every interval seconds (measured start to start) until stop_event is set.
+    Each job runs in its own task, so a slow job only delays its own next run.
+    """
+    loop = asyncio.get_running_loop()
+    while not stop_event.is_set():
+        started = loop.time()
+        try:
+            await job()
+        except Exception as e:
+            logger.error(f"Error in {name}: {e}")
+        delay = max(0, interval - (loop.time() - started))
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+async def monitor_cycle(dispatcher, scheduler=None):
     try:
-        large_trades = check_for_large_trades()
-        if large_trades:
-            logger.info(f"Found {len(large_trades)} new large trades")
-            sent = send_alerts(large_trades)
-            logger.info(f"Sent {sent} Discord alerts")
+        with CYCLE_SECONDS.time(job="monitor_cycle"):
+            trades = await asyncio.to_thread(fetch_recent_trades)
+            large_trades = await asyncio.to_thread(process_trades, trades)
+    except requests.RequestException as e:
+        logger.error(f"Error fetching trades: {e}")
+        if scheduler is not None:
+            response = getattr(e, "response", None)
+            if response is not None:
+                scheduler.record_error(response.status_code, _retry_after(response))
+            else:
+                scheduler.record_error()
+        return
     except Exception as e:
         logger.error(f"Error in monitor cycle: {e}")
+        return
+    
+    mark_startup("first_poll")
+    if scheduler is not None:
+        scheduler.record_poll(len(large_trades))
+    if large_trades:
+        mark_startup("first_detection")
+        logger.info(f"Found {len(large_trades)} new large trades")
+        dispatcher.notify()
 
-def market_refresh_cycle():
+async def market_refresh_cycle(scheduler=None):
+    shard = get_shard()
     try:
-        markets = refresh_markets()
+        if shard is not None and not shard.is_leader:
+            # Followers take the leader's discovery results from the shared database
+            with CYCLE_SECONDS.time(job="market_reload"):
+                markets = await asyncio.to_thread(reload_markets)
+            MONITORED_MARKETS.set(len(markets))
+            mark_startup("discovery")
+            return
+        if shard is not None:
+            # The leader checks in every SHARD_INDEX_RELOAD_SECONDS; the previous leader
+            # may have run discovery recently
+            age = await asyncio.to_thread(snapshot_age)
+            if age is not None and age < Config.MARKET_REFRESH_SECONDS:
+                return
+        with CYCLE_SECONDS.time(job="market_refresh"):
+            markets = await asyncio.to_thread(refresh_markets)
+        MONITORED_MARKETS.set(len(markets))
+        mark_startup("discovery")
         logger.info(f"Monitoring {len(markets)} low-probability markets")
+        if scheduler is not None and market_discovery.last_refresh_price_moves:
+            scheduler.record_activity()
     except Exception as e:
         logger.error(f"Error in market refresh: {e}")
 
-def main():
-    global running
+async def price_tracker_cycle(scheduler=None):
+    try:
+        with CYCLE_SECONDS.time(job="price_tracker"):
+            checked, price_moves = await asyncio.to_thread(refresh_prices)
+        MONITORED_MARKETS.set(len(get_market_index()))
+        logger.debug(f"Price tracker checked {checked} markets, {price_moves} moved")
+        if scheduler is not None and price_moves:
+            scheduler.record_activity()
+    except Exception as e:
+        logger.error(f"Error in price tracker: {e}")
+
+async def retention_cycle():
+    shard = get_shard()
+    if shard is not None and not shard.is_leader:
+        return
+    try:
+        with CYCLE_SECONDS.time(job="retention"):
+            deleted = await asyncio.to_thread(prune_database)
+            freed = await asyncio.to_thread(compact_database)
+        if any(deleted.values()) or freed:
+            summary = ", ".join(f"{count} {table}" for table, count in deleted.items() if count)
+            logger.info(f"Retention: deleted {summary or 'nothing'}, freed {freed} pages")
+    except Exception as e:
+        logger.error(f"Error in retention job: {e}")
+
+async def shard_cycle(shard, dispatcher):
+    try:
+        if await asyncio.to_thread(shard.heartbeat):
+            # Markets taken over from a member that died may have trades its last polls
+            # missed; look back over the lease plus a poll interval
+            await asyncio.to_thread(
+                rewind_trade_cursor, Config.SHARD_LEASE_TTL_SECONDS + Config.POLL_INTERVAL_MAX_SECONDS
+            )
+        if shard.is_leader:
+            # Read the live members fresh: a member that just joined may already have
+            # queued alerts before this instance's ring includes it
+            live_members = await asyncio.to_thread(shard.store.live_members)
+            adopted = await asyncio.to_thread(adopt_orphaned_alerts, live_members, shard.member_id)
+            if adopted:
+                logger.info(f"Adopted {adopted} pending alert(s) from departed shard members")
+                dispatcher.notify()
+    except Exception as e:
+        logger.error(f"Error in shard heartbeat: {e}")
+
+async def run_adaptive_polling(scheduler, dispatcher, stop_event):
+    while not stop_event.is_set():
+        if scheduler.bucket.try_acquire():
+            await monitor_cycle(dispatcher, scheduler)
+        delay = scheduler.next_delay()
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_monitor():
+    global _start_mode
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    install_signal_handlers(loop, stop_event)
+
+    shard = get_shard()
+    if shard is not None:
+        # Join before anything is polled or queued, so alerts carry a live owner
+        await asyncio.to_thread(shard.heartbeat)
+
+    # Picks up any alerts left undelivered by a previous run
+    dispatcher = AlertDispatcher(owner=shard.member_id if shard is not None else None, shard=shard)
+    dispatcher.start()
+    
+    scheduler = None
+    if Config.TRADE_INGESTION_MODE == "poll":
+        scheduler = AdaptivePollScheduler(TokenBucket(Config.POLL_BUDGET_PER_HOUR, Config.POLL_BUDGET_BURST))
+    
+    age = await asyncio.to_thread(snapshot_age) if Config.WARM_START_ENABLED else None
+    warm = age is not None and age <= Config.WARM_START_MAX_AGE_SECONDS
+    if warm:
+        _start_mode = "warm"
+        index = await asyncio.to_thread(load_persisted_state)
+        MONITORED_MARKETS.set(len(index))
+        logger.info(f"Warm start: {len(index)} markets from a discovery {age:.0f}s ago, refreshing in the background")
+    else:
+        if age is not None and Config.WARM_START_ENABLED:
+            logger.info(f"Last discovery was {age:.0f}s ago (over WARM_START_MAX_AGE_SECONDS), not warm starting")
+        logger.info("Initial market discovery...")
+        await market_refresh_cycle(scheduler)
+    
+    if scheduler is not None:
+        logger.info(f"Adaptive polling every {Config.POLL_INTERVAL_MIN_SECONDS}-{Config.POLL_INTERVAL_MAX_SECONDS}s, "
+                    f"budget {Config.POLL_BUDGET_PER_HOUR:.0f} polls/hour")
+        poll_task = run_adaptive_polling(scheduler, dispatcher, stop_event)
+    else:
+        # The stream delivers trades; polling is only a slow safety net for gaps
+        poll_interval = Config.STREAM_SAFETY_POLL_SECONDS
+        logger.info(f"Streaming trades from {Config.STREAM_WS_URL}, safety poll every {poll_interval}s")
+        poll_task = run_periodic("monitor cycle", poll_interval, lambda: monitor_cycle(dispatcher), stop_event)
+    
+    refresh_interval = Config.MARKET_REFRESH_SECONDS
+    if shard is not None:
+        refresh_interval = min(refresh_interval, Config.SHARD_INDEX_RELOAD_SECONDS)
+    logger.info(f"Market refresh every {Config.MARKET_REFRESH_SECONDS}s")
+    logger.info(f"Thresholds: probability < {Config.PROBABILITY_THRESHOLD*100}%, trade size ${Config.TRADE_SIZE_MIN:,.0f} - ${Config.TRADE_SIZE_MAX:,.0f}")
+    
+    async def refresh_job():
+        if warm:
+            await run_periodic("market refresh", refresh_interval,
+                               lambda: market_refresh_cycle(scheduler), stop_event)
+            return
+        # The initial discovery above already covers the first interval
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=refresh_interval)
+        except asyncio.TimeoutError:
+            await run_periodic("market refresh", refresh_interval,
+                               lambda: market_refresh_cycle(scheduler), stop_event)
+
+    tasks = [
+        asyncio.create_task(poll_task),
+        asyncio.create_task(refresh_job()),
+        asyncio.create_task(run_periodic("retention", Config.RETENTION_INTERVAL_SECONDS, retention_cycle, stop_event)),
+    ]
+    if shard is not None:
+        tasks.append(asyncio.create_task(run_periodic(
+            "shard heartbeat", Config.SHARD_HEARTBEAT_SECONDS, lambda: shard_cycle(shard, dispatcher), stop_event
+        )))
+    if Config.PRICE_TRACKER_ENABLED:
+        logger.info(f"Tracking monitored market prices every {Config.PRICE_TRACKER_INTERVAL_SECONDS:.0f}s")
+        tasks.append(asyncio.create_task(run_periodic(
+            "price tracker", Config.PRICE_TRACKER_INTERVAL_SECONDS, lambda: price_tracker_cycle(scheduler), stop_event
+        )))
+    if Config.TRADE_INGESTION_MODE == "stream":
+        def on_new_trades():
+            mark_startup("first_detection")
+            dispatcher.notify()
+        tasks.append(asyncio.create_task(TradeStream(on_new_trades=on_new_trades).run()))
     
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    await stop_event.wait()
     
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    
+    # Give due alerts a chance to go out; the rest stay in the outbox
+    await dispatcher.stop(drain_timeout=10)
+    
+    profiler = get_wallet_profiler()
+    if profiler is not None:
+        profiler.close()
+    
+    if shard is not None:
+        # Lets the others take over our markets and leftover alerts right away
+        await asyncio.to_thread(shard.release)
+
+def main():
+    global _started_at
+    _started_at = time.monotonic()
     logger.info("Starting Polymarket Large Buy-In Monitor")
     
     try:
@@ -58,20 +319,14 @@ def main():
     
     init_database()
     
-    logger.info("Initial market discovery...")
-    market_refresh_cycle()
+    if Config.METRICS_ENABLED:
+        start_metrics_server(Config.METRICS_HOST, Config.METRICS_PORT)
     
-    schedule.every(Config.POLL_INTERVAL_SECONDS).seconds.do(monitor_cycle)
-    schedule.every(Config.MARKET_REFRESH_SECONDS).seconds.do(market_refresh_cycle)
-    
-    logger.info(f"Polling every {Config.POLL_INTERVAL_SECONDS}s, market refresh every {Config.MARKET_REFRESH_SECONDS}s")
-    logger.info(f"Thresholds: probability < {Config.PROBABILITY_THRESHOLD*100}%, trade size ${Config.TRADE_SIZE_MIN:,.0f} - ${Config.TRADE_SIZE_MAX:,.0f}")
-    
-    monitor_cycle()
-    
-    while running:
-        schedule.run_pending()
-        time.sleep(1)
+    try:
+        asyncio.run(run_monitor())
+    finally:
+        close_http_sessions()
+        close_database()
     
     logger.info("Monitor stopped")
     return 0
@@ -1,80 +1,264 @@
-﻿import requests
+﻿import time
+import requests
 import logging
-import urllib3
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from .config import Config
-from .database import upsert_market
-from .utils import classify_market_category, is_monitored_category
-
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from .http_client import http_get, response_json
+from .database import (
+    upsert_markets, get_active_markets, get_monitored_markets, deactivate_markets,
+    set_markets_refreshed_at, transaction
+)
+from .market_snapshot import MarketSnapshot
+from .market_index import publish_market_index
+from .metrics import track_request
+from .utils import classify_market_category
 
 logger = logging.getLogger(__name__)
 
-def fetch_low_probability_markets():
-    markets = []
-    
-    try:
-        url = f"{Config.GAMMA_API_BASE}/markets"
-        params = {
-            "active": "true",
-            "closed": "false",
-            "limit": Config.MARKETS_API_LIMIT
-        }
-        
-        response = requests.get(url, params=params, timeout=30, verify=False)
+_snapshot = None
+
+# Markets that entered the low-probability set or moved by PRICE_MOVE_THRESHOLD in the last refresh
+last_refresh_price_moves = 0
+
+# Markets in the monitored categories whose least likely outcome is within
+# PRICE_TRACKER_NEAR_BAND above PROBABILITY_THRESHOLD, which the price tracker watches
+# so they are picked up as soon as they cross it
+near_threshold_ids = frozenset()
+
+# Set while a full discovery is running; the price tracker sits those out
+discovery_running = threading.Event()
+
+# Discovery and the price tracker both apply deltas; one at a time keeps the snapshot,
+# the published index, near_threshold_ids and the database in step
+_delta_lock = threading.Lock()
+
+# offset -> (ETag, page) for conditional page requests
+_page_cache = {}
+_page_cache_lock = threading.Lock()
+
+def fetch_markets_page(offset):
+    url = f"{Config.GAMMA_API_BASE}/markets"
+    params = {
+        "active": "true",
+        "closed": "false",
+        "limit": Config.MARKETS_API_LIMIT,
+        "offset": offset
+    }
+
+    headers = {}
+    with _page_cache_lock:
+        cached = _page_cache.get(offset)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+
+    with track_request("gamma_markets"):
+        response = http_get(url, params=params, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
         response.raise_for_status()
 
-        all_markets = response.json()
-        logger.info(f"API returned {len(all_markets)} total active markets (limit: {Config.MARKETS_API_LIMIT})")
+    page = response_json(response)
+    etag = response.headers.get("ETag")
+    with _page_cache_lock:
+        if etag:
+            _page_cache[offset] = (etag, page)
+        else:
+            _page_cache.pop(offset, None)
+    return page
 
-        sports_politics_count = sum(1 for m in all_markets if is_monitored_category(m))
-        logger.info(f"Found {sports_politics_count} sports/politics markets before probability filtering")
+def get_market_snapshot():
+    global _snapshot
+    if _snapshot is None:
+        snapshot = MarketSnapshot()
+        snapshot.seed(get_active_markets())
+        _snapshot = snapshot
+    return _snapshot
 
-        if len(all_markets) >= Config.MARKETS_API_LIMIT:
-            logger.warning(f"API returned exactly {len(all_markets)} markets (at limit). You may be missing some markets. Consider increasing MARKETS_API_LIMIT.")
+def apply_market_delta(markets, complete, scope=(), near=None):
+    """
+    Write only what changed since the previous refresh and deactivate markets that
+    are no longer in the low-probability set. A partial refresh can pass the
+    condition_ids it checked as scope, so those that left the set are closed too.
+    near, if given, are the near-threshold markets the refresh found; they replace
+    near_threshold_ids (within scope, for a partial refresh).
+    Returns the number of markets that entered the set or moved by PRICE_MOVE_THRESHOLD.
+    """
+    global near_threshold_ids
+    with _delta_lock:
+        snapshot = get_market_snapshot()
+        new, changed, closed = snapshot.diff(markets, complete, scope)
+        price_moves = len(new) + snapshot.count_price_moves(changed, Config.PRICE_MOVE_THRESHOLD)
 
-        for market in all_markets:
-            # Check if market belongs to monitored categories
-            if not is_monitored_category(market):
-                continue
+        with transaction():
+            if new or changed:
+                upsert_markets(new + changed)
+            if closed:
+                deactivate_markets(closed)
+            if complete:
+                # Lets the next start trust the persisted set instead of waiting for discovery
+                set_markets_refreshed_at(time.time())
+
+        snapshot.update(markets, complete, scope)
+        publish_market_index(markets, complete, scope)
+
+        if near is not None:
+            near = frozenset(near).difference(m["condition_id"] for m in markets)
+            near_threshold_ids = near if complete else (near_threshold_ids - frozenset(scope)) | near
+
+    # Price-only deltas from the tracker arrive every few seconds; not worth a line each
+    if complete or new or closed:
+        logger.info(f"Market delta: {len(new)} new, {len(changed)} changed, {len(closed)} closed")
+    return price_moves
+
+def iter_market_pages():
+    """
+    Walk the Gamma /markets catalog with offset pagination, yielding each page as it arrives.
+    The first page fixes the effective page size (the API may cap below MARKETS_API_LIMIT);
+    after that up to MARKET_DISCOVERY_WORKERS pages are kept in flight until a short page is seen.
+    If the first page came back short, a single page is probed before fanning out.
+    """
+    first_page = fetch_markets_page(0)
+    yield first_page
+
+    page_size = len(first_page)
+    if page_size == 0:
+        return
+
+    workers = max(1, Config.MARKET_DISCOVERY_WORKERS)
+    in_flight = workers if page_size >= Config.MARKETS_API_LIMIT else 1
+    next_offset = page_size
+    pages_requested = 1
+    exhausted = False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+
+        def submit_next():
+            nonlocal next_offset, pages_requested
+            pending.add(executor.submit(fetch_markets_page, next_offset))
+            next_offset += page_size
+            pages_requested += 1
+
+        def top_up():
+            while not exhausted and len(pending) < in_flight and pages_requested < Config.MARKETS_MAX_PAGES:
+                submit_next()
 
-            outcomes = market.get("outcomes", [])
-            outcome_prices = market.get("outcomePrices", [])
+        top_up()
 
-            if not outcome_prices:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = future.result()
+                if len(page) < page_size:
+                    exhausted = True
+                else:
+                    in_flight = workers
+                yield page
+            top_up()
+
+    if not exhausted:
+        logger.warning(f"Stopped market discovery after {pages_requested} pages (MARKETS_MAX_PAGES). You may be missing some markets.")
+
+def filter_low_probability_markets(page, seen, near=None):
+    """
+    Return a row per outcome below PROBABILITY_THRESHOLD for the markets of page in
+    the monitored categories. If near is given, the condition_ids of the other such
+    markets with an outcome inside the near-threshold band are added to it.
+    """
+    markets = []
+    near_limit = Config.PROBABILITY_THRESHOLD + Config.PRICE_TRACKER_NEAR_BAND
+
+    for market in page:
+        category = classify_market_category(market)
+
+        # Check if market belongs to monitored categories
+        if category not in Config.MARKET_CATEGORIES:
+            continue
+
+        outcomes = market.get("outcomes", [])
+        outcome_prices = market.get("outcomePrices", [])
+
+        if not outcome_prices:
+            continue
+
+        for i, price_str in enumerate(outcome_prices):
+            try:
+                price = float(price_str)
+            except (ValueError, TypeError):
                 continue
 
-            category = classify_market_category(market)
-
-            for i, price_str in enumerate(outcome_prices):
-                try:
-                    price = float(price_str)
-                except (ValueError, TypeError):
-                    continue
-
-                if price < Config.PROBABILITY_THRESHOLD:
-                    outcome_name = outcomes[i] if i < len(outcomes) else f"Outcome {i}"
-
-                    market_data = {
-                        "condition_id": market.get("conditionId", ""),
-                        "title": market.get("question", market.get("title", "Unknown")),
-                        "slug": market.get("slug", ""),
-                        "current_probability": price,
-                        "outcome": outcome_name,
-                        "category": category
-                    }
-
-                    if market_data["condition_id"]:
-                        markets.append(market_data)
-                        upsert_market(market_data)
+            if near is not None and Config.PROBABILITY_THRESHOLD <= price < near_limit and market.get("conditionId"):
+                near.add(market["conditionId"])
+
+            if price < Config.PROBABILITY_THRESHOLD:
+                outcome_name = outcomes[i] if i < len(outcomes) else f"Outcome {i}"
+
+                market_data = {
+                    "condition_id": market.get("conditionId", ""),
+                    "title": market.get("question", market.get("title", "Unknown")),
+                    "slug": market.get("slug", ""),
+                    "current_probability": price,
+                    "outcome": outcome_name,
+                    "category": category
+                }
+
+                # Offsets can shift while we page, so the same market may show up twice
+                key = (market_data["condition_id"], outcome_name)
+                if market_data["condition_id"] and key not in seen:
+                    seen.add(key)
+                    markets.append(market_data)
+
+    if near is not None:
+        near.difference_update(m["condition_id"] for m in markets)
+    return markets
+
+def fetch_low_probability_markets():
+    global last_refresh_price_moves
+    markets = []
+    near = set()
+    seen = set()
+    total_markets = 0
+    pages = 0
+    complete = False
+    
+    try:
+        for page in iter_market_pages():
+            pages += 1
+            total_markets += len(page)
+
+            markets.extend(filter_low_probability_markets(page, seen, near))
+        # Hitting MARKETS_MAX_PAGES means the tail of the catalog was never seen
+        complete = pages < Config.MARKETS_MAX_PAGES
+
+        logger.info(f"API returned {total_markets} total active markets across {pages} pages (page size: {Config.MARKETS_API_LIMIT})")
         
         categories_str = ", ".join(Config.MARKET_CATEGORIES)
         logger.info(f"Found {len(markets)} low-probability markets (<{Config.PROBABILITY_THRESHOLD*100}%) in categories: {categories_str}")
         
     except requests.RequestException as e:
-        logger.error(f"Error fetching markets: {e}")
+        logger.error(f"Error fetching markets after {pages} pages: {e}")
+    
+    if markets or complete:
+        last_refresh_price_moves = apply_market_delta(markets, complete, near=near)
     
     return markets
 
+def reload_markets():
+    """
+    Rebuild the snapshot and index from the markets table, on shard members that leave
+    discovery to the leader.
+    """
+    with _delta_lock:
+        get_market_snapshot().seed(get_active_markets())
+        markets = get_monitored_markets()
+        publish_market_index(markets)
+    return markets
+
 def refresh_markets():
     logger.info("Refreshing market data...")
-    return fetch_low_probability_markets()
+    discovery_running.set()
+    try:
+        return fetch_low_probability_markets()
+    finally:
+        discovery_running.clear()
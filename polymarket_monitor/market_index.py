@@ -0,0 +1,75 @@
+﻿import logging
+from .database import get_monitored_markets
+from .records import Market
+
+logger = logging.getLogger(__name__)
+
+class MarketIndex:
+    """
+    Read-only view of the monitored markets, condition_id -> Market.
+
+    Never modified after construction: discovery builds a new index from each refresh
+    and swaps it in with a single assignment, so the poller and stream read whichever
+    index is current without taking a lock or touching SQLite.
+    """
+
+    __slots__ = ("_markets", "outcome_count")
+
+    def __init__(self, markets=None):
+        self._markets = markets or {}
+        self.outcome_count = sum(len(m.outcomes) for m in self._markets.values())
+
+    @classmethod
+    def from_rows(cls, rows):
+        return cls(Market.from_rows(rows))
+
+    def merged(self, rows, scope=()):
+        """
+        A new index with the markets in rows replacing their earlier entries, for
+        refreshes that did not see the whole catalog. Markets in scope that are not in
+        rows are dropped.
+        """
+        markets = dict(self._markets)
+        for condition_id in scope:
+            markets.pop(condition_id, None)
+        markets.update(Market.from_rows(rows))
+        return MarketIndex(markets)
+
+    def get(self, condition_id, default=None):
+        return self._markets.get(condition_id, default)
+
+    def items(self):
+        return self._markets.items()
+
+    def __contains__(self, condition_id):
+        return condition_id in self._markets
+
+    def __iter__(self):
+        return iter(self._markets)
+
+    def __len__(self):
+        return len(self._markets)
+
+_index = None
+
+def get_market_index():
+    """
+    The current index. Before the first refresh publishes one it is seeded from the
+    markets table, which only holds one outcome per market.
+    """
+    global _index
+    index = _index
+    if index is None:
+        index = MarketIndex.from_rows(get_monitored_markets())
+        _index = index
+    return index
+
+def publish_market_index(markets, complete=True, scope=()):
+    """
+    Swap in an index built from a refresh's market rows.
+    """
+    global _index
+    index = MarketIndex.from_rows(markets) if complete else get_market_index().merged(markets, scope)
+    _index = index
+    logger.debug(f"Published market index: {len(index)} markets, {index.outcome_count} outcomes")
+    return index
@@ -0,0 +1,71 @@
+﻿import threading
+
+class MarketSnapshot:
+    """
+    The low-probability market set from the last refresh, keyed by condition_id.
+
+    diff() compares a fresh refresh against it so only new and changed markets are
+    written, and markets that dropped out of the set (resolved, closed, or no longer
+    below the probability threshold) can be marked inactive.
+    """
+
+    def __init__(self):
+        self._markets = {}
+        self._lock = threading.Lock()
+
+    def seed(self, markets):
+        with self._lock:
+            self._markets = {m["condition_id"]: m for m in markets}
+
+    def diff(self, markets, complete=True, scope=()):
+        """
+        Return (new, changed, closed_condition_ids). Closures are only reported for a
+        complete refresh, since a partial one cannot tell a missing market from one
+        on a page that failed to load, or for the condition_ids in scope, which a
+        partial refresh checked individually.
+        """
+        fresh = {m["condition_id"]: m for m in markets}
+        new = []
+        changed = []
+
+        with self._lock:
+            for condition_id, market in fresh.items():
+                previous = self._markets.get(condition_id)
+                if previous is None:
+                    new.append(market)
+                elif (previous["current_probability"] != market["current_probability"]
+                      or previous.get("outcome") != market.get("outcome")
+                      or previous.get("title") != market.get("title")):
+                    changed.append(market)
+
+            if complete:
+                closed = [cid for cid in self._markets if cid not in fresh]
+            else:
+                closed = [cid for cid in scope if cid in self._markets and cid not in fresh]
+
+        return new, changed, closed
+
+    def count_price_moves(self, markets, min_move):
+        """
+        Count markets whose probability moved by at least min_move since the snapshot.
+        """
+        moves = 0
+        with self._lock:
+            for market in markets:
+                previous = self._markets.get(market["condition_id"])
+                if previous is not None and abs(market["current_probability"] - previous["current_probability"]) >= min_move:
+                    moves += 1
+        return moves
+
+    def update(self, markets, complete=True, scope=()):
+        with self._lock:
+            fresh = {m["condition_id"]: m for m in markets}
+            if complete:
+                self._markets = fresh
+            else:
+                for condition_id in scope:
+                    self._markets.pop(condition_id, None)
+                self._markets.update(fresh)
+
+    def __len__(self):
+        return len(self._markets)
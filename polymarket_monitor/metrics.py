@@ -0,0 +1,185 @@
+﻿import time
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LAG_BUCKETS = (1, 2, 4, 8, 15, 30, 60, 120, 300, 600)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels, extra=None):
+    items = list(labels)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', bound))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+API_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "polymarket_api_request_seconds", "Latency of outbound API requests by endpoint"))
+API_REQUEST_ERRORS = REGISTRY.register(Counter(
+    "polymarket_api_request_errors_total", "Failed outbound API requests by endpoint"))
+CYCLE_SECONDS = REGISTRY.register(Histogram(
+    "polymarket_cycle_seconds", "Duration of monitor jobs (trade poll, market refresh)"))
+TRADES_TOTAL = REGISTRY.register(Counter(
+    "polymarket_trades_total", "Trades by pipeline stage: fetched, new (past the cursor), matched, recorded"))
+LAST_CYCLE_TRADES = REGISTRY.register(Gauge(
+    "polymarket_last_cycle_trades", "Trades by pipeline stage in the most recent poll"))
+DEDUP_LOOKUPS = REGISTRY.register(Counter(
+    "polymarket_dedup_lookups_total", "Dedup index lookups by result: hit, miss, fallback"))
+WALLET_PROFILE_LOOKUPS = REGISTRY.register(Counter(
+    "polymarket_wallet_profile_lookups_total", "Wallet profile cache lookups by result: hit, miss"))
+DB_OPERATION_SECONDS = REGISTRY.register(Histogram(
+    "polymarket_db_operation_seconds", "Duration of database operations"))
+MONITORED_MARKETS = REGISTRY.register(Gauge(
+    "polymarket_monitored_markets", "Low-probability markets currently monitored"))
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    "polymarket_startup_seconds", "Process start to first poll, first detection and first discovery, by start mode"))
+ALERT_SEND_SECONDS = REGISTRY.register(Histogram(
+    "polymarket_alert_send_seconds", "Alert delivery latency per channel"))
+ALERTS_SENT = REGISTRY.register(Counter(
+    "polymarket_alerts_sent_total", "Trades delivered per alert channel"))
+ALERT_FAILURES = REGISTRY.register(Counter(
+    "polymarket_alert_failures_total", "Failed alert deliveries per channel"))
+DETECTION_LAG_SECONDS = REGISTRY.register(Histogram(
+    "polymarket_detection_lag_seconds", "Trade timestamp to alert delivered, per channel", buckets=LAG_BUCKETS))
+
+@contextmanager
+def track_request(endpoint):
+    """
+    Time an outbound API call and count it as an error if the block raises.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        API_REQUEST_ERRORS.inc(endpoint=endpoint)
+        raise
+    finally:
+        API_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+
+def timed(histogram, **labels):
+    """
+    Decorator recording each call's duration in histogram.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(host, port):
+    """
+    Serve REGISTRY in Prometheus text format at http://host:port/metrics from a daemon thread.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"Metrics available at http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,83 @@
+﻿import time
+import random
+from .config import Config
+
+class TokenBucket:
+    """
+    Rate budget: refills at rate_per_hour, holds at most burst tokens.
+    """
+
+    def __init__(self, rate_per_hour, burst):
+        self.rate = rate_per_hour / 3600.0
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_available(self):
+        self._refill()
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class AdaptivePollScheduler:
+    """
+    Picks the delay before the next trade poll.
+
+    Large trades or price moves drop the interval to POLL_INTERVAL_MIN_SECONDS for
+    POLL_ACTIVITY_HOLD_SECONDS; quiet polls stretch it gradually towards
+    POLL_INTERVAL_MAX_SECONDS. 429/5xx responses switch to jittered exponential backoff
+    (or the server's Retry-After). Every poll also needs a token from the hourly budget,
+    so fast polling is paid for by the tokens saved while quiet.
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.interval = Config.POLL_INTERVAL_SECONDS
+        self.hot_until = 0.0
+        self.error_streak = 0
+        self.retry_after = None
+
+    def record_activity(self):
+        self.hot_until = time.monotonic() + Config.POLL_ACTIVITY_HOLD_SECONDS
+        self.interval = Config.POLL_INTERVAL_MIN_SECONDS
+
+    def record_poll(self, large_trade_count):
+        self.error_streak = 0
+        self.retry_after = None
+        if large_trade_count:
+            self.record_activity()
+        elif time.monotonic() >= self.hot_until:
+            self.interval = min(
+                Config.POLL_INTERVAL_MAX_SECONDS,
+                max(self.interval, Config.POLL_INTERVAL_SECONDS) * Config.POLL_QUIET_BACKOFF_FACTOR
+            )
+
+    def record_error(self, status_code=None, retry_after=None):
+        # Client errors other than 429 will not improve by waiting longer
+        if status_code is not None and status_code < 500 and status_code != 429:
+            return
+        self.error_streak += 1
+        self.retry_after = retry_after
+
+    def next_delay(self):
+        if self.error_streak:
+            if self.retry_after:
+                delay = self.retry_after
+            else:
+                delay = min(Config.POLL_BACKOFF_MAX_SECONDS, Config.POLL_INTERVAL_SECONDS * 2 ** self.error_streak)
+                delay *= random.uniform(0.5, 1.0)
+        else:
+            delay = self.interval
+        return max(delay, self.bucket.time_until_available())
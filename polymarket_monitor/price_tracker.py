@@ -0,0 +1,89 @@
+﻿import requests
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .config import Config
+from .http_client import http_get, response_json
+from .metrics import track_request
+from .market_index import get_market_index
+from .sharding import owns
+from . import market_discovery
+from .market_discovery import filter_low_probability_markets, apply_market_delta
+
+logger = logging.getLogger(__name__)
+
+def tracked_condition_ids():
+    """
+    The monitored markets this instance owns plus the ones just above
+    PROBABILITY_THRESHOLD (known only where discovery runs).
+    """
+    owned = {cid for cid in get_market_index() if owns(cid)}
+    return sorted(owned | market_discovery.near_threshold_ids)
+
+def fetch_market_batch(condition_ids):
+    url = f"{Config.GAMMA_API_BASE}/markets"
+    params = {
+        "condition_ids": condition_ids,
+        "active": "true",
+        "closed": "false",
+        "limit": len(condition_ids)
+    }
+
+    with track_request("gamma_prices"):
+        response = http_get(url, params=params)
+        response.raise_for_status()
+
+    return response_json(response)
+
+def _load_batch(condition_ids):
+    """
+    Return the markets of one batch, or None if the batch cannot be trusted to say
+    which of its markets are still open.
+    """
+    try:
+        page = fetch_market_batch(condition_ids)
+    except requests.RequestException as e:
+        logger.warning(f"Price refresh batch of {len(condition_ids)} markets failed: {e}")
+        return None
+
+    requested = set(condition_ids)
+    markets = [m for m in page if m.get("conditionId") in requested]
+    if len(markets) < len(page):
+        # The filter was not applied; absent markets may simply not have been returned
+        logger.warning(f"Price refresh got {len(page) - len(markets)} markets it did not ask for, ignoring the batch")
+        return None
+    return markets
+
+def refresh_prices():
+    """
+    Re-price just the tracked markets, PRICE_TRACKER_BATCH_SIZE per request, and apply
+    the result as a delta scoped to the batches that loaded: markets that rose above
+    the threshold or closed leave the set, near-threshold ones that fell below join it.
+    Returns (markets checked, markets that entered the set or moved).
+    """
+    # A running discovery re-prices everything anyway and already uses the Gamma pool
+    if market_discovery.discovery_running.is_set():
+        return 0, 0
+
+    condition_ids = tracked_condition_ids()
+    if not condition_ids:
+        return 0, 0
+
+    size = max(1, Config.PRICE_TRACKER_BATCH_SIZE)
+    batches = [condition_ids[i:i + size] for i in range(0, len(condition_ids), size)]
+    markets = []
+    near = set()
+    seen = set()
+    scope = set()
+
+    with ThreadPoolExecutor(max_workers=max(1, Config.MARKET_DISCOVERY_WORKERS)) as executor:
+        for batch, page in zip(batches, executor.map(_load_batch, batches)):
+            if page is None:
+                continue
+            markets.extend(filter_low_probability_markets(page, seen, near))
+            scope.update(batch)
+
+    if not scope:
+        return 0, 0
+
+    price_moves = apply_market_delta(markets, complete=False, scope=scope, near=near)
+    return len(scope), price_moves
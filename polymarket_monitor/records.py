@@ -0,0 +1,135 @@
+﻿from .config import Config
+
+class Trade:
+    """
+    The fields of a /trades row the monitor uses, converted once.
+
+    Only built for rows on a monitored market that pass the dollar-value check; the
+    decoded dicts of everything else are dropped without further work.
+    """
+
+    __slots__ = (
+        "condition_id", "transaction_hash", "side", "size", "price", "dollar_value",
+        "outcome", "wallet_address", "timestamp", "title", "slug"
+    )
+
+    def __init__(self, condition_id, transaction_hash, side, size, price, dollar_value,
+                 outcome="", wallet_address="", timestamp="", title="", slug=""):
+        self.condition_id = condition_id
+        self.transaction_hash = transaction_hash
+        self.side = side
+        self.size = size
+        self.price = price
+        self.dollar_value = dollar_value
+        self.outcome = outcome
+        self.wallet_address = wallet_address
+        self.timestamp = timestamp
+        self.title = title
+        self.slug = slug
+
+    @classmethod
+    def from_api(cls, raw, size, price, dollar_value):
+        return cls(
+            raw.get("conditionId") or raw.get("market", ""),
+            raw.get("transactionHash") or raw.get("id", ""),
+            raw.get("side", "UNKNOWN"),
+            size,
+            price,
+            dollar_value,
+            raw.get("outcome", ""),
+            raw.get("proxyWallet") or raw.get("maker", ""),
+            raw.get("timestamp", ""),
+            raw.get("title", ""),
+            raw.get("slug", "")
+        )
+
+    def to_alert(self, market, rules=()):
+        """
+        The trade_data dict stored in large_trades and sent to alert channels. Trades
+        on markets outside the monitored set (matched by a wallet or market watchlist
+        rule) fall back to the trade's own title and slug, and its price as probability.
+        """
+        if market is None:
+            title, slug, outcome, probability = self.title or "Unknown", self.slug, "", self.price
+        else:
+            title, slug, outcome = market.title, market.slug or self.slug, market.outcome
+            probability = market.probability_of(self.outcome)
+        return {
+            "condition_id": self.condition_id,
+            "market_title": title,
+            "side": self.side,
+            "size": self.size,
+            "price": self.price,
+            "dollar_value": self.dollar_value,
+            "outcome": self.outcome or outcome,
+            "wallet_address": self.wallet_address,
+            "transaction_hash": self.transaction_hash,
+            "timestamp": self.timestamp,
+            "current_probability": probability,
+            "slug": slug,
+            "rules": list(rules)
+        }
+
+class Market:
+    """
+    A monitored market with the probability of each of its low-probability outcomes.
+
+    current_probability and outcome are those of the least likely outcome, which is
+    what the markets table stores for the condition.
+    """
+
+    __slots__ = ("condition_id", "title", "slug", "category", "outcomes", "current_probability", "outcome")
+
+    def __init__(self, condition_id, title, slug="", category="other", outcomes=None):
+        self.condition_id = condition_id
+        self.title = title
+        self.slug = slug
+        self.category = category
+        self.outcomes = outcomes or {}
+        self.outcome, self.current_probability = min(
+            self.outcomes.items(), key=lambda item: item[1], default=("", 1.0)
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Group market rows (one per condition and outcome, as discovery and the markets
+        table produce them) into Market records keyed by condition_id.
+        """
+        markets = {}
+        outcomes = {}
+        for row in rows:
+            condition_id = row["condition_id"]
+            outcomes.setdefault(condition_id, {})[row.get("outcome") or ""] = row["current_probability"]
+            if condition_id not in markets:
+                markets[condition_id] = row
+        return {
+            condition_id: cls(condition_id, row["title"], row.get("slug") or "",
+                              row.get("category") or "other", outcomes[condition_id])
+            for condition_id, row in markets.items()
+        }
+
+    def probability_of(self, outcome):
+        """
+        The probability of outcome if it is one of the tracked low-probability outcomes,
+        otherwise that of the least likely outcome.
+        """
+        return self.outcomes.get(outcome, self.current_probability)
+
+def parse_large_trade(raw, size_min=None, size_max=None):
+    """
+    Return a Trade if raw is within the configured dollar range, otherwise None.
+    Buys are valued at size * price, sells at size (as the monitor always has).
+    """
+    size_min = Config.TRADE_SIZE_MIN if size_min is None else size_min
+    size_max = Config.TRADE_SIZE_MAX if size_max is None else size_max
+    try:
+        size = float(raw.get("size", 0))
+        price = float(raw.get("price", 0))
+    except (TypeError, ValueError):
+        return None
+
+    dollar_value = size * price if raw.get("side") == "BUY" else size
+    if dollar_value < size_min or dollar_value > size_max:
+        return None
+    return Trade.from_api(raw, size, price, dollar_value)
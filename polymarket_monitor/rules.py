@@ -0,0 +1,217 @@
+﻿import os
+import json
+import time
+import logging
+import threading
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+class Rule:
+    """
+    One detection rule. Unset criteria match anything.
+
+    Rules with categories or max_probability need the trade's market to be in the
+    monitored set (that is where both come from); the others can also match trades
+    on markets discovery does not track, e.g. a wallet watchlist.
+    """
+
+    __slots__ = (
+        "name", "condition_ids", "categories", "wallets", "sides",
+        "min_value", "max_value", "max_probability"
+    )
+
+    def __init__(self, name, condition_ids=None, categories=None, wallets=None, sides=None,
+                 min_value=None, max_value=None, max_probability=None):
+        self.name = name
+        self.condition_ids = frozenset(condition_ids or ())
+        self.categories = frozenset(c.lower() for c in categories or ())
+        self.wallets = frozenset(w.lower() for w in wallets or ())
+        self.sides = frozenset(s.upper() for s in sides or ())
+        self.min_value = Config.TRADE_SIZE_MIN if min_value is None else float(min_value)
+        self.max_value = Config.TRADE_SIZE_MAX if max_value is None else float(max_value)
+        self.max_probability = None if max_probability is None else float(max_probability)
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError(f"Rule must be a JSON object, got {data!r}")
+        if not data.get("name") or not isinstance(data["name"], str):
+            raise ValueError(f"Rule without a name: {data}")
+        unknown = set(data) - set(cls.__slots__)
+        if unknown:
+            raise ValueError(f"Rule {data['name']!r} has unknown keys: {', '.join(sorted(unknown))}")
+        for key in ("condition_ids", "categories", "wallets", "sides"):
+            if key in data and not isinstance(data[key], list):
+                raise ValueError(f"Rule {data['name']!r}: {key} must be a list")
+            if key in data and not all(isinstance(v, str) for v in data[key]):
+                raise ValueError(f"Rule {data['name']!r}: {key} must only contain strings")
+        for key in ("min_value", "max_value", "max_probability"):
+            if data.get(key) is not None and (isinstance(data[key], bool) or not isinstance(data[key], (int, float))):
+                raise ValueError(f"Rule {data['name']!r}: {key} must be a number")
+        return cls(**data)
+
+    @property
+    def needs_market(self):
+        return bool(self.categories) or self.max_probability is not None
+
+    def matches(self, trade, market_info):
+        if not self.min_value <= trade.dollar_value <= self.max_value:
+            return False
+        if self.sides and trade.side not in self.sides:
+            return False
+        if self.condition_ids and trade.condition_id not in self.condition_ids:
+            return False
+        if self.wallets and trade.wallet_address.lower() not in self.wallets:
+            return False
+        if self.needs_market:
+            if market_info is None:
+                return False
+            if self.categories and market_info.category.lower() not in self.categories:
+                return False
+            if self.max_probability is not None and market_info.probability_of(trade.outcome) >= self.max_probability:
+                return False
+        return True
+
+def default_rule():
+    """
+    The original global rule: any monitored market, TRADE_SIZE_MIN..TRADE_SIZE_MAX.
+    """
+    return Rule("default", max_probability=Config.PROBABILITY_THRESHOLD)
+
+class RuleIndex:
+    """
+    Rules compiled into lookup tables so a trade is only checked against the rules
+    that could apply to it. Each rule is filed under its most selective key
+    (condition_id, then wallet, then category), or in the catch-all list; match()
+    gathers the candidates from the trade's keys and checks only those.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.by_condition = {}
+        self.by_wallet = {}
+        self.by_category = {}
+        self.catch_all = []
+
+        for rule in self.rules:
+            if rule.condition_ids:
+                for condition_id in rule.condition_ids:
+                    self.by_condition.setdefault(condition_id, []).append(rule)
+            elif rule.wallets:
+                for wallet in rule.wallets:
+                    self.by_wallet.setdefault(wallet, []).append(rule)
+            elif rule.categories:
+                for category in rule.categories:
+                    self.by_category.setdefault(category, []).append(rule)
+            else:
+                self.catch_all.append(rule)
+
+        # Envelope over all rules, used to reject trades before building a record
+        self.min_value = min((r.min_value for r in self.rules), default=Config.TRADE_SIZE_MIN)
+        self.max_value = max((r.max_value for r in self.rules), default=Config.TRADE_SIZE_MAX)
+        self.matches_unmonitored = any(not r.needs_market for r in self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def may_match(self, condition_id, wallet, market_info):
+        """
+        Cheap pre-check on raw fields: False if no rule can match this trade.
+        """
+        if market_info is not None:
+            return True
+        if not self.matches_unmonitored:
+            return False
+        return bool(self.catch_all or condition_id in self.by_condition
+                    or (wallet and wallet.lower() in self.by_wallet))
+
+    def match(self, trade, market_info):
+        """
+        Return the names of the rules trade matches.
+        """
+        candidates = list(self.catch_all)
+        candidates.extend(self.by_condition.get(trade.condition_id, ()))
+        if trade.wallet_address:
+            candidates.extend(self.by_wallet.get(trade.wallet_address.lower(), ()))
+        if market_info is not None and market_info.category:
+            candidates.extend(self.by_category.get(market_info.category.lower(), ()))
+        return [rule.name for rule in candidates if rule.matches(trade, market_info)]
+
+def load_rules(path):
+    """
+    Read rules from a JSON file:
+
+        {"include_default": true, "rules": [{"name": "...", "categories": [...], ...}]}
+
+    include_default (true unless set) keeps the global rule from the environment.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    if not isinstance(data, dict):
+        raise ValueError("Rules file must be a JSON object with a \"rules\" list")
+    if not isinstance(data.get("rules", []), list):
+        raise ValueError("\"rules\" must be a list")
+    rules = [Rule.from_dict(r) for r in data.get("rules", [])]
+    if data.get("include_default", True):
+        rules.insert(0, default_rule())
+
+    names = [r.name for r in rules]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate rule names: {', '.join(duplicates)}")
+    return RuleIndex(rules)
+
+class RuleEngine:
+    """
+    Holds the current RuleIndex and reloads it when the rules file changes.
+
+    Reloads are checked at most every ALERT_RULES_RELOAD_SECONDS (by mtime). A file
+    that fails to parse is logged and the previous rules stay active. The index is
+    replaced by reference, so a trade batch always sees one consistent rule set.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.index = RuleIndex([default_rule()])
+        if path:
+            self.reload()
+
+    def reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+            index = load_rules(self.path)
+        except Exception as e:
+            # Whatever is wrong with the file, detection keeps running on the old rules
+            logger.error(f"Could not load alert rules from {self.path}, keeping {len(self.index)} current rule(s): {e}")
+            return False
+        self.index = index
+        self._mtime = mtime
+        logger.info(f"Loaded {len(index)} alert rule(s) from {self.path}")
+        return True
+
+    def current(self):
+        if self.path:
+            now = time.monotonic()
+            if now - self._checked_at >= Config.ALERT_RULES_RELOAD_SECONDS:
+                with self._lock:
+                    self._checked_at = now
+                    try:
+                        changed = os.path.getmtime(self.path) != self._mtime
+                    except OSError:
+                        changed = False
+                    if changed:
+                        self.reload()
+        return self.index
+
+_engine = None
+
+def get_rule_engine():
+    global _engine
+    if _engine is None:
+        _engine = RuleEngine(Config.ALERT_RULES_PATH or None)
+    return _engine
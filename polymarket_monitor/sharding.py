@@ -0,0 +1,146 @@
+﻿import os
+import time
+import bisect
+import socket
+import hashlib
+import logging
+import importlib
+from .config import Config
+from .database import renew_shard_lease, get_live_shard_members, release_shard_lease
+
+logger = logging.getLogger(__name__)
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+class HashRing:
+    """
+    Consistent hash ring over member ids, with virtual_nodes points per member so a
+    member joining or leaving moves only about 1/N of the keys.
+    """
+
+    def __init__(self, members, virtual_nodes=64):
+        self.members = tuple(sorted(members))
+        points = sorted((_hash(f"{member}#{i}"), member) for member in self.members for i in range(virtual_nodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key):
+        if not self._hashes:
+            return None
+        return self._owners[bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)]
+
+class SQLiteLeaseStore:
+    """
+    Member leases in the shard_members table of the shared database, for instances
+    on one host. Other stores provide the same renew/live_members/release methods.
+    """
+
+    def renew(self, member_id, ttl):
+        renew_shard_lease(member_id, time.time() + ttl)
+
+    def live_members(self):
+        return get_live_shard_members(time.time())
+
+    def release(self, member_id):
+        release_shard_lease(member_id)
+
+def load_lease_store(spec):
+    """
+    "sqlite", or "package.module:ClassName" for a store constructed without arguments.
+    """
+    if spec == "sqlite":
+        return SQLiteLeaseStore()
+    module_name, _, class_name = spec.partition(":")
+    if not module_name or not class_name:
+        raise ValueError(f"SHARD_LEASE_STORE must be 'sqlite' or 'module:Class', got '{spec}'")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+class ShardCoordinator:
+    """
+    This instance's membership in a group of monitors splitting the markets between them.
+
+    heartbeat() renews our lease and rebuilds the hash ring from the members whose
+    leases are live. Every member builds the same ring from the same store, so no other
+    coordination is needed; a member that dies drops out once its lease expires and its
+    markets move to the others. If our own renewals fail for a whole lease we own
+    nothing, so a cut-off instance stops alerting before its markets are taken over.
+    Overlap during a rebalance cannot double-alert: large_trades accepts each
+    transaction_hash once and only the instance whose insert succeeded queues the alert.
+    """
+
+    def __init__(self, member_id, store, lease_ttl, virtual_nodes=64):
+        self.member_id = member_id
+        self.store = store
+        self.lease_ttl = lease_ttl
+        self.virtual_nodes = virtual_nodes
+        self.ring = HashRing((), virtual_nodes)
+        self._lease_valid_until = 0.0
+
+    def heartbeat(self):
+        """
+        Renew our lease and refresh the membership. Returns True if the ring changed.
+        """
+        started = time.monotonic()
+        self.store.renew(self.member_id, self.lease_ttl)
+        self._lease_valid_until = started + self.lease_ttl
+
+        members = tuple(sorted(set(self.store.live_members()) | {self.member_id}))
+        previous = self.ring.members
+        if members == previous:
+            return False
+
+        self.ring = HashRing(members, self.virtual_nodes)
+        joined = sorted(set(members) - set(previous))
+        left = sorted(set(previous) - set(members))
+        logger.info(f"Shard membership now {len(members)} ({', '.join(members)}); "
+                    f"joined: {', '.join(joined) or 'none'}, left: {', '.join(left) or 'none'}")
+        return True
+
+    @property
+    def has_lease(self):
+        return time.monotonic() < self._lease_valid_until
+
+    @property
+    def is_leader(self):
+        # The lowest member id runs the jobs only one instance should: discovery, retention
+        return self.has_lease and self.ring.members[:1] == (self.member_id,)
+
+    def owns(self, condition_id):
+        return self.has_lease and self.ring.owner(condition_id) == self.member_id
+
+    def release(self):
+        """
+        Give up our lease so the others rebalance now rather than when it expires.
+        """
+        self._lease_valid_until = 0.0
+        self.store.release(self.member_id)
+
+_shard = None
+
+def get_shard():
+    """
+    The process-wide coordinator, or None when SHARDING_ENABLED is off.
+    """
+    global _shard
+    if _shard is None and Config.SHARDING_ENABLED:
+        member_id = Config.SHARD_MEMBER_ID or f"{socket.gethostname()}-{os.getpid()}"
+        _shard = ShardCoordinator(
+            member_id,
+            load_lease_store(Config.SHARD_LEASE_STORE),
+            Config.SHARD_LEASE_TTL_SECONDS,
+            virtual_nodes=Config.SHARD_VIRTUAL_NODES
+        )
+        logger.info(f"Sharded mode as member {member_id}, lease {Config.SHARD_LEASE_TTL_SECONDS:.0f}s")
+    return _shard
+
+def owns(condition_id):
+    """
+    True if this instance handles condition_id (always, when not sharded).
+    """
+    shard = get_shard()
+    return shard is None or shard.owns(condition_id)
+
+def member_id():
+    shard = get_shard()
+    return shard.member_id if shard is not None else None
@@ -1,78 +1,251 @@
 ﻿import requests
 import logging
-import urllib3
+import threading
 from .config import Config
-from .database import insert_large_trade, is_trade_processed, get_monitored_markets
-
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from .http_client import http_get, response_json
+from .database import (
+    insert_large_trades, is_trade_processed,
+    get_trade_cursor, set_trade_cursor, transaction,
+    count_large_trades, get_recent_trade_hashes, iter_trade_hashes, enqueue_alerts
+)
+from .alerting import enabled_alert_channels
+from .dedup import TransactionDedup
+from .records import parse_large_trade
+from .market_index import get_market_index
+from .rules import get_rule_engine
+from .aggregator import get_aggregator
+from .wallet_profiles import get_wallet_profiler
+from .sharding import get_shard, member_id
+from .metrics import track_request, TRADES_TOTAL, LAST_CYCLE_TRADES
+from .utils import parse_timestamp
 
 logger = logging.getLogger(__name__)
 
-def fetch_large_trades():
-    large_trades = []
+# (timestamp, tx hashes at that timestamp) of the newest trade a poll has examined
+_trade_cursor = None
+_cursor_loaded = False
+_dedup_index = None
+
+# Polling and streaming can both feed process_trades; serialize them so the cursor
+# and dedup index see one batch at a time
+_process_lock = threading.Lock()
+
+def trade_timestamp(trade):
+    return parse_timestamp(trade.get("timestamp", 0))
+
+def trade_cursor_key():
+    # Shard members each follow the feed with their own cursor
+    member = member_id()
+    return "trade_cursor" if member is None else f"trade_cursor:{member}"
+
+def load_trade_cursor():
+    global _trade_cursor, _cursor_loaded
+    if not _cursor_loaded:
+        _trade_cursor = get_trade_cursor(trade_cursor_key())
+        _cursor_loaded = True
+    return _trade_cursor
+
+def rewind_trade_cursor(seconds):
+    """
+    Move the cursor back so the next poll re-examines the last seconds of trades, e.g.
+    on markets this instance just took over from a shard member that died. Trades that
+    were already recorded are dropped by dedup and the transaction_hash constraint.
+    """
+    global _trade_cursor
+    with _process_lock:
+        cursor = load_trade_cursor()
+        if cursor is not None:
+            _trade_cursor = (cursor[0] - seconds, set())
+
+def get_dedup_index():
+    global _dedup_index
+    if _dedup_index is None:
+        bloom_capacity = Config.DEDUP_BLOOM_CAPACITY if Config.DEDUP_BLOOM_ENABLED else 0
+        index = TransactionDedup(
+            Config.DEDUP_CACHE_SIZE,
+            is_trade_processed,
+            bloom_capacity=bloom_capacity,
+            bloom_error_rate=Config.DEDUP_BLOOM_ERROR_RATE
+        )
+        index.warm(
+            get_recent_trade_hashes(Config.DEDUP_CACHE_SIZE),
+            all_hashes=iter_trade_hashes() if bloom_capacity else (),
+            total_count=count_large_trades()
+        )
+        logger.info(f"Dedup index warmed with {len(index)} recent transaction hashes")
+        _dedup_index = index
+    return _dedup_index
+
+def select_new_trades(trades, cursor):
+    """
+    Return the trades newer than the cursor and the advanced cursor.
+    The API returns newest first, so iteration stops at the first trade older than the
+    cursor; trades sharing the cursor timestamp are told apart by transaction hash.
+    """
+    new_trades = []
+    reached_known = cursor is None
+
+    for trade in trades:
+        ts = trade_timestamp(trade)
+        tx_hash = trade.get("transactionHash", trade.get("id", ""))
+
+        if cursor is not None:
+            cursor_ts, cursor_hashes = cursor
+            if ts < cursor_ts:
+                reached_known = True
+                break
+            if ts == cursor_ts and tx_hash in cursor_hashes:
+                reached_known = True
+                continue
+
+        new_trades.append(trade)
+
+    if not reached_known and len(trades) >= Config.TRADES_API_LIMIT:
+        logger.warning(f"All {len(trades)} trades returned are newer than the last poll; some trades may have been missed. Consider lowering POLL_INTERVAL_SECONDS.")
+
+    return new_trades, advance_cursor(cursor, new_trades)
+
+def advance_cursor(cursor, trades):
+    if not trades:
+        return cursor
+
+    newest_ts = max(trade_timestamp(t) for t in trades)
+    if cursor is not None and newest_ts < cursor[0]:
+        return cursor
+
+    newest_hashes = set(cursor[1]) if cursor is not None and newest_ts == cursor[0] else set()
+    newest_hashes.update(
+        t.get("transactionHash", t.get("id", "")) for t in trades if trade_timestamp(t) == newest_ts
+    )
+    return newest_ts, newest_hashes
+
+def trade_size_floor():
+    """
+    Server-side size filter for /trades: the smallest trade any rule can alert on, or
+    AGGREGATE_MIN_TRADE_VALUE when aggregation needs the smaller fills too.
+    """
+    floor = get_rule_engine().current().min_value
+    if get_aggregator() is not None:
+        floor = min(floor, Config.AGGREGATE_MIN_TRADE_VALUE)
+    return floor
+
+def fetch_recent_trades():
+    url = f"{Config.DATA_API_BASE}/trades"
+    params = {
+        "limit": Config.TRADES_API_LIMIT,
+        "filterType": "CASH",
+        "filterAmount": trade_size_floor()
+    }
     
-    try:
-        url = f"{Config.DATA_API_BASE}/trades"
-        params = {
-            "limit": Config.TRADES_API_LIMIT,
-            "filterType": "CASH",
-            "filterAmount": Config.TRADE_SIZE_MIN
-        }
-        
-        response = requests.get(url, params=params, timeout=30, verify=False)
+    with track_request("data_trades"):
+        response = http_get(url, params=params)
         response.raise_for_status()
+    
+    return response_json(response)
+
+def match_large_trades(trades, monitored_markets, dedup_index, rule_index=None):
+    """
+    Return trade_data dicts for the trades matching at least one alert rule and not
+    yet processed. Cheapest checks first: rows are rejected on market and the rules'
+    overall dollar range straight from the decoded dict, before any record is built.
+    """
+    if rule_index is None:
+        rule_index = get_rule_engine().current()
+    size_min, size_max = rule_index.min_value, rule_index.max_value
+    candidates = []
+    for raw in trades:
+        condition_id = raw.get("conditionId") or raw.get("market", "")
+        market_info = monitored_markets.get(condition_id)
+        if not rule_index.may_match(condition_id, raw.get("proxyWallet") or raw.get("maker", ""), market_info):
+            continue
+        
+        trade = parse_large_trade(raw, size_min, size_max)
+        if trade is None:
+            continue
+        
+        rules = rule_index.match(trade, market_info)
+        if not rules:
+            continue
+        
+        if dedup_index.is_processed(trade.transaction_hash):
+            continue
+        
+        candidates.append(trade.to_alert(market_info, rules))
+    return candidates
+
+def process_trades(trades, newest_first=True):
+    """
+    Run trades through the cursor, size/market filters and dedup, then record the new
+    large trades and queue their alerts. Polled pages are newest first and are cut at
+    the cursor. Streamed trades leave the cursor alone: it belongs to the polls, so the
+    safety poll still sweeps everything since the previous poll and picks up trades
+    the stream missed behind its newest one, while dedup drops those it delivered.
+    """
+    global _trade_cursor
+    
+    with _process_lock:
+        fetched_count = len(trades)
+        
+        cursor = load_trade_cursor()
+        if newest_first:
+            trades, new_cursor = select_new_trades(trades, cursor)
+        else:
+            new_cursor = cursor
+        
+        shard = get_shard()
+        if shard is not None:
+            trades = [t for t in trades if shard.owns(t.get("conditionId") or t.get("market", ""))]
+        
+        monitored_markets = get_market_index()
+        dedup_index = get_dedup_index()
+        candidates = match_large_trades(trades, monitored_markets, dedup_index)
+        
+        aggregator = get_aggregator()
+        if aggregator is not None:
+            # Rolling sums expect fills in time order
+            alerted = {trade_data["transaction_hash"] for trade_data in candidates}
+            candidates.extend(aggregator.add_trades(trades[::-1] if newest_first else trades, monitored_markets, alerted))
+        
+        profiler = get_wallet_profiler()
+        if profiler is not None and candidates:
+            # Profiled before recording, so a trade is not part of its own wallet's history
+            profiler.enrich(candidates)
         
-        trades = response.json()
+        # Record the new trades, their pending alerts and the advanced cursor in one transaction
+        with transaction():
+            large_trades = insert_large_trades(candidates)
+            enqueue_alerts(large_trades, enabled_alert_channels(), owner=member_id())
+            if new_cursor != cursor:
+                set_trade_cursor(*new_cursor, key=trade_cursor_key())
+        _trade_cursor = new_cursor
         
-        monitored_markets = {m["condition_id"]: m for m in get_monitored_markets()}
+        if profiler is not None:
+            profiler.observe(large_trades)
         
-        for trade in trades:
-            size = float(trade.get("size", 0))
-            price = float(trade.get("price", 0))
-            
-            if trade.get("side") == "BUY":
-                dollar_value = size * price
+        for trade_data in candidates:
+            dedup_index.add(trade_data["transaction_hash"])
+        
+        for trade_data in large_trades:
+            if trade_data.get("kind") == "aggregate":
+                logger.info(f"Aggregated buy-in detected: ${trade_data['dollar_value']:,.2f} in {trade_data['fills']} fills "
+                            f"within {trade_data['window_seconds']}s on {trade_data['market_title']}")
             else:
-                dollar_value = size
-            
-            # Check if trade is within the configured range
-            if dollar_value < Config.TRADE_SIZE_MIN or dollar_value > Config.TRADE_SIZE_MAX:
-                continue
-            
-            condition_id = trade.get("conditionId", trade.get("market", ""))
-            
-            market_info = monitored_markets.get(condition_id)
-            if not market_info:
-                continue
-            
-            tx_hash = trade.get("transactionHash", trade.get("id", ""))
-            
-            if is_trade_processed(tx_hash):
-                continue
-            
-            trade_data = {
-                "condition_id": condition_id,
-                "market_title": market_info.get("title", trade.get("title", "Unknown")),
-                "side": trade.get("side", "UNKNOWN"),
-                "size": size,
-                "price": price,
-                "dollar_value": dollar_value,
-                "outcome": trade.get("outcome", market_info.get("outcome", "")),
-                "wallet_address": trade.get("proxyWallet", trade.get("maker", "")),
-                "transaction_hash": tx_hash,
-                "timestamp": trade.get("timestamp", ""),
-                "current_probability": market_info.get("current_probability", 0),
-                "slug": market_info.get("slug", "")
-            }
-            
-            if insert_large_trade(trade_data):
-                large_trades.append(trade_data)
-                logger.info(f"New large trade detected: ${dollar_value:,.2f} on {trade_data['market_title']}")
+                logger.info(f"New large trade detected: ${trade_data['dollar_value']:,.2f} on {trade_data['market_title']} "
+                            f"(rules: {', '.join(trade_data['rules'])})")
+        
+        for stage, count in (("fetched", fetched_count), ("new", len(trades)),
+                             ("matched", len(candidates)), ("recorded", len(large_trades))):
+            TRADES_TOTAL.inc(count, stage=stage)
+            LAST_CYCLE_TRADES.set(count, stage=stage)
     
+    return large_trades
+
+def fetch_large_trades():
+    try:
+        return process_trades(fetch_recent_trades())
     except requests.RequestException as e:
         logger.error(f"Error fetching trades: {e}")
-    
-    return large_trades
+        return []
 
 def check_for_large_trades():
     logger.debug("Checking for large trades...")
@@ -0,0 +1,133 @@
+﻿import json
+import time
+import random
+import asyncio
+import logging
+import websockets
+from .config import Config
+from .json_codec import loads, DECODE_ERRORS
+from .market_index import get_market_index
+from .rules import get_rule_engine
+from .sharding import owns
+from .trade_monitor import process_trades, check_for_large_trades
+
+logger = logging.getLogger(__name__)
+
+def get_monitored_condition_ids():
+    # Markets on a rule's watchlist are subscribed even when discovery does not track them
+    condition_ids = set(get_market_index())
+    condition_ids.update(get_rule_engine().current().by_condition)
+    return sorted(cid for cid in condition_ids if owns(cid))
+
+def build_subscription(condition_ids):
+    return {
+        "action": "subscribe",
+        "subscriptions": [{
+            "topic": Config.STREAM_TOPIC,
+            "type": "trades",
+            "filters": json.dumps({"condition_ids": condition_ids})
+        }]
+    }
+
+def parse_trade_message(raw):
+    """
+    Extract trades from a push message. Accepts a single message or a list of them, with
+    the trade either at the top level or under "payload" (same fields as /trades).
+    """
+    try:
+        message = loads(raw)
+    except DECODE_ERRORS:
+        return []
+
+    messages = message if isinstance(message, list) else [message]
+    trades = []
+    for item in messages:
+        if not isinstance(item, dict):
+            continue
+        trade = item.get("payload", item)
+        if isinstance(trade, dict) and trade.get("conditionId") and trade.get("transactionHash"):
+            trades.append(trade)
+    return trades
+
+class TradeStream:
+    """
+    Push-based alternative to polling /trades.
+
+    Subscribes to trades for the monitored condition IDs, feeds them through the same
+    process_trades pipeline as polling, re-subscribes when the monitored set changes,
+    and reconnects with jittered exponential backoff. Every (re)connect is followed by
+    a REST backfill so trades missed while disconnected are still caught.
+    """
+
+    def __init__(self, on_new_trades):
+        self.on_new_trades = on_new_trades
+        self.connected = False
+
+    async def run(self):
+        backoff = Config.STREAM_RECONNECT_BASE_SECONDS
+        while True:
+            try:
+                await self._connect_and_consume()
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                logger.warning(f"Trade stream disconnected: {e}")
+            except Exception as e:
+                logger.error(f"Error in trade stream: {e}")
+
+            # Only back off further while connection attempts keep failing
+            if self.connected:
+                backoff = Config.STREAM_RECONNECT_BASE_SECONDS
+            self.connected = False
+
+            delay = backoff * random.uniform(0.5, 1.0)
+            logger.info(f"Reconnecting trade stream in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, Config.STREAM_RECONNECT_MAX_SECONDS)
+
+    async def _connect_and_consume(self):
+        async with websockets.connect(
+            Config.STREAM_WS_URL,
+            ping_interval=Config.STREAM_PING_SECONDS,
+            open_timeout=Config.STREAM_CONNECT_TIMEOUT_SECONDS
+        ) as ws:
+            condition_ids = await asyncio.to_thread(get_monitored_condition_ids)
+            await ws.send(json.dumps(build_subscription(condition_ids)))
+            self.connected = True
+            logger.info(f"Trade stream connected, subscribed to {len(condition_ids)} markets")
+
+            await self._backfill()
+
+            last_check = time.monotonic()
+            # One receive stays pending across timeouts. wait_for() around recv() can
+            # swallow a cancellation that lands as a message arrives (before Python
+            # 3.12), which left shutdown waiting on a stream that kept running
+            receive = asyncio.ensure_future(ws.recv())
+            try:
+                while True:
+                    done, _ = await asyncio.wait({receive}, timeout=Config.STREAM_RESUBSCRIBE_SECONDS)
+                    if done:
+                        trades = parse_trade_message(receive.result())
+                        receive = asyncio.ensure_future(ws.recv())
+                        if trades:
+                            await self._handle(trades)
+
+                    if time.monotonic() - last_check >= Config.STREAM_RESUBSCRIBE_SECONDS:
+                        last_check = time.monotonic()
+                        latest = await asyncio.to_thread(get_monitored_condition_ids)
+                        if latest != condition_ids:
+                            condition_ids = latest
+                            await ws.send(json.dumps(build_subscription(condition_ids)))
+                            logger.info(f"Trade stream re-subscribed to {len(condition_ids)} markets")
+            finally:
+                receive.cancel()
+
+    async def _handle(self, trades):
+        large_trades = await asyncio.to_thread(process_trades, trades, False)
+        if large_trades:
+            logger.info(f"Found {len(large_trades)} new large trades from stream")
+            self.on_new_trades()
+
+    async def _backfill(self):
+        large_trades = await asyncio.to_thread(check_for_large_trades)
+        if large_trades:
+            logger.info(f"Backfilled {len(large_trades)} large trades after connecting")
+            self.on_new_trades()
@@ -1,4 +1,6 @@
-﻿from datetime import datetime
+﻿import re
+from datetime import datetime
+from functools import lru_cache
 from .config import Config
 
 # Keywords for categorizing markets
@@ -18,29 +20,92 @@ POLITICS_KEYWORDS = [
     'impeach', 'policy', 'whitehouse', 'gop', 'dnc', 'rnc'
 ]
 
-def classify_market_category(market):
+# A keyword matches any word that starts with it ("elections", "democratic", "scored"),
+# as the substring scan this replaced did for all practical titles; only matches
+# inside a word ("dilemma" for "mma") are dropped
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def _build_keyword_index():
     """
-    Classify a market into a category based on keywords in title/slug.
-    Returns 'sports', 'politics', or 'other'.
+    Map every single-word keyword to the (category, keyword) pairs a word starting with
+    it matches: its own, plus those of keywords it contains ("whitehouse" also counts
+    as "house"). Multi-word keywords are keyed by their first word and listed under
+    _PHRASES with the words that must follow.
     """
-    title = market.get('question', market.get('title', '')).lower()
-    slug = market.get('slug', '').lower()
-    combined = f"{title} {slug}"
+    tagged = [(category, keyword) for category, keywords in (('sports', SPORTS_KEYWORDS), ('politics', POLITICS_KEYWORDS))
+              for keyword in keywords]
+    words = {}
+    phrases = {}
+    for category, keyword in tagged:
+        parts = keyword.split()
+        if len(parts) == 1:
+            words[keyword] = [(c, k) for c, k in tagged if k in keyword]
+        else:
+            phrases.setdefault(parts[0], []).append((parts[1:], category, keyword))
+    return words, phrases
+
+_KEYWORDS, _PHRASES = _build_keyword_index()
+_KEYWORD_LENGTHS = sorted({len(keyword) for keyword in _KEYWORDS})
+
+@lru_cache(maxsize=65536)
+def _word_keywords(token):
+    """
+    The (category, keyword) pairs matched by one word; titles share most of their
+    words, so this is cached separately from whole titles.
+    """
+    matches = []
+    for length in _KEYWORD_LENGTHS:
+        if length > len(token):
+            break
+        matches.extend(_KEYWORDS.get(token[:length], ()))
+    return matches
+
+def _phrase_follows(tokens, start, rest):
+    # Inner words must match whole; the last one, like a single keyword, as a prefix
+    following = tokens[start:start + len(rest)]
+    return (len(following) == len(rest) and following[:-1] == rest[:-1]
+            and following[-1].startswith(rest[-1]))
+
+@lru_cache(maxsize=65536)
+def _classify_text(title, slug):
+    sports_matches = set()
+    politics_matches = set()
+
+    tokens = _TOKEN_PATTERN.findall(f"{title} {slug}")
 
-    # Check for sports keywords
-    sports_matches = sum(1 for keyword in SPORTS_KEYWORDS if keyword in combined)
+    # Single-word keywords: each distinct word's prefixes of keyword length
+    for token in set(tokens):
+        for category, keyword in _word_keywords(token):
+            (sports_matches if category == 'sports' else politics_matches).add(keyword)
 
-    # Check for politics keywords
-    politics_matches = sum(1 for keyword in POLITICS_KEYWORDS if keyword in combined)
+    # Multi-word keywords are rare, so only walk the tokens when a first word is present
+    if not _PHRASES.keys().isdisjoint(tokens):
+        for i, token in enumerate(tokens):
+            for rest, category, keyword in _PHRASES.get(token, ()):
+                if _phrase_follows(tokens, i + 1, rest):
+                    (sports_matches if category == 'sports' else politics_matches).add(keyword)
 
     # Return category with highest matches
-    if sports_matches > politics_matches and sports_matches > 0:
+    if len(sports_matches) > len(politics_matches):
         return 'sports'
-    elif politics_matches > 0:
+    elif politics_matches:
         return 'politics'
     else:
         return 'other'
 
+def classify_market_category(market):
+    """
+    Classify a market into a category based on keywords in title/slug.
+    Returns 'sports', 'politics', or 'other'.
+
+    Keywords are matched against the start of each word of title and slug through
+    a prebuilt index, and results are memoized per (title, slug) since the same
+    markets come back on every refresh.
+    """
+    title = market.get('question', market.get('title', '')).lower()
+    slug = market.get('slug', '').lower()
+    return _classify_text(title, slug)
+
 def is_monitored_category(market):
     """
     Check if a market belongs to one of the monitored categories.
@@ -59,6 +124,19 @@ def format_currency(amount):
 def format_percentage(value):
     return f"{value * 100:.2f}%"
 
+def parse_timestamp(ts):
+    """
+    Convert an API timestamp (epoch seconds or ISO 8601) to epoch seconds, or 0.0 if unparseable.
+    """
+    try:
+        return float(ts)
+    except (ValueError, TypeError):
+        pass
+    try:
+        return datetime.fromisoformat(str(ts).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
 def format_timestamp(ts):
     if isinstance(ts, str):
         try:
@@ -0,0 +1,248 @@
+﻿import time
+import logging
+import threading
+import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .config import Config
+from .database import get_wallet_stats
+from .http_client import http_get, response_json
+from .metrics import track_request, WALLET_PROFILE_LOOKUPS
+from .utils import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+class WalletProfile:
+    """
+    What was known about a wallet before the trade being alerted on.
+
+    Built from its large trades recorded here, or from its data API history when
+    WALLET_PROFILE_API_ENABLED (source "api": all its trades up to
+    WALLET_PROFILE_API_LIMIT, plus wins among its resolved positions).
+    """
+
+    __slots__ = ("wallet", "first_seen", "trade_count", "total_volume", "wins", "resolved", "source")
+
+    def __init__(self, wallet, first_seen=None, trade_count=0, total_volume=0.0, wins=0, resolved=0, source="local"):
+        self.wallet = wallet
+        self.first_seen = first_seen
+        self.trade_count = trade_count
+        self.total_volume = total_volume
+        self.wins = wins
+        self.resolved = resolved
+        self.source = source
+
+    @property
+    def win_rate(self):
+        return self.wins / self.resolved if self.resolved else None
+
+    def observe(self, trade_data):
+        """
+        Count a trade recorded after the profile was loaded.
+        """
+        timestamp = parse_timestamp(trade_data.get("timestamp")) or None
+        if timestamp and (self.first_seen is None or timestamp < self.first_seen):
+            self.first_seen = timestamp
+        self.trade_count += 1
+        self.total_volume += trade_data.get("dollar_value", 0)
+
+    def to_dict(self):
+        return {
+            "first_seen": self.first_seen,
+            "trade_count": self.trade_count,
+            "total_volume": self.total_volume,
+            "win_rate": self.win_rate,
+            "resolved": self.resolved,
+            "source": self.source
+        }
+
+def fetch_wallet_history(wallet):
+    """
+    Return (trades, closed positions) for wallet from the data API, or None on failure.
+    """
+    timeout = (Config.HTTP_CONNECT_TIMEOUT_SECONDS, Config.WALLET_PROFILE_API_TIMEOUT_SECONDS)
+    params = {"user": wallet, "limit": Config.WALLET_PROFILE_API_LIMIT}
+    try:
+        with track_request("data_wallet_trades"):
+            response = http_get(f"{Config.DATA_API_BASE}/trades", params=params, timeout=timeout)
+            response.raise_for_status()
+        trades = response_json(response)
+
+        with track_request("data_closed_positions"):
+            response = http_get(f"{Config.DATA_API_BASE}/closed-positions", params=params, timeout=timeout)
+            response.raise_for_status()
+        positions = response_json(response)
+    except requests.RequestException as e:
+        logger.warning(f"Wallet history lookup failed for {wallet}: {e}")
+        return None
+    return trades, positions
+
+def profile_from_history(profile, trades, positions):
+    """
+    Fold API history into a profile built from local stats.
+    """
+    timestamps = [t for t in (parse_timestamp(trade.get("timestamp")) for trade in trades) if t]
+    if timestamps:
+        earliest = min(timestamps)
+        profile.first_seen = earliest if profile.first_seen is None else min(profile.first_seen, earliest)
+    # Local counts only cover large trades, so the API history replaces them
+    profile.trade_count = len(trades)
+    profile.total_volume = sum(float(t.get("size") or 0) * float(t.get("price") or 0) for t in trades)
+    profile.resolved = len(positions)
+    profile.wins = sum(1 for p in positions if float(p.get("realizedPnl") or 0) > 0)
+    profile.source = "api"
+    return profile
+
+class WalletProfiler:
+    """
+    Attaches wallet profiles to alerts, from an LRU cache whose entries also expire
+    after ttl seconds.
+
+    All cache misses of one poll cycle are loaded together with one grouped query
+    over large_trades. Enrichment runs while trades are processed, so it never waits
+    on the network: when the API is enabled, each missed wallet's history is fetched
+    by a background pool and replaces the local profile for the wallet's later alerts.
+    """
+
+    def __init__(self, max_size, ttl, api_enabled=False, api_workers=4):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.api_enabled = api_enabled
+        self.api_workers = max(1, api_workers)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = None
+
+    def _cached(self, wallet, now):
+        entry = self._cache.get(wallet)
+        if entry is None:
+            return None
+        profile, expires_at = entry
+        if now >= expires_at:
+            del self._cache[wallet]
+            return None
+        self._cache.move_to_end(wallet)
+        return profile
+
+    def _store(self, profiles, now):
+        for wallet, profile in profiles.items():
+            self._cache[wallet] = (profile, now + self.ttl)
+            self._cache.move_to_end(wallet)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def _load(self, wallets):
+        stats = get_wallet_stats(wallets)
+        profiles = {wallet: WalletProfile(wallet, *stats[wallet]) if wallet in stats else WalletProfile(wallet)
+                    for wallet in wallets}
+        for profile in profiles.values():
+            profile.first_seen = parse_timestamp(profile.first_seen) or None
+        return profiles
+
+    def _schedule_refresh(self, wallets):
+        with self._lock:
+            wallets = [w for w in wallets if w not in self._refreshing]
+            self._refreshing.update(wallets)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.api_workers, thread_name_prefix="wallet-profile")
+            for wallet in wallets:
+                self._executor.submit(self._refresh, wallet)
+
+    def _refresh(self, wallet):
+        """
+        Replace wallet's cached local profile with one from its API history. On failure
+        the local profile stays until it expires, and the next miss tries again.
+        """
+        try:
+            history = fetch_wallet_history(wallet)
+            if history is None:
+                return
+            with self._lock:
+                entry = self._cache.get(wallet)
+            profile = WalletProfile(wallet, first_seen=entry[0].first_seen if entry else None)
+            profile_from_history(profile, *history)
+            with self._lock:
+                self._store({wallet: profile}, time.monotonic())
+        except Exception as e:
+            logger.warning(f"Wallet profile refresh failed for {wallet}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(wallet)
+
+    def profiles(self, wallets):
+        """
+        Return {wallet: WalletProfile} for the distinct non-empty wallets given.
+        """
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            for wallet in dict.fromkeys(w for w in wallets if w):
+                profile = self._cached(wallet, now)
+                if profile is None:
+                    missing.append(wallet)
+                else:
+                    found[wallet] = profile
+        WALLET_PROFILE_LOOKUPS.inc(len(found), result="hit")
+
+        if missing:
+            WALLET_PROFILE_LOOKUPS.inc(len(missing), result="miss")
+            loaded = self._load(missing)
+            with self._lock:
+                self._store(loaded, now)
+            found.update(loaded)
+            if self.api_enabled:
+                self._schedule_refresh(missing)
+        return found
+
+    def enrich(self, alerts):
+        """
+        Add a "wallet_profile" dict to each alert's trade_data.
+        """
+        profiles = self.profiles(a.get("wallet_address") for a in alerts)
+        for trade_data in alerts:
+            profile = profiles.get(trade_data.get("wallet_address"))
+            if profile is not None:
+                trade_data["wallet_profile"] = profile.to_dict()
+
+    def observe(self, recorded):
+        """
+        Count newly recorded trades into cached profiles, so the next alert for the same
+        wallet does not have to wait for the entry to expire.
+        """
+        with self._lock:
+            for trade_data in recorded:
+                if trade_data.get("kind") == "aggregate":
+                    continue
+                entry = self._cache.get(trade_data.get("wallet_address"))
+                if entry is not None:
+                    entry[0].observe(trade_data)
+
+    def close(self, wait=False):
+        """
+        Stop the background refreshes; unless wait, queued ones are dropped.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __len__(self):
+        return len(self._cache)
+
+_profiler = None
+
+def get_wallet_profiler():
+    """
+    The process-wide profiler, or None when WALLET_PROFILES_ENABLED is off.
+    """
+    global _profiler
+    if _profiler is None and Config.WALLET_PROFILES_ENABLED:
+        _profiler = WalletProfiler(
+            Config.WALLET_PROFILE_CACHE_SIZE,
+            Config.WALLET_PROFILE_TTL_SECONDS,
+            api_enabled=Config.WALLET_PROFILE_API_ENABLED,
+            api_workers=Config.WALLET_PROFILE_API_WORKERS
+        )
+    return _profiler
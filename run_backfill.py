@@ -0,0 +1,7 @@
+﻿import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from polymarket_monitor.backfill import main
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,103 @@
+from polymarket_monitor.aggregator import BuyInAggregator
+from polymarket_monitor.records import Market
+
+CONDITION = "0xmarket"
+
+def fill(tx_hash, value, ts, wallet="0xwallet", side="BUY", outcome="Yes"):
+    return {
+        "conditionId": CONDITION, "transactionHash": tx_hash, "side": side,
+        "size": value * 2, "price": 0.5, "outcome": outcome,
+        "proxyWallet": wallet, "timestamp": ts
+    }
+
+def markets():
+    return {CONDITION: Market(CONDITION, "Will it happen?", "will-it-happen", "other", {"Yes": 0.5})}
+
+def aggregator(**kwargs):
+    return BuyInAggregator([900, 3600], 50000, bucket_seconds=kwargs.pop("bucket_seconds", 60), **kwargs)
+
+def test_fills_crossing_threshold_in_one_window_alert():
+    agg = aggregator()
+    assert agg.add_trades([fill("0x1", 30000, 0)], markets()) == []
+    alerts = agg.add_trades([fill("0x2", 30000, 10)], markets())
+    assert len(alerts) == 1
+    alert = alerts[0]
+    assert alert["transaction_hash"] == "agg:900:0x2"
+    assert alert["dollar_value"] == 60000
+    assert alert["fills"] == 2
+    assert alert["window_seconds"] == 900
+
+def test_sells_other_wallets_and_unmonitored_markets_are_not_summed():
+    agg = aggregator()
+    trades = [
+        fill("0x1", 30000, 0),
+        fill("0x2", 30000, 5, side="SELL"),
+        fill("0x3", 30000, 6, wallet="0xother"),
+        fill("0x4", 30000, 7, outcome="No"),
+        dict(fill("0x5", 30000, 8), conditionId="0xunmonitored")
+    ]
+    assert agg.add_trades(trades, markets()) == []
+
+def test_fills_outside_the_window_expire():
+    agg = aggregator()
+    agg.add_trades([fill("0x1", 30000, 0)], markets())
+    # Outside 900s but inside 3600s: the longer window still holds both
+    alerts = agg.add_trades([fill("0x2", 30000, 1000)], markets())
+    assert [a["transaction_hash"] for a in alerts] == ["agg:3600:0x2"]
+
+    agg = aggregator()
+    agg.add_trades([fill("0x1", 30000, 0)], markets())
+    assert agg.add_trades([fill("0x2", 30000, 4000)], markets()) == []
+
+def test_idle_keys_are_evicted():
+    agg = aggregator()
+    agg.add_trades([fill("0x1", 1000, 0, wallet="0xa"), fill("0x2", 1000, 10, wallet="0xb")], markets())
+    assert len(agg) == 2
+    agg.add_trades([fill("0x3", 1000, 5000, wallet="0xc")], markets())
+    assert len(agg) == 1
+
+def test_key_count_is_capped():
+    agg = aggregator(max_keys=3)
+    agg.add_trades([fill(f"0x{i}", 1000, i, wallet=f"0x{i}") for i in range(10)], markets())
+    assert len(agg) == 3
+
+def test_one_accumulation_alerts_once_across_windows():
+    agg = aggregator()
+    alerts = agg.add_trades([fill("0x1", 30000, 0), fill("0x2", 30000, 10)], markets())
+    assert [a["transaction_hash"] for a in alerts] == ["agg:900:0x2"]
+    # The 3600s window still covers 0x1 and 0x2, but they were already alerted on
+    assert agg.add_trades([fill("0x3", 1000, 1000)], markets()) == []
+    assert agg.add_trades([fill("0x4", 1000, 5000)], markets()) == []
+
+def test_new_volume_after_an_alert_alerts_again():
+    agg = aggregator()
+    agg.add_trades([fill("0x1", 30000, 0), fill("0x2", 30000, 10)], markets())
+    assert agg.add_trades([fill("0x3", 40000, 100)], markets()) == []
+    alerts = agg.add_trades([fill("0x4", 10000, 200)], markets())
+    assert len(alerts) == 1
+    assert alerts[0]["dollar_value"] == 50000
+    assert alerts[0]["fills"] == 2
+
+def test_fills_alerted_as_large_trades_are_excluded():
+    agg = aggregator()
+    batch = [fill("0xbig", 60000, 0), fill("0xsmall", 1000, 10)]
+    assert agg.add_trades(batch, markets(), {"0xbig"}) == []
+    # A redelivery of the large fill is not counted either
+    assert agg.add_trades([fill("0xbig", 60000, 0), fill("0x3", 1000, 20)], markets()) == []
+
+def test_repeated_fills_are_counted_once():
+    agg = aggregator()
+    agg.add_trades([fill("0x1", 30000, 0)], markets())
+    assert agg.add_trades([fill("0x1", 30000, 0)], markets()) == []
+
+def test_out_of_order_fills_count_in_the_newest_bucket():
+    agg = aggregator()
+    agg.add_trades([fill("0x1", 20000, 1000)], markets())
+    # Timestamps before the newest fill are counted at the newest time rather
+    # than rewinding the window
+    agg.add_trades([fill("0x2", 20000, 0)], markets())
+    alerts = agg.add_trades([fill("0x3", 20000, 500)], markets())
+    assert len(alerts) == 1
+    assert alerts[0]["window_seconds"] == 900
+    assert alerts[0]["dollar_value"] == 60000
+    assert alerts[0]["fills"] == 3
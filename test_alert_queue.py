@@ -0,0 +1,129 @@
+import time
+import asyncio
+import pytest
+from polymarket_monitor import alert_queue
+from polymarket_monitor.config import Config
+from polymarket_monitor.alerting import AlertDeliveryError
+from polymarket_monitor.alert_queue import AlertDispatcher
+
+def queue_alerts(db, *trades):
+    db.enqueue_alerts(list(trades), ["discord"])
+
+def outbox(db):
+    with db._lock:
+        return db.get_connection().execute(
+            "SELECT transaction_hash, status, attempts FROM alert_outbox ORDER BY id"
+        ).fetchall()
+
+def deliver_due(dispatcher):
+    alerts = alert_queue.claim_due_alerts("discord", time.time() + 3600, 50, dispatcher.owner)
+    return asyncio.run(dispatcher._deliver("discord", alerts))
+
+def test_poison_row_uses_up_its_own_attempts(db, monkeypatch):
+    sent = []
+
+    def deliver(channel, trades):
+        if any("market_title" not in t for t in trades):
+            raise KeyError("market_title")
+        sent.extend(t["transaction_hash"] for t in trades)
+
+    monkeypatch.setattr(alert_queue, "deliver_alerts", deliver)
+    monkeypatch.setattr(Config, "ALERT_MAX_ATTEMPTS", 2)
+    queue_alerts(db, {"transaction_hash": "0x1", "market_title": "A"},
+                 {"transaction_hash": "0x2"},
+                 {"transaction_hash": "0x3", "market_title": "C"})
+    dispatcher = AlertDispatcher(channels=["discord"])
+
+    deliver_due(dispatcher)
+    assert sent == ["0x1", "0x3"]
+    assert outbox(db) == [("0x2", "pending", 1)]
+
+    deliver_due(dispatcher)
+    assert [row[:2] for row in outbox(db)] == [("0x2", "failed")]
+
+def test_channel_failure_reschedules_whole_batch(db, monkeypatch):
+    def deliver(channel, trades):
+        raise AlertDeliveryError("rate limited", retry_after=7)
+
+    monkeypatch.setattr(alert_queue, "deliver_alerts", deliver)
+    queue_alerts(db, {"transaction_hash": "0x1"}, {"transaction_hash": "0x2"})
+    assert deliver_due(AlertDispatcher(channels=["discord"])) == 7
+    assert outbox(db) == [("0x1", "pending", 1), ("0x2", "pending", 1)]
+
+def test_undecodable_payload_is_marked_failed(db):
+    queue_alerts(db, {"transaction_hash": "0x1"})
+    with db.transaction() as conn:
+        conn.execute("UPDATE alert_outbox SET payload = '{broken'")
+    assert db.get_due_alerts("discord", time.time() + 3600) == []
+    assert outbox(db) == [("0x1", "failed", 0)]
+
+def test_claimed_rows_are_not_adopted_until_the_claim_is_stale(db, monkeypatch):
+    db.enqueue_alerts([{"transaction_hash": "0x1"}, {"transaction_hash": "0x2"}], ["discord"], owner="a")
+    claimed = db.claim_due_alerts("discord", time.time(), 1, "a")
+    assert [alert["trade"]["transaction_hash"] for alert in claimed] == ["0x1"]
+
+    # "a" lost its lease mid-send: only the row it had not claimed moves
+    assert db.adopt_orphaned_alerts(["b"], "b") == 1
+    assert db.claim_due_alerts("discord", time.time(), 50, "a") == []
+    assert [a["trade"]["transaction_hash"] for a in db.claim_due_alerts("discord", time.time(), 50, "b")] == ["0x2"]
+
+    monkeypatch.setattr(Config, "ALERT_CLAIM_TIMEOUT_SECONDS", -1)
+    assert db.adopt_orphaned_alerts(["b"], "b") == 1
+    assert [a["trade"]["transaction_hash"] for a in db.claim_due_alerts("discord", time.time(), 50, "b")] == ["0x1"]
+
+def test_released_claims_are_due_again(db):
+    queue_alerts(db, {"transaction_hash": "0x1"}, {"transaction_hash": "0x2"})
+    claimed = db.claim_due_alerts("discord", time.time(), 50)
+    assert db.claim_due_alerts("discord", time.time(), 50) == []
+
+    assert db.release_alert_claims(None, [claimed[1]["id"]]) == 1
+    assert [a["trade"]["transaction_hash"] for a in db.claim_due_alerts("discord", time.time(), 50)] == ["0x2"]
+    assert db.release_alert_claims() == 2
+    assert [row[1] for row in outbox(db)] == ["pending", "pending"]
+
+class LapsedShard:
+    has_lease = False
+
+def test_dispatcher_fetches_nothing_without_a_lease(db, monkeypatch):
+    sent = []
+    monkeypatch.setattr(alert_queue, "deliver_alerts", lambda channel, trades: sent.extend(trades))
+    monkeypatch.setattr(Config, "SHARD_HEARTBEAT_SECONDS", 0.01)
+    db.enqueue_alerts([{"transaction_hash": "0x1"}], ["discord"], owner="a")
+    dispatcher = AlertDispatcher(channels=["discord"], owner="a", shard=LapsedShard())
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(dispatcher._run_channel("discord"), timeout=0.2))
+    assert sent == []
+    assert outbox(db) == [("0x1", "pending", 0)]
+
+def test_worker_sends_and_hands_back_the_rest_after_a_backoff(db, monkeypatch):
+    sent = []
+
+    def deliver(channel, trades):
+        if trades[0]["transaction_hash"] == "0x2":
+            raise AlertDeliveryError("rate limited", retry_after=60)
+        sent.extend(t["transaction_hash"] for t in trades)
+
+    monkeypatch.setattr(alert_queue, "deliver_alerts", deliver)
+    monkeypatch.setattr(alert_queue, "alert_batches", lambda channel, trades: [(i, i + 1) for i in range(len(trades))])
+    queue_alerts(db, {"transaction_hash": "0x1"}, {"transaction_hash": "0x2"}, {"transaction_hash": "0x3"})
+    dispatcher = AlertDispatcher(channels=["discord"])
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(dispatcher._run_channel("discord"), timeout=0.3))
+    assert sent == ["0x1"]
+    assert outbox(db) == [("0x2", "pending", 1), ("0x3", "pending", 0)]
+
+def test_rejected_payload_fails_only_its_row_without_retries(db, monkeypatch):
+    sent = []
+
+    def deliver(channel, trades):
+        if any(t["transaction_hash"] == "0x2" for t in trades):
+            raise AlertDeliveryError("Discord rejected the alert (400)", retryable=False)
+        sent.extend(t["transaction_hash"] for t in trades)
+
+    monkeypatch.setattr(alert_queue, "deliver_alerts", deliver)
+    queue_alerts(db, {"transaction_hash": "0x1"}, {"transaction_hash": "0x2"}, {"transaction_hash": "0x3"})
+    assert deliver_due(AlertDispatcher(channels=["discord"])) is None
+    assert sent == ["0x1", "0x3"]
+    assert [row[:2] for row in outbox(db)] == [("0x2", "failed")]
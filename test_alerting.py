@@ -0,0 +1,79 @@
+import pytest
+from polymarket_monitor import alerting
+from polymarket_monitor.alerting import (
+    AlertDeliveryError, DISCORD_MAX_EMBEDS, DISCORD_MAX_EMBED_CHARS,
+    alert_batches, build_discord_embed, discord_embed_length
+)
+
+def trade(i, title_length=40, rules=()):
+    return {
+        "transaction_hash": f"0x{i:064x}", "market_title": "M" * title_length, "slug": "some-market",
+        "current_probability": 0.05, "side": "BUY", "outcome": "Yes", "dollar_value": 12000,
+        "wallet_address": "0x" + "ab" * 20, "timestamp": 1700000000, "rules": list(rules)
+    }
+
+def batch_lengths(trades, batches):
+    return [sum(discord_embed_length(build_discord_embed(t)) for t in trades[start:end]) for start, end in batches]
+
+def test_small_embeds_are_batched_by_count():
+    trades = [trade(i) for i in range(25)]
+    assert alert_batches("discord", trades) == [(0, 10), (10, 20), (20, 25)]
+
+def test_large_embeds_are_batched_by_total_length():
+    trades = [trade(i, title_length=256, rules=[f"rule-{n}-{'x' * 40}" for n in range(20)]) for i in range(DISCORD_MAX_EMBEDS)]
+    batches = alert_batches("discord", trades)
+
+    assert len(batches) > 1
+    assert [i for start, end in batches for i in range(start, end)] == list(range(len(trades)))
+    assert all(length <= DISCORD_MAX_EMBED_CHARS for length in batch_lengths(trades, batches))
+
+def test_email_batches_ignore_embed_length(monkeypatch):
+    monkeypatch.setattr(alerting.Config, "ALERT_EMAIL_MAX_TRADES", 4)
+    assert alert_batches("email", [trade(i) for i in range(9)]) == [(0, 4), (4, 8), (8, 9)]
+    assert alert_batches("email", []) == []
+
+class Response:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.text = str(body)
+        self.headers = headers or {}
+        self._body = {} if body is None else body
+
+    def json(self):
+        if isinstance(self._body, Exception):
+            raise self._body
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise alerting.requests.HTTPError(f"{self.status_code} error")
+
+@pytest.mark.parametrize("status, retryable, retry_after", [
+    (400, False, None),
+    (413, False, None),
+    (429, True, 2.5),
+    (404, True, None),
+    (503, True, None),
+])
+def test_discord_errors_are_classified(monkeypatch, status, retryable, retry_after):
+    monkeypatch.setattr(alerting, "http_post", lambda *args, **kwargs: Response(status, {"retry_after": 2.5}))
+    with pytest.raises(AlertDeliveryError) as raised:
+        alerting.post_discord_embeds([build_discord_embed(trade(1))])
+    assert raised.value.retryable is retryable
+    assert raised.value.retry_after == retry_after
+
+@pytest.mark.parametrize("body, headers, retry_after", [
+    ({"retry_after": 1.5}, {"Retry-After": "9"}, 1.5),
+    ({}, {"Retry-After": "3"}, 3.0),
+    (["rate limited"], {"Retry-After": "4"}, 4.0),
+    ("rate limited", {"Retry-After": "5"}, 5.0),
+    (ValueError("not JSON"), {"Retry-After": "6"}, 6.0),
+    ({"retry_after": "soon"}, {}, 0.0),
+    (["rate limited"], {}, 0.0),
+])
+def test_discord_rate_limit_delay(monkeypatch, body, headers, retry_after):
+    monkeypatch.setattr(alerting, "http_post", lambda *args, **kwargs: Response(429, body, headers))
+    with pytest.raises(AlertDeliveryError) as raised:
+        alerting.post_discord_embeds([build_discord_embed(trade(1))])
+    assert raised.value.retryable is True
+    assert raised.value.retry_after == retry_after
@@ -0,0 +1,76 @@
+import pytest
+from polymarket_monitor import analytics
+from polymarket_monitor.analytics import QueryError, query_trades, query_markets
+
+def record_trades(db, start, count):
+    with db.transaction() as conn:
+        conn.executemany(db.INSERT_LARGE_TRADE_SQL, [
+            (f"0xmarket{i % 2}", "Market", "BUY", 1000.0, 0.5, 10000.0 + i, "Yes", f"0xwallet{i % 3}",
+             f"0x{i:064x}", 1700000000 + i)
+            for i in range(start, start + count)
+        ])
+
+@pytest.fixture
+def conn(db):
+    db.upsert_markets([
+        {"condition_id": f"0xmarket{i}", "title": f"Market {i}", "current_probability": 0.02,
+         "category": "sports" if i % 2 else "politics"}
+        for i in range(12)
+    ])
+    record_trades(db, 0, 25)
+    conn = db.open_read_connection()
+    yield conn
+    conn.close()
+
+def walk(query, conn, params):
+    pages = []
+    cursor = None
+    while True:
+        page = query(conn, dict(params, cursor=str(cursor)) if cursor is not None else params)
+        pages.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+def test_trade_pages_cover_every_trade_once_newest_first(conn):
+    pages = walk(query_trades, conn, {"limit": "7"})
+    ids = [item["id"] for page in pages for item in page]
+
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    assert ids == sorted(ids, reverse=True)
+    assert len(ids) == len(set(ids)) == 25
+
+def test_exact_multiple_of_the_page_size_ends_without_an_empty_page(conn):
+    assert [len(page) for page in walk(query_trades, conn, {"limit": "5"})] == [5] * 5
+
+def test_trades_inserted_while_paging_do_not_shift_later_pages(db, conn):
+    first = query_trades(conn, {"limit": "10"})
+    record_trades(db, 25, 5)
+    rest = walk(query_trades, conn, {"limit": "10", "cursor": str(first["next_cursor"])})
+
+    seen = [item["id"] for item in first["items"]] + [item["id"] for page in rest for item in page]
+    assert len(seen) == len(set(seen)) == 25
+
+def test_filters_apply_to_every_page(conn):
+    pages = walk(query_trades, conn, {"limit": "3", "category": "sports", "min_value": "10010"})
+    items = [item for page in pages for item in page]
+
+    assert items and all(item["category"] == "sports" and item["dollar_value"] >= 10010 for item in items)
+    assert len(items) == len([i for i in range(10, 25) if i % 2])
+
+def test_market_pages_follow_condition_id(conn):
+    pages = walk(query_markets, conn, {"limit": "5", "category": "politics"})
+    ids = [item["condition_id"] for page in pages for item in page]
+    assert ids == sorted(f"0xmarket{i}" for i in range(0, 12, 2))
+
+@pytest.mark.parametrize("params", [
+    {"limit": "0"}, {"limit": "many"}, {"cursor": "abc"}, {"since": "yesterday"}, {"min_value": "lots"},
+])
+def test_bad_parameters_are_rejected(conn, params):
+    with pytest.raises(QueryError):
+        query_trades(conn, params)
+
+def test_page_size_is_capped(conn, monkeypatch):
+    monkeypatch.setattr(analytics.Config, "ANALYTICS_MAX_PAGE_SIZE", 10)
+    with pytest.raises(QueryError):
+        query_trades(conn, {"limit": "11"})
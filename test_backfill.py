@@ -0,0 +1,76 @@
+import types
+import pytest
+import requests
+from polymarket_monitor import backfill
+
+MARKET = "0xmarket"
+
+class FakeTradesApi:
+    """
+    /trades for one market, newest first, with offset paging. Requests numbered in
+    fail_on raise a connection error instead of answering.
+    """
+
+    def __init__(self, count, fail_on=()):
+        self.trades = [
+            {"transactionHash": f"0x{i:04x}", "conditionId": MARKET, "proxyWallet": "0xwallet", "side": "BUY",
+             "size": 2000, "price": 0.5, "outcome": "Yes", "timestamp": 1000 + i, "title": "Market", "slug": "market"}
+            for i in reversed(range(count))
+        ]
+        self.fail_on = set(fail_on)
+        self.offsets = []
+
+    def get(self, url, params=None, **kwargs):
+        self.offsets.append(params["offset"])
+        if len(self.offsets) in self.fail_on:
+            raise requests.ConnectionError("connection reset")
+        page = self.trades[params["offset"]:params["offset"] + params["limit"]]
+        return types.SimpleNamespace(raise_for_status=lambda: None, page=page)
+
+@pytest.fixture
+def api(db, monkeypatch):
+    def install(count, fail_on=()):
+        fake = FakeTradesApi(count, fail_on)
+        monkeypatch.setattr(backfill, "http_get", fake.get)
+        monkeypatch.setattr(backfill, "response_json", lambda response: response.page)
+        return fake
+    return install
+
+def args(**overrides):
+    values = dict(start="1000", end="2000", markets=[MARKET], min_value=1000, workers=1, page_size=10)
+    values.update(overrides)
+    return types.SimpleNamespace(**values)
+
+def test_backfill_records_the_range(api, db):
+    fake = api(25)
+    assert backfill.run_backfill(args()) == 0
+    assert db.count_recorded_trades(1000, 2000) == 25
+    assert fake.offsets == [0, 10, 20]
+
+def test_interrupted_backfill_resumes_from_the_saved_offset(api, db):
+    fake = api(45, fail_on={3})
+    assert backfill.run_backfill(args()) == 1
+    assert db.count_recorded_trades(1000, 2000) == 20
+    assert fake.offsets == [0, 10, 20]
+
+    fake = api(45)
+    assert backfill.run_backfill(args()) == 0
+    assert fake.offsets == [20, 30, 40]
+    assert db.count_recorded_trades(1000, 2000) == 45
+
+def test_finished_backfill_is_not_fetched_again(api, db):
+    api(25)
+    backfill.run_backfill(args())
+    fake = api(25)
+    assert backfill.run_backfill(args()) == 0
+    assert fake.offsets == []
+
+    # A different range is a separate job
+    assert backfill.run_backfill(args(start="1010")) == 0
+    assert fake.offsets == [0, 10]
+
+def test_backfill_stops_at_the_range_start(api, db):
+    fake = api(100)
+    assert backfill.run_backfill(args(start="1085")) == 0
+    assert fake.offsets == [0, 10]
+    assert db.count_recorded_trades(1000, 2000) == 15
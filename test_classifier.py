@@ -0,0 +1,111 @@
+import random
+import pytest
+from polymarket_monitor.utils import SPORTS_KEYWORDS, POLITICS_KEYWORDS, classify_market_category
+
+def substring_classify(market):
+    """
+    The classifier the keyword index replaced: plain substring search.
+    """
+    title = market.get('question', market.get('title', '')).lower()
+    slug = market.get('slug', '').lower()
+    combined = f"{title} {slug}"
+    sports_matches = sum(1 for keyword in SPORTS_KEYWORDS if keyword in combined)
+    politics_matches = sum(1 for keyword in POLITICS_KEYWORDS if keyword in combined)
+    if sports_matches > politics_matches and sports_matches > 0:
+        return 'sports'
+    elif politics_matches > 0:
+        return 'politics'
+    return 'other'
+
+TITLES = [
+    "Democratic nominee 2028: Gavin Newsom",
+    "Who scored the most goals in the Premier League this season?",
+    "Will Trump win the 2024 presidential election?",
+    "Will Biden be impeached before 2025?",
+    "Will the Senate vote to confirm the nominee?",
+    "Republicans win the House in the midterms?",
+    "Which party controls Congress after the elections?",
+    "Will the Supreme Court overturn the ruling?",
+    "Governor race: who wins Georgia?",
+    "Will the bill pass before the summer recess?",
+    "Lakers vs. Celtics: who wins Game 7?",
+    "Super Bowl LIX champion",
+    "Will the Chiefs win the Super Bowls in a row?",
+    "Champions League final: Real Madrid vs. Dortmund",
+    "World Cup 2026 winner",
+    "NBA MVP 2025",
+    "NFL Draft: first overall pick",
+    "Will Verstappen win the F1 championship?",
+    "UFC 300: who wins the main event?",
+    "Wimbledon men's singles: tennis upset?",
+    "Will the Yankees make the playoffs?",
+    "Total points scored above 45.5?",
+    "Spread: Eagles -3.5",
+    "Will Bitcoin reach $100k by June?",
+    "Will it snow in New York this winter?",
+    "Will the Fed cut rates in March?",
+    "Ethereum above $5000 on December 31?",
+    "Box office: will the movie gross $1 billion?",
+    "Will GDP growth exceed 3% in Q3?",
+    "Campaign spending tops $2B?",
+    "Will the GOP hold the primaries in Iowa first?",
+    "Presidential debates: will there be three?",
+    "Which senator resigns first?",
+    "Votes counted by midnight in the ballot recount?",
+    "Will Congress pass the legislation on crypto policy?",
+    "Cabinet nominations confirmed by April?",
+    "Golf: who wins the Masters?",
+    "Hockey: Stanley Cup champion",
+    "Formula 1 Monaco Grand Prix winner",
+    "Boxing: will the fight go the distance?",
+    "Olympics 2028 medal count leader",
+    "Roster moves before the trade deadline?",
+    "Will the match end in a draw?",
+    "MLS Cup: who scores first?",
+    "Will the White House announce it?",
+    "Political crisis in France: government falls?",
+    "Representative resigns before the vote?",
+    "RNC convention city",
+    "DNC chair elected in February?",
+]
+
+# Substring hits inside a word, which the word-prefix index drops on purpose
+INSIDE_WORD = [
+    ("Will the dilemma be solved?", "sports", "other"),
+    ("Darwin Award 2025 recipient", "sports", "other"),
+    ("Lighthouse restoration finished?", "politics", "other"),
+]
+
+def synthetic_titles(count=3000, seed=11):
+    rng = random.Random(seed)
+    filler = ["will", "the", "by", "end", "of", "2025", "above", "team", "new", "york", "next", "june", "market"]
+    inflections = ["", "s", "es", "ed", "ing", "ic", "ial", "er"]
+    keywords = SPORTS_KEYWORDS + POLITICS_KEYWORDS
+    markets = []
+    for i in range(count):
+        words = rng.choices(filler, k=rng.randint(4, 10))
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords) + rng.choice(inflections))
+        title = " ".join(words).capitalize() + "?"
+        markets.append({"question": title, "slug": f"market-{i}"})
+    return markets
+
+@pytest.mark.parametrize("title", TITLES)
+def test_matches_substring_classifier_on_real_titles(title):
+    market = {"question": title, "slug": ""}
+    assert classify_market_category(market) == substring_classify(market)
+
+def test_matches_substring_classifier_on_inflected_keywords():
+    mismatches = [m["question"] for m in synthetic_titles()
+                  if classify_market_category(m) != substring_classify(m)]
+    assert mismatches == []
+
+@pytest.mark.parametrize("title, substring_category, category", INSIDE_WORD)
+def test_keywords_inside_words_no_longer_match(title, substring_category, category):
+    market = {"question": title, "slug": ""}
+    assert substring_classify(market) == substring_category
+    assert classify_market_category(market) == category
+
+def test_slug_is_classified_too():
+    assert classify_market_category({"question": "Who takes it?", "slug": "super-bowl-lix-winner"}) == "sports"
+    assert classify_market_category({"question": "Who takes it?", "slug": "us-presidential-election"}) == "politics"
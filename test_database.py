@@ -0,0 +1,121 @@
+import sqlite3
+import logging
+import pytest
+from polymarket_monitor.config import Config
+from polymarket_monitor import database
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """
+    A database created before auto_vacuum=INCREMENTAL, with most of its pages free.
+    """
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE filler (data BLOB)")
+    conn.executemany("INSERT INTO filler VALUES (?)", [(b"x" * 4000,) for _ in range(500)])
+    conn.commit()
+    conn.execute("DELETE FROM filler")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(Config, "DATABASE_PATH", path)
+    database.close_database()
+    database.init_database()
+    yield database
+    database.close_database()
+
+def pragma(db, name):
+    with db._lock:
+        return db.get_connection().execute(f"PRAGMA {name}").fetchone()[0]
+
+def test_new_databases_compact_incrementally(db):
+    with db.transaction() as conn:
+        conn.execute("CREATE TABLE filler (data BLOB)")
+        conn.executemany("INSERT INTO filler VALUES (?)", [(b"x" * 4000,) for _ in range(200)])
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM filler")
+
+    assert pragma(db, "auto_vacuum") == 2
+    assert db.compact_database() > 0
+    assert pragma(db, "freelist_count") == 0
+
+def test_retention_never_runs_a_full_vacuum(legacy_db, caplog):
+    pages = pragma(legacy_db, "page_count")
+    with caplog.at_level(logging.WARNING):
+        assert legacy_db.compact_database() == 0
+    assert pragma(legacy_db, "page_count") == pages
+    assert "run_backfill.py vacuum" in caplog.text
+
+def test_vacuum_switches_to_incremental(legacy_db):
+    before, after = legacy_db.vacuum_database()
+    assert after < before
+    assert pragma(legacy_db, "auto_vacuum") == 2
+    assert pragma(legacy_db, "freelist_count") == 0
+
+def open_at_version(path, version):
+    """
+    A database migrated only up to version, by the migrations as they are defined.
+    """
+    conn = sqlite3.connect(path)
+    for target, _, migrate in database.MIGRATIONS[:version]:
+        migrate(conn.cursor())
+        conn.execute(f"PRAGMA user_version = {target}")
+    conn.commit()
+    return conn
+
+def indexes(db):
+    with db._lock:
+        return {row[0] for row in db.get_connection().execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+def test_version_1_database_upgrades_with_its_data(tmp_path, monkeypatch):
+    path = str(tmp_path / "v1.db")
+    conn = open_at_version(path, 1)
+    conn.execute(database.INSERT_LARGE_TRADE_SQL,
+                 ("0xmarket", "Market", "BUY", 1000.0, 0.5, 60000.0, "Yes", "0xwallet", "0xtx", 1700000000))
+    conn.execute("INSERT INTO alert_outbox (channel, transaction_hash, payload) VALUES ('discord', '0xtx', '{}')")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(Config, "DATABASE_PATH", path)
+    database.close_database()
+    try:
+        database.init_database()
+        assert database.get_schema_version() == database.MIGRATIONS[-1][0]
+        assert {"idx_large_trades_wallet", "idx_alert_outbox_due", "idx_markets_active_probability"} <= indexes(database)
+        assert database.count_large_trades() == 1
+
+        # Alerts queued before sharding have no owner and are claimable by an unsharded monitor
+        claimed = database.claim_due_alerts("discord", float("inf"))
+        assert [alert["trade"] for alert in claimed] == [{}]
+        database.renew_shard_lease("a", float("inf"))
+        assert database.get_live_shard_members(0) == ["a"]
+    finally:
+        database.close_database()
+
+def test_pre_versioning_markets_table_gets_categories(tmp_path, monkeypatch):
+    path = str(tmp_path / "v0.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE markets (condition_id TEXT PRIMARY KEY, title TEXT NOT NULL, slug TEXT, "
+                 "current_probability REAL, outcome TEXT, last_updated TIMESTAMP, active BOOLEAN DEFAULT 1)")
+    conn.execute("INSERT INTO markets (condition_id, title, current_probability) VALUES ('0xmarket', 'Market', 0.02)")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(Config, "DATABASE_PATH", path)
+    database.close_database()
+    try:
+        database.init_database()
+        with database._lock:
+            row = database.get_connection().execute("SELECT category FROM markets").fetchone()
+        assert row == ("other",)
+    finally:
+        database.close_database()
+
+def test_migrations_can_be_applied_twice(db):
+    # Instances sharing a database may both run a migration before either bumps the version
+    with db._lock:
+        conn = db.get_connection()
+        for _, _, migrate in db.MIGRATIONS:
+            migrate(conn.cursor())
+        conn.commit()
+    assert db.get_schema_version() == db.MIGRATIONS[-1][0]
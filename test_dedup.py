@@ -0,0 +1,62 @@
+from polymarket_monitor.dedup import BloomFilter, TransactionDedup
+
+def tx(i):
+    return "0x%064x" % i
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(5000, 0.001)
+    for i in range(5000):
+        bloom.add(tx(i))
+    assert all(tx(i) in bloom for i in range(5000))
+
+def test_bloom_filter_false_positive_rate_near_target():
+    bloom = BloomFilter(5000, 0.01)
+    for i in range(5000):
+        bloom.add(tx(i))
+    false_positives = sum(tx(i) in bloom for i in range(5000, 25000))
+    assert false_positives / 20000 < 0.03
+
+def test_lru_miss_is_authoritative_until_eviction():
+    lookups = []
+    dedup = TransactionDedup(100, lambda h: lookups.append(h) or False)
+    for i in range(50):
+        dedup.add(tx(i))
+    assert dedup.is_processed(tx(10))
+    assert not dedup.is_processed(tx(999))
+    assert lookups == []
+
+def test_evicted_hashes_are_never_reported_new():
+    stored = set()
+    lookups = []
+
+    def fallback(tx_hash):
+        lookups.append(tx_hash)
+        return tx_hash in stored
+
+    dedup = TransactionDedup(100, fallback, bloom_capacity=10000, bloom_error_rate=0.001)
+    for i in range(5000):
+        stored.add(tx(i))
+        dedup.add(tx(i))
+
+    assert len(dedup) == 100
+    assert all(dedup.is_processed(tx(i)) for i in range(5000))
+    # Unseen hashes are mostly answered by the Bloom filter without a lookup
+    assert not any(dedup.is_processed(tx(i)) for i in range(10000, 12000))
+    assert len([h for h in lookups if int(h, 16) >= 10000]) < 50
+
+def test_evicted_hashes_fall_back_without_bloom():
+    stored = {tx(i) for i in range(300)}
+    dedup = TransactionDedup(100, stored.__contains__)
+    for i in range(300):
+        dedup.add(tx(i))
+    assert dedup.is_processed(tx(0))
+    assert dedup.fallback_lookups == 1
+    assert not dedup.is_processed(tx(5000))
+    assert dedup.fallback_lookups == 2
+
+def test_warm_marks_index_incomplete_when_history_is_larger():
+    stored = {tx(i) for i in range(20)}
+    dedup = TransactionDedup(100, stored.__contains__)
+    dedup.warm([tx(i) for i in range(10, 20)], total_count=20)
+    assert dedup.is_processed(tx(3))
+    assert dedup.fallback_lookups == 1
@@ -0,0 +1,98 @@
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib3.response import HTTPResponse
+from polymarket_monitor import http_client
+from polymarket_monitor.config import Config
+
+class ScriptedServer:
+    """
+    Answers each request with the next status in statuses (the last one repeats)
+    and counts requests per method.
+    """
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = []
+        script = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def respond(self):
+                script.requests.append(self.command)
+                status = script.statuses.pop(0) if len(script.statuses) > 1 else script.statuses[0]
+                body = b"{}"
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = respond
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/trades"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def scripted(monkeypatch):
+    monkeypatch.setattr(Config, "HTTP_MAX_RETRIES", 2)
+    monkeypatch.setattr(Config, "HTTP_RETRY_BACKOFF_SECONDS", 0)
+    servers = []
+
+    def start(*statuses):
+        server = ScriptedServer(statuses)
+        servers.append(server)
+        return server
+
+    http_client.close_http_sessions()
+    yield start
+    http_client.close_http_sessions()
+    for server in servers:
+        server.shutdown()
+
+def test_gateway_errors_are_retried(scripted):
+    server = scripted(503, 502, 200)
+    assert http_client.http_get(server.url).status_code == 200
+    assert server.requests == ["GET"] * 3
+
+def test_retries_give_up_with_the_last_response(scripted):
+    server = scripted(504)
+    response = http_client.http_get(server.url)
+    assert response.status_code == 504
+    assert len(server.requests) == 1 + Config.HTTP_MAX_RETRIES
+
+@pytest.mark.parametrize("status", [429, 500, 404])
+def test_other_errors_reach_the_caller_at_once(scripted, status):
+    server = scripted(status, 200)
+    assert http_client.http_get(server.url).status_code == status
+    assert server.requests == ["GET"]
+
+def test_posts_are_not_retried_after_a_response(scripted):
+    server = scripted(503, 200)
+    assert http_client.http_post(server.url, json={}).status_code == 503
+    assert server.requests == ["POST"]
+
+def test_backoff_doubles_per_consecutive_error(monkeypatch):
+    monkeypatch.setattr(Config, "HTTP_MAX_RETRIES", 5)
+    monkeypatch.setattr(Config, "HTTP_RETRY_BACKOFF_SECONDS", 0.5)
+    retry = http_client.build_retry()
+    backoffs = []
+    for _ in range(4):
+        retry = retry.increment("GET", "/trades", response=HTTPResponse(status=503))
+        backoffs.append(retry.get_backoff_time())
+    # urllib3 does not sleep before the first retry
+    assert backoffs == [0, 1.0, 2.0, 4.0]
+    assert not retry.is_retry("GET", 429)
+
+def test_sessions_are_pooled_per_host(scripted):
+    first = http_client.get_session("https://gamma-api.polymarket.com/markets")
+    assert http_client.get_session("https://gamma-api.polymarket.com/events") is first
+    assert http_client.get_session("https://data-api.polymarket.com/trades") is not first
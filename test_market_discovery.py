@@ -0,0 +1,94 @@
+import threading
+import pytest
+from polymarket_monitor import market_discovery, market_index
+
+@pytest.fixture
+def discovery(db, monkeypatch):
+    monkeypatch.setattr(market_discovery, "_snapshot", None)
+    monkeypatch.setattr(market_discovery, "near_threshold_ids", frozenset())
+    monkeypatch.setattr(market_index, "_index", None)
+    return market_discovery
+
+def market(condition_id, probability=0.05):
+    return {"condition_id": condition_id, "title": condition_id, "slug": condition_id,
+            "current_probability": probability, "outcome": "Yes", "category": "politics"}
+
+def test_full_refresh_replaces_near_threshold_markets(discovery):
+    discovery.apply_market_delta([market("a")], complete=True, near={"b", "c"})
+    assert discovery.near_threshold_ids == {"b", "c"}
+
+    discovery.apply_market_delta([market("a")], complete=True, near={"d"})
+    assert discovery.near_threshold_ids == {"d"}
+
+def test_partial_refresh_only_touches_its_scope(discovery):
+    discovery.apply_market_delta([], complete=True, near={"b", "c", "d"})
+
+    # "b" fell below the threshold, "c" moved away; "d" was not checked
+    discovery.apply_market_delta([market("b")], complete=False, scope={"b", "c"}, near=set())
+    assert discovery.near_threshold_ids == {"d"}
+    assert "b" in market_index.get_market_index()
+
+def test_concurrent_partial_refreshes_keep_every_update(discovery):
+    ids = [f"m{i}" for i in range(200)]
+    start = threading.Barrier(len(ids))
+
+    def refresh(condition_id):
+        start.wait()
+        discovery.apply_market_delta([], complete=False, scope={condition_id}, near={condition_id})
+
+    threads = [threading.Thread(target=refresh, args=(cid,)) for cid in ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert discovery.near_threshold_ids == set(ids)
+
+def fake_catalog(monkeypatch, total, page_cap):
+    """
+    Serve a catalog of total markets from fetch_markets_page, capping pages at
+    page_cap rows like an API that ignores larger limits. Returns the offsets requested.
+    """
+    requested = []
+
+    def fetch_markets_page(offset):
+        requested.append(offset)
+        return [{"conditionId": f"m{i}"} for i in range(offset, min(offset + page_cap, total))]
+
+    monkeypatch.setattr(market_discovery, "fetch_markets_page", fetch_markets_page)
+    return requested
+
+def paged_ids():
+    return [m["conditionId"] for page in market_discovery.iter_market_pages() for m in page]
+
+@pytest.fixture
+def paging(monkeypatch):
+    monkeypatch.setattr(market_discovery.Config, "MARKETS_API_LIMIT", 100)
+    monkeypatch.setattr(market_discovery.Config, "MARKETS_MAX_PAGES", 50)
+    monkeypatch.setattr(market_discovery.Config, "MARKET_DISCOVERY_WORKERS", 4)
+
+def test_paging_stops_at_the_first_short_page(paging, monkeypatch):
+    requested = fake_catalog(monkeypatch, 950, 100)
+    assert sorted(paged_ids(), key=lambda c: int(c[1:])) == [f"m{i}" for i in range(950)]
+    # Pages in flight when the short page arrives may still be fetched, but no more
+    assert max(requested) < 900 + 4 * 100
+    assert len(requested) == len(set(requested))
+
+def test_paging_honours_the_page_cap(paging, monkeypatch):
+    monkeypatch.setattr(market_discovery.Config, "MARKETS_MAX_PAGES", 3)
+    requested = fake_catalog(monkeypatch, 10000, 100)
+    assert len(paged_ids()) == 300
+    assert sorted(requested) == [0, 100, 200]
+
+def test_short_first_page_sets_the_page_size(paging, monkeypatch):
+    # The API caps pages at 40 rows although 100 were asked for
+    requested = fake_catalog(monkeypatch, 130, 40)
+    assert sorted(paged_ids(), key=lambda c: int(c[1:])) == [f"m{i}" for i in range(130)]
+    # One page is probed at the API's size before fanning out
+    assert requested[:2] == [0, 40]
+    assert all(offset % 40 == 0 for offset in requested)
+    assert max(requested) < 120 + 4 * 40
+
+def test_empty_catalog_is_one_request(paging, monkeypatch):
+    requested = fake_catalog(monkeypatch, 0, 100)
+    assert paged_ids() == []
+    assert requested == [0]
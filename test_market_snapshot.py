@@ -0,0 +1,54 @@
+from polymarket_monitor.market_snapshot import MarketSnapshot
+
+def market(condition_id, probability=0.05, outcome="Yes", title=None):
+    return {"condition_id": condition_id, "title": title or condition_id, "outcome": outcome,
+            "current_probability": probability}
+
+def ids(markets):
+    return sorted(m["condition_id"] for m in markets)
+
+def seeded(*markets):
+    snapshot = MarketSnapshot()
+    snapshot.seed(markets)
+    return snapshot
+
+def test_complete_refresh_reports_new_changed_and_closed():
+    snapshot = seeded(market("same"), market("moved"), market("renamed"), market("flipped"), market("gone"))
+    new, changed, closed = snapshot.diff([
+        market("same"), market("moved", 0.07), market("renamed", title="New title"),
+        market("flipped", outcome="No"), market("fresh")
+    ])
+    assert ids(new) == ["fresh"]
+    assert ids(changed) == ["flipped", "moved", "renamed"]
+    assert closed == ["gone"]
+
+def test_unchanged_refresh_is_empty():
+    snapshot = seeded(market("a"), market("b"))
+    assert snapshot.diff([market("a"), market("b")]) == ([], [], [])
+
+def test_scoped_refresh_only_closes_markets_in_scope():
+    snapshot = seeded(market("a"), market("b"), market("c"))
+    # "b" was checked and is gone; "c" was not checked, so its absence means nothing
+    new, changed, closed = snapshot.diff([market("a", 0.06)], complete=False, scope={"a", "b"})
+    assert new == []
+    assert ids(changed) == ["a"]
+    assert closed == ["b"]
+
+def test_scoped_refresh_without_scope_closes_nothing():
+    snapshot = seeded(market("a"), market("b"))
+    assert snapshot.diff([market("x")], complete=False) == ([market("x")], [], [])
+
+def test_update_applies_a_scoped_refresh():
+    snapshot = seeded(market("a"), market("b"), market("c"))
+    snapshot.update([market("a", 0.06), market("d")], complete=False, scope={"a", "b"})
+    assert len(snapshot) == 3
+    assert snapshot.diff([market("a", 0.06), market("c"), market("d")]) == ([], [], [])
+
+def test_update_replaces_the_set_on_a_complete_refresh():
+    snapshot = seeded(market("a"), market("b"))
+    snapshot.update([market("c")])
+    assert snapshot.diff([market("c")]) == ([], [], [])
+
+def test_price_moves_are_counted_against_the_snapshot():
+    snapshot = seeded(market("a", 0.05), market("b", 0.05))
+    assert snapshot.count_price_moves([market("a", 0.08), market("b", 0.051), market("new", 0.5)], 0.02) == 1
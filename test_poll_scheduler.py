@@ -0,0 +1,85 @@
+import types
+import pytest
+from polymarket_monitor import poll_scheduler
+from polymarket_monitor.poll_scheduler import TokenBucket, AdaptivePollScheduler
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(poll_scheduler, "time", types.SimpleNamespace(monotonic=clock))
+    monkeypatch.setattr(poll_scheduler.Config, "POLL_INTERVAL_SECONDS", 4)
+    monkeypatch.setattr(poll_scheduler.Config, "POLL_INTERVAL_MIN_SECONDS", 2.0)
+    monkeypatch.setattr(poll_scheduler.Config, "POLL_INTERVAL_MAX_SECONDS", 12.0)
+    monkeypatch.setattr(poll_scheduler.Config, "POLL_QUIET_BACKOFF_FACTOR", 1.5)
+    monkeypatch.setattr(poll_scheduler.Config, "POLL_ACTIVITY_HOLD_SECONDS", 120.0)
+    monkeypatch.setattr(poll_scheduler.Config, "POLL_BACKOFF_MAX_SECONDS", 300.0)
+    return clock
+
+def test_bucket_spends_its_burst_then_refills(clock):
+    bucket = TokenBucket(3600, 3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    assert bucket.time_until_available() == pytest.approx(1.0)
+
+    clock.now += 1
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    # Refill stops at the burst size
+    clock.now += 3600
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+def test_empty_bucket_holds_back_the_next_poll(clock):
+    bucket = TokenBucket(360, 1)
+    scheduler = AdaptivePollScheduler(bucket)
+    assert bucket.try_acquire()
+    assert scheduler.next_delay() == pytest.approx(10.0)
+
+def test_quiet_polls_stretch_the_interval_up_to_the_maximum(clock):
+    scheduler = AdaptivePollScheduler(TokenBucket(3600, 10))
+    delays = []
+    for _ in range(5):
+        scheduler.record_poll(0)
+        delays.append(scheduler.next_delay())
+    assert delays == [6.0, 9.0, 12.0, 12.0, 12.0]
+
+def test_activity_holds_the_minimum_interval_then_recovers(clock):
+    scheduler = AdaptivePollScheduler(TokenBucket(3600, 10))
+    scheduler.record_poll(2)
+    assert scheduler.next_delay() == 2.0
+
+    clock.now += 60
+    scheduler.record_poll(0)
+    assert scheduler.next_delay() == 2.0
+
+    clock.now += 61
+    scheduler.record_poll(0)
+    assert scheduler.next_delay() == 6.0
+
+def test_server_errors_back_off_exponentially_and_recover(clock, monkeypatch):
+    monkeypatch.setattr(poll_scheduler, "random", types.SimpleNamespace(uniform=lambda low, high: high))
+    scheduler = AdaptivePollScheduler(TokenBucket(3600, 10))
+    delays = []
+    for _ in range(8):
+        scheduler.record_error(503)
+        delays.append(scheduler.next_delay())
+    assert delays == [8, 16, 32, 64, 128, 256, 300, 300]
+
+    scheduler.record_poll(0)
+    assert scheduler.next_delay() == 6.0
+
+def test_rate_limit_waits_for_retry_after(clock):
+    scheduler = AdaptivePollScheduler(TokenBucket(3600, 10))
+    scheduler.record_error(429, retry_after=45)
+    assert scheduler.next_delay() == 45
+
+def test_client_errors_do_not_back_off(clock):
+    scheduler = AdaptivePollScheduler(TokenBucket(3600, 10))
+    scheduler.record_error(404)
+    assert scheduler.next_delay() == 4
@@ -0,0 +1,70 @@
+import os
+import json
+import pytest
+from polymarket_monitor.config import Config
+from polymarket_monitor.records import Trade, Market
+from polymarket_monitor.rules import Rule, RuleEngine, load_rules
+
+def write_rules(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(data if isinstance(data, str) else json.dumps(data))
+
+def trade(dollar_value=60000.0, wallet="0xaa", condition_id="c1", side="BUY", outcome="Yes"):
+    return Trade(condition_id, "0x1", side, 1.0, 0.02, dollar_value, outcome, wallet)
+
+SPORTS = Market("c1", "Final", category="sports", outcomes={"Yes": 0.02})
+
+def test_rules_are_matched_through_the_index(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, {"include_default": False, "rules": [
+        {"name": "sports", "categories": ["Sports"], "min_value": 50000},
+        {"name": "whale", "wallets": ["0xAA"], "min_value": 1000},
+        {"name": "market", "condition_ids": ["c2"], "sides": ["buy"]}
+    ]})
+    index = load_rules(path)
+    assert sorted(index.match(trade(), SPORTS)) == ["sports", "whale"]
+    assert index.match(trade(dollar_value=2000), SPORTS) == ["whale"]
+    assert index.match(trade(wallet="0xbb", condition_id="c2", dollar_value=Config.TRADE_SIZE_MIN), None) == ["market"]
+    assert not index.may_match("c3", "0xbb", None)
+
+@pytest.mark.parametrize("content", [
+    "[]",
+    '{"rules": {"name": "x"}}',
+    '{"rules": ["x"]}',
+    '{"rules": [{"name": "x", "wallets": [1]}]}',
+    '{"rules": [{"name": "x", "categories": [null]}]}',
+    '{"rules": [{"name": "x", "min_value": "lots"}]}',
+    '{"rules": [{"name": "x", "colour": "red"}]}',
+    '{"rules": [{"name": "x"}, {"name": "x"}]}',
+    "{not json",
+])
+def test_malformed_rules_are_rejected_with_value_error(tmp_path, content):
+    path = tmp_path / "rules.json"
+    write_rules(path, content)
+    with pytest.raises(ValueError):
+        load_rules(path)
+
+def test_failed_reload_keeps_previous_rules(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "ALERT_RULES_RELOAD_SECONDS", 0)
+    path = tmp_path / "rules.json"
+    write_rules(path, {"rules": [{"name": "whale", "wallets": ["0xaa"]}]})
+    engine = RuleEngine(str(path))
+    before = engine.current()
+    assert [r.name for r in before.rules] == ["default", "whale"]
+
+    for content in ("[]", '{"rules": [{"name": "y", "wallets": [7]}]}'):
+        write_rules(path, content)
+        os.utime(path, (1, 1))
+        assert engine.current() is before
+        assert not engine.reload()
+
+    write_rules(path, {"include_default": False, "rules": [{"name": "fixed"}]})
+    os.utime(path, (2, 2))
+    assert [r.name for r in engine.current().rules] == ["fixed"]
+
+def test_rule_from_dict_validates_types():
+    with pytest.raises(ValueError):
+        Rule.from_dict(["not", "a", "dict"])
+    with pytest.raises(ValueError):
+        Rule.from_dict({"name": 5})
+    assert Rule.from_dict({"name": "ok", "max_probability": 0.05}).needs_market
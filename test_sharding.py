@@ -0,0 +1,47 @@
+import time
+from polymarket_monitor.sharding import HashRing, SQLiteLeaseStore, ShardCoordinator
+
+KEYS = [f"0xcondition{i}" for i in range(20000)]
+
+def assignments(ring):
+    return {key: ring.owner(key) for key in KEYS}
+
+def test_ring_spreads_keys_evenly():
+    owners = list(assignments(HashRing(["a", "b", "c", "d"])).values())
+    for member in "abcd":
+        assert 0.15 < owners.count(member) / len(owners) < 0.35
+
+def test_member_joining_moves_only_its_share():
+    before = assignments(HashRing(["a", "b", "c"]))
+    after = assignments(HashRing(["a", "b", "c", "d"]))
+    moved = [key for key in KEYS if before[key] != after[key]]
+
+    # About 1/4 of the keys move, and all of them to the new member
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+    assert {after[key] for key in moved} == {"d"}
+
+def test_member_leaving_moves_only_its_keys():
+    before = assignments(HashRing(["a", "b", "c"]))
+    after = assignments(HashRing(["a", "c"]))
+    assert all(before[key] == after[key] for key in KEYS if before[key] != "b")
+
+def test_empty_ring_owns_nothing():
+    assert HashRing([]).owner("0xabc") is None
+
+def test_lease_store_lists_only_live_members(db):
+    store = SQLiteLeaseStore()
+    store.renew("a", 60)
+    store.renew("b", -1)
+    store.renew("c", 60)
+    store.release("c")
+    assert store.live_members() == ["a"]
+
+def test_coordinator_owns_nothing_once_its_lease_lapses(db):
+    shard = ShardCoordinator("a", SQLiteLeaseStore(), lease_ttl=60)
+    shard.heartbeat()
+    assert shard.has_lease and shard.is_leader
+    assert all(shard.owns(key) for key in KEYS[:100])
+
+    shard._lease_valid_until = time.monotonic() - 1
+    assert not shard.has_lease and not shard.is_leader
+    assert not any(shard.owns(key) for key in KEYS[:100])
@@ -0,0 +1,39 @@
+from polymarket_monitor.trade_monitor import select_new_trades, advance_cursor
+
+def trade(tx_hash, timestamp):
+    return {"transactionHash": tx_hash, "timestamp": timestamp}
+
+def test_first_poll_takes_everything():
+    trades = [trade("c", 102), trade("b", 101), trade("a", 100)]
+    new, cursor = select_new_trades(trades, None)
+    assert new == trades
+    assert cursor == (102, {"c"})
+
+def test_stops_at_trades_older_than_cursor():
+    trades = [trade("d", 103), trade("c", 102), trade("b", 101)]
+    new, cursor = select_new_trades(trades, (102, {"c"}))
+    assert [t["transactionHash"] for t in new] == ["d"]
+    assert cursor == (103, {"d"})
+
+def test_equal_timestamps_are_told_apart_by_hash():
+    # "c2" landed in the same second as "c" after the previous poll
+    trades = [trade("c2", 102), trade("c", 102), trade("b", 101)]
+    new, cursor = select_new_trades(trades, (102, {"c"}))
+    assert [t["transactionHash"] for t in new] == ["c2"]
+    assert cursor == (102, {"c", "c2"})
+
+    again, cursor = select_new_trades(trades, cursor)
+    assert again == []
+    assert cursor == (102, {"c", "c2"})
+
+def test_advance_keeps_cursor_for_out_of_order_trades():
+    cursor = (200, {"x"})
+    assert advance_cursor(cursor, [trade("old", 150)]) == cursor
+    assert advance_cursor(cursor, [trade("y", 200)]) == (200, {"x", "y"})
+    assert advance_cursor(cursor, [trade("z", 201), trade("y", 200)]) == (201, {"z"})
+    assert advance_cursor(cursor, []) == cursor
+
+def test_cursor_round_trips_through_database(db):
+    db.set_trade_cursor(102.0, {"c", "c2"})
+    assert db.get_trade_cursor() == (102.0, {"c", "c2"})
+    assert db.get_trade_cursor("trade_cursor:other") is None
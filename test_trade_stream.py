@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import pytest
+from polymarket_monitor import trade_stream, trade_monitor, market_index, rules, wallet_profiles
+from polymarket_monitor.config import Config
+from polymarket_monitor.rules import Rule, RuleIndex, RuleEngine
+from polymarket_monitor.trade_stream import TradeStream
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+from mock_api import MockState, synthetic_markets, synthetic_trade, start_mock_server, start_mock_stream
+
+FEED_SIZE = 300
+
+@pytest.fixture
+def feed(db, monkeypatch):
+    """
+    A finite trade feed served over REST and a WebSocket that drops every few pushes,
+    with the monitor's module state reset and every trade on it alerting.
+    """
+    markets = synthetic_markets(20)
+    rng = random.Random(7)
+    state = MockState(
+        markets, [synthetic_trade(i, markets, rng) for i in range(FEED_SIZE)], trades_per_poll=0,
+        stream_interval_ms=5, stream_trades_per_message=5, stream_drop_every=4, stream_gap_trades=15
+    )
+    server, base_url = start_mock_server(state)
+    stream, stream_url = start_mock_stream(state)
+
+    monkeypatch.setattr(Config, "DATA_API_BASE", base_url)
+    monkeypatch.setattr(Config, "STREAM_WS_URL", stream_url)
+    monkeypatch.setattr(Config, "STREAM_RECONNECT_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(Config, "STREAM_RECONNECT_MAX_SECONDS", 0.05)
+    monkeypatch.setattr(Config, "DISCORD_WEBHOOK_URL", f"{base_url}/webhook")
+    monkeypatch.setattr(Config, "EMAIL_ENABLED", False)
+    monkeypatch.setattr(Config, "WALLET_PROFILES_ENABLED", False)
+    monkeypatch.setattr(wallet_profiles, "_profiler", None)
+    monkeypatch.setattr(trade_monitor, "_trade_cursor", None)
+    monkeypatch.setattr(trade_monitor, "_cursor_loaded", False)
+    monkeypatch.setattr(trade_monitor, "_dedup_index", None)
+    monkeypatch.setattr(market_index, "_index", None)
+
+    engine = RuleEngine()
+    engine.index = RuleIndex([Rule("watch", condition_ids=[m["conditionId"] for m in markets], min_value=0)])
+    monkeypatch.setattr(rules, "_engine", engine)
+
+    yield state
+    stream.shutdown()
+    server.shutdown()
+
+def test_dropped_stream_is_backfilled_without_duplicates(feed, db, monkeypatch):
+    recorded = []
+    backfilled = []
+
+    def process_trades(trades, newest_first=True):
+        large_trades = trade_monitor.process_trades(trades, newest_first)
+        recorded.extend(t["transaction_hash"] for t in large_trades)
+        return large_trades
+
+    def check_for_large_trades():
+        large_trades = trade_monitor.check_for_large_trades()
+        recorded.extend(t["transaction_hash"] for t in large_trades)
+        backfilled.extend(t["transaction_hash"] for t in large_trades)
+        return large_trades
+
+    monkeypatch.setattr(trade_stream, "process_trades", process_trades)
+    monkeypatch.setattr(trade_stream, "check_for_large_trades", check_for_large_trades)
+
+    async def consume():
+        task = asyncio.create_task(TradeStream(on_new_trades=lambda: None).run())
+        deadline = time.monotonic() + 20
+        while len(set(recorded)) < FEED_SIZE and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(consume())
+
+    assert feed.requests["stream_drops"] >= 2
+    assert feed.requests["stream_connections"] >= feed.requests["stream_drops"]
+    # Gap trades were never pushed; only the backfill after each reconnect found them
+    assert feed.streamed_trades < FEED_SIZE
+    assert backfilled
+
+    assert len(recorded) == len(set(recorded))
+    assert set(recorded) == {t["transactionHash"] for t in feed.recorded_trades}
+    assert db.count_large_trades() == FEED_SIZE
+    with db._lock:
+        queued = db.get_connection().execute("SELECT COUNT(*) FROM alert_outbox").fetchone()[0]
+    assert queued == FEED_SIZE
+
+def test_safety_poll_recovers_trades_behind_the_stream(feed, db):
+    markets = synthetic_markets(20)
+    rng = random.Random(11)
+    trades = [synthetic_trade(i, markets, rng) for i in range(3)]
+    old, missed, newest = trades
+
+    trade_monitor.process_trades([old])
+    # The stream delivers the newest trade but never the one before it
+    streamed = trade_monitor.process_trades([newest], newest_first=False)
+    assert [t["transaction_hash"] for t in streamed] == [newest["transactionHash"]]
+
+    polled = trade_monitor.process_trades([newest, missed, old])
+    assert [t["transaction_hash"] for t in polled] == [missed["transactionHash"]]
+    assert db.count_large_trades() == 3
+    assert db.get_trade_cursor()[0] == newest["timestamp"]
@@ -0,0 +1,66 @@
+import threading
+from polymarket_monitor import wallet_profiles
+from polymarket_monitor.wallet_profiles import WalletProfiler
+
+WALLET = "0x" + "ab" * 20
+
+def record_trades(db, wallet, values):
+    with db.transaction() as conn:
+        conn.executemany(db.INSERT_LARGE_TRADE_SQL, [
+            ("0xmarket", "Market", "BUY", 1000.0, 0.5, value, "Yes", wallet, f"0x{i:064x}", 1700000000 + i)
+            for i, value in enumerate(values)
+        ])
+
+def test_local_profile_counts_recorded_trades(db):
+    record_trades(db, WALLET, [10000, 25000])
+    alerts = [{"wallet_address": WALLET}, {"wallet_address": "0xnew"}]
+    WalletProfiler(100, 900).enrich(alerts)
+
+    assert alerts[0]["wallet_profile"]["trade_count"] == 2
+    assert alerts[0]["wallet_profile"]["total_volume"] == 35000
+    assert alerts[0]["wallet_profile"]["source"] == "local"
+    assert alerts[1]["wallet_profile"]["trade_count"] == 0
+
+def test_api_lookup_does_not_block_enrichment(db, monkeypatch):
+    release = threading.Event()
+    lookups = []
+
+    def fetch(wallet):
+        lookups.append(wallet)
+        release.wait(5)
+        trades = [{"timestamp": 1600000000, "size": 100, "price": 0.5}] * 3
+        positions = [{"realizedPnl": 5}, {"realizedPnl": -1}]
+        return trades, positions
+
+    monkeypatch.setattr(wallet_profiles, "fetch_wallet_history", fetch)
+    profiler = WalletProfiler(100, 900, api_enabled=True, api_workers=2)
+
+    # The lookup is still blocked: the alert goes out with the local profile
+    first = [{"wallet_address": WALLET}]
+    profiler.enrich(first)
+    assert first[0]["wallet_profile"]["source"] == "local"
+
+    # A second alert before the lookup finishes does not start another one
+    profiler.enrich([{"wallet_address": WALLET}])
+
+    release.set()
+    profiler.close(wait=True)
+    assert lookups == [WALLET]
+
+    later = [{"wallet_address": WALLET}]
+    profiler.enrich(later)
+    assert later[0]["wallet_profile"]["source"] == "api"
+    assert later[0]["wallet_profile"]["trade_count"] == 3
+    assert later[0]["wallet_profile"]["win_rate"] == 0.5
+
+def test_failed_lookup_keeps_the_local_profile(db, monkeypatch):
+    monkeypatch.setattr(wallet_profiles, "fetch_wallet_history", lambda wallet: None)
+    record_trades(db, WALLET, [10000])
+    profiler = WalletProfiler(100, 900, api_enabled=True)
+    profiler.enrich([{"wallet_address": WALLET}])
+    profiler.close(wait=True)
+
+    alerts = [{"wallet_address": WALLET}]
+    profiler.enrich(alerts)
+    assert alerts[0]["wallet_profile"]["source"] == "local"
+    assert alerts[0]["wallet_profile"]["trade_count"] == 1